@@ -11,30 +11,111 @@ Features:
 - 21 different NLP tasks (sentiment analysis, translation, summarization, etc.)
 - Dark theme with gradient styling
 - Real-time AI-powered text analysis
+- Bulk CSV/JSONL upload processed in the background (jobs.py)
 
 Usage:
     streamlit run UI_streamlit.py
 """
 
-import streamlit as st
-import google.generativeai as genai
-from dotenv import load_dotenv
+import csv
+import io
 import os
+import tempfile
+import time
+from functools import partial
+
+import streamlit as st
+
+from auth import AuthError, get_auth
+from cache import cacheable, normalize_text
+from batch import read_records
+from gemini_client import DEFAULT_MODEL, get_model, warm_up
+from jobs import MULTI_TASK, JobStore, background_job, format_duration, run_in_background, write_results
+from metrics import metrics
+from multitask import DEFAULT_TASKS, run_multi_task
+from resilience import policy
+from structured import run_structured, supports_structured
+from tasks import TASK_IDS, TASKS_BY_ID, stream_task
+
+# Streamlit reruns this whole script on every widget interaction; the
+# rerun time is recorded in metrics.py as the "ui_rerun" stage
+rerun_started = time.perf_counter()
+
+# st.fragment (Streamlit >= 1.37) reruns only the decorated function when
+# one of its widgets changes; older versions rerun the whole script
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+# Identical (task, text) results are kept this long for every session
+RESULT_TTL = 3600
+
+# Bulk upload: default requests in flight, progress refresh (seconds), rows per page
+BULK_CONCURRENCY = 8
+BULK_REFRESH = 2
+BULK_PAGE_SIZES = (25, 50, 100)
+
+
+# download_button accepts a callable `data`, run only when clicked, in recent
+# Streamlit releases; older ones need the file built before the button is drawn
+try:
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    deferred_downloads = hasattr(MediaFileManager, "add_deferred")
+except ImportError:
+    deferred_downloads = False
+
+
+def live_fragment(func):
+    """A fragment that also reruns itself every BULK_REFRESH seconds, where supported."""
+    try:
+        return fragment(run_every=BULK_REFRESH)(func)
+    except TypeError:
+        return fragment(func)
 
 # ============================
 # CONFIGURATION & SETUP
 # ============================
 
-# Load environment variables from .env file
-# This file should contain: GOOGLE_API_KEY or GEMINI_API_KEY
-load_dotenv()
+@st.cache_resource(show_spinner=False)
+def load_resources():
+    """
+    Build the Gemini client and task registry once per server process.
+    
+    gemini_client loads the .env file (GOOGLE_API_KEY or GEMINI_API_KEY)
+    on import; the shared client (gemini-2.5-flash is fast and
+    cost-effective) is created here once and reused by every session and
+    rerun, as is the optional warm-up request.
+    
+    Returns:
+        tuple: (GenerativeModel, dict of task id -> Task)
+    """
+    model = get_model(DEFAULT_MODEL)
+    if os.getenv("GEMINI_WARMUP") == "1":
+        warm_up()
+    return model, TASKS_BY_ID
+
+
+@st.cache_resource(show_spinner=False)
+def job_store():
+    """The bulk job database (jobs.py), one connection per server process."""
+    return JobStore()
+
 
-# Configure Gemini AI client with API key from environment
-# The API key is loaded from .env file for security
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+class _NotCached(Exception):
+    """Raised inside cached_result() on a miss (exceptions are never cached)."""
 
-# Initialize Gemini model (gemini-2.5-flash is fast and cost-effective)
-model = genai.GenerativeModel("gemini-2.5-flash")
+
+@st.cache_data(ttl=RESULT_TTL, max_entries=1000, show_spinner=False)
+def cached_result(task_id, inputs, _result=None):
+    """
+    Results shared by all sessions, keyed by (task id, normalized inputs).
+    
+    Call without `_result` to look a result up (raises _NotCached on a
+    miss), and with `_result` to store a freshly streamed answer.
+    Arguments starting with an underscore are not part of Streamlit's
+    cache key.
+    """
+    if _result is None:
+        raise _NotCached()
+    return _result
 
 # ============================
 # SESSION STATE MANAGEMENT
@@ -42,14 +123,15 @@ model = genai.GenerativeModel("gemini-2.5-flash")
 # Streamlit session state persists data across reruns
 # This is used for user authentication and app state
 
-# Initialize users dictionary to store registered users
-# Format: {email: [name, password]}
-if "users" not in st.session_state:
-    st.session_state.users = {}
+# Accounts and sessions live in the shared user store (auth.py), so they
+# work across tabs, server replicas and restarts. The session only keeps
+# its signed token; checking it on a rerun is served from an in-process
+# cache, not the database.
+auth = get_auth()
 
-# Track login status - False by default (user not logged in)
-if "logged_in" not in st.session_state:
-    st.session_state.logged_in = False
+# Track login status - False unless this session holds a valid token
+user = auth.validate(st.session_state.get("auth_token"))
+st.session_state.logged_in = user is not None
 
 # ============================
 # PAGE CONFIGURATION
@@ -113,6 +195,8 @@ st.markdown("""
 # Render the main header with gradient background
 st.markdown('<div class="main-header"><h1>🤖 AI-Powered NLP Toolkit</h1><p>Advanced Natural Language Processing with Gemini AI</p></div>', unsafe_allow_html=True)
 
+model, tasks_by_id = load_resources()
+
 # ============================
 # AUTHENTICATION SECTION
 # ============================
@@ -134,13 +218,12 @@ if not st.session_state.logged_in:
 
         # Handle registration button click
         if st.button("Register"):
-            # Check if email already exists in the users database
-            if email in st.session_state.users:
-                st.error("Email already exists!")
-            else:
-                # Store new user: email -> [name, password]
-                st.session_state.users[email] = [name, password]
+            # The store refuses duplicate emails and keeps only a salted hash
+            try:
+                auth.register(name, email, password)
                 st.success("Registration successful! Please login.")
+            except AuthError as e:
+                st.error(str(e))
 
     # ========== LOGIN FORM ==========
     else:
@@ -152,155 +235,319 @@ if not st.session_state.logged_in:
 
         # Handle login button click
         if st.button("Login"):
-            # Verify email exists and password matches
-            if email in st.session_state.users and st.session_state.users[email][1] == password:
-                # Set logged_in flag to True
-                st.session_state.logged_in = True
+            # Verify the password and keep the signed session token
+            try:
+                st.session_state.auth_token = auth.login(email, password)
                 st.success("Login successful!")
                 # Rerun the app to show the main interface
                 st.rerun()
+            except AuthError as e:
+                st.error(str(e))
+
+# ============================
+# TASK FORM (fragment)
+# ============================
+# Selecting a task, typing and running an analysis only rerun this
+# function, not the header, CSS, login check or stats panel
+
+@fragment
+def task_form():
+    fragment_started = time.perf_counter()
+    st.markdown("### 🚀 Welcome to AI NLP Toolkit")
+
+    # Whole files, processed by a background worker (see jobs.py)
+    if st.toggle("📂 Bulk upload (CSV / JSONL)"):
+        bulk_form()
+        metrics.observe_stage("ui_fragment", time.perf_counter() - fragment_started)
+        return
+
+    # Several tasks on the same text in one request (see multitask.py)
+    if st.toggle("🧩 Analyze everything (one request)"):
+        multi_task_form()
+        metrics.observe_stage("ui_fragment", time.perf_counter() - fragment_started)
+        return
+
+    # ========== TASK SELECTION DROPDOWN ==========
+    # User selects one of 21 available NLP tasks from the shared registry
+    # Each task has an emoji icon for better UX
+    task_id = st.selectbox(
+        "🎯 Select NLP Task",
+        TASK_IDS,
+        format_func=lambda tid: tasks_by_id[tid].label
+    )
+    task = tasks_by_id[task_id]
+
+    # ========== TEXT INPUT AREA ==========
+    # One input per task field: Paraphrase Detection needs two sentences,
+    # every other task uses a single text area
+    if task.arity == 1:
+        inputs = [st.text_area(task.ui_labels[0], height=150, placeholder="Type or paste your text here...")]
+    else:
+        inputs = [st.text_input(label) for label in task.ui_labels]
+
+    # Short JSON answer rendered here instead of a paragraph of markdown
+    structured = supports_structured(task.id) and st.toggle("🧾 Structured result", key="structured")
+
+    # ========== RUN ANALYSIS BUTTON ==========
+    # When clicked, builds the task prompt and calls Gemini API
+    if st.button("🚀 Run Analysis", use_container_width=True):
+        st.markdown("---")
+        st.markdown("### ✅ Analysis Result")
+        result_card = st.empty()
+        key = tuple(normalize_text(text) for text in inputs)
+
+        if structured:
+            structured_result(task, inputs, result_card)
+            metrics.observe_stage("ui_fragment", time.perf_counter() - fragment_started)
+            return
+
+        # Text Generation samples a new answer every time: never shared
+        reuse = cacheable(task.generation_config)
+        try:
+            if not reuse:
+                raise _NotCached
+            # Same task and text as an earlier request (any session): no call
+            result = cached_result(task.id, key)
+            result_card.markdown(f'<div class="task-card">{result}</div>', unsafe_allow_html=True)
+            st.caption("⚡ Served from cache")
+        except _NotCached:
+            result = stream_result(task, inputs, result_card)
+            if result is not None and reuse:
+                cached_result(task.id, key, _result=result)
+
+    metrics.observe_stage("ui_fragment", time.perf_counter() - fragment_started)
+
+
+def multi_task_form():
+    task_ids = st.multiselect(
+        "🎯 Tasks",
+        [tid for tid in TASK_IDS if tasks_by_id[tid].arity == 1],
+        default=list(DEFAULT_TASKS),
+        format_func=lambda tid: tasks_by_id[tid].label
+    )
+    text = st.text_area("📄 Enter your text", height=150, placeholder="Type or paste your text here...")
+
+    if st.button("🚀 Run Analysis", use_container_width=True, disabled=not task_ids):
+        st.markdown("---")
+        st.markdown("### ✅ Analysis Result")
+        with st.spinner("🔄 Processing..."):
+            try:
+                results, errors = run_multi_task(text, task_ids)
+            except Exception as e:
+                st.error(f"❌ Analysis failed: {e}")
+                return
+        # One card per task; a task that failed on its own does not hide the others
+        for task_id in task_ids:
+            st.markdown(f"#### {tasks_by_id[task_id].label}")
+            if task_id in results:
+                st.markdown(f'<div class="task-card">{results[task_id]}</div>', unsafe_allow_html=True)
             else:
-                st.error("Invalid email or password")
+                st.error(f"❌ Analysis failed: {errors.get(task_id)}")
+
+
+def bulk_form():
+    uploaded = st.file_uploader("📄 Upload a CSV or JSONL file", type=["csv", "jsonl", "json"])
+    task_id = st.selectbox(
+        "🎯 Select NLP Task",
+        TASK_IDS + (MULTI_TASK,),
+        format_func=lambda tid: tasks_by_id[tid].label if tid in tasks_by_id else "🧩 Analyze everything",
+        key="bulk_task"
+    )
+    st.caption("Each row needs a `text` column (`text1` and `text2` for Paraphrase Detection).")
+    concurrency = st.slider("⚡ Requests in flight", 1, 32, BULK_CONCURRENCY, key="bulk_concurrency")
+
+    if st.button("🚀 Start Processing", use_container_width=True, disabled=uploaded is None):
+        # Rows are copied into the job database; the page stays usable while a
+        # background thread sends them to Gemini
+        fmt = "csv" if uploaded.name.lower().endswith(".csv") else "jsonl"
+        records = read_records(io.TextIOWrapper(uploaded, encoding="utf-8-sig", newline=""), fmt)
+        try:
+            job_id = job_store().create(task_id, records, {"in": uploaded.name, "out_format": fmt,
+                                                           "concurrency": concurrency})
+        except (ValueError, csv.Error) as e:
+            st.error(f"❌ Could not read {uploaded.name}: {e}")
+            return
+        run_in_background(job_id, concurrency)
+        st.session_state.bulk_job = job_id
+        st.session_state.bulk_page = 1
+
+    job_id = st.session_state.get("bulk_job")
+    if job_id is not None:
+        bulk_progress(job_id)
+        bulk_results(job_id)
+
+
+@live_fragment
+def bulk_progress(job_id):
+    job = job_store().job(job_id)
+    worker = background_job(job_id)
+    finished = job["done"] + job["failed"]
+    st.progress(finished / job["total"] if job["total"] else 1.0,
+                text=f"Job {job_id}: {finished:,} / {job['total']:,} rows ({job['failed']:,} failed)")
+
+    running = worker is not None and worker.running
+    if running:
+        eta = worker.progress.eta_seconds
+        st.caption(f"⚡ {worker.progress.rate:.1f} rows/sec, "
+                   f"ETA {format_duration(eta) if eta is not None else '?'}")
+    elif worker is not None and worker.error is not None:
+        st.error(f"❌ Processing stopped: {worker.error}")
+    elif job["status"] != "done":
+        # Quota ran out, or the server restarted: continue from the checkpoint
+        st.warning(f"⏸️ Job {job_id} is {job['status']} at row {job['checkpoint']:,}.")
+        if st.button("▶️ Resume", key="bulk_resume"):
+            run_in_background(job_id)
+            running = True
+
+    # Redraw the results table once when the worker finishes
+    if st.session_state.get("bulk_running") and not running:
+        st.session_state.bulk_running = False
+        st.rerun(scope="app")
+    st.session_state.bulk_running = running
+
+
+@fragment
+def bulk_results(job_id):
+    job = job_store().job(job_id)
+    size = st.selectbox("Rows per page", BULK_PAGE_SIZES, key="bulk_page_size")
+    pages = max(1, -(-job["total"] // size))
+    st.session_state.bulk_page = min(st.session_state.get("bulk_page", 1), pages)
+    page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, key="bulk_page")
+    # Only this page is read from the job database, however large the file
+    st.dataframe(job_store().page(job_id, (page - 1) * size, size), use_container_width=True, hide_index=True)
+
+    fmt = job["options"].get("out_format", "jsonl")
+    label = "⬇️ Download results" + ("" if job["status"] == "done" else " (so far)")
+    if deferred_downloads:
+        data = partial(export_file, job_id, fmt)
+    elif st.button("📦 Prepare download", key="bulk_prepare"):
+        # Built on request, not on every rerun of this fragment
+        data = export_file(job_id, fmt)
+    else:
+        return
+    # Unfinished rows are downloaded without a result
+    st.download_button(
+        label,
+        data,
+        file_name=f"job-{job_id}-results.{fmt}",
+        mime="text/csv" if fmt == "csv" else "application/jsonl"
+    )
+
+
+def export_file(job_id, fmt):
+    """
+    Results written page by page to a temporary file, then read back as
+    the download's bytes. download_button keeps the payload in memory
+    whatever it is given, so this holds one encoded copy, never the rows
+    or a text buffer as well.
+    """
+    with tempfile.TemporaryFile() as raw:
+        target = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+        write_results(job_id, target, fmt, job_store())
+        target.flush()
+        raw.seek(0)
+        data = raw.read()
+        target.detach()
+    return data
+
+
+def structured_result(task, inputs, result_card):
+    # The response cache keeps the JSON reply, so repeats cost no call
+    with st.spinner("🔄 Processing..."):
+        try:
+            result = run_structured(task.id, *inputs)
+        except Exception as e:
+            st.error(f"❌ Analysis failed: {e}")
+            return
+    result_card.markdown(f'<div class="task-card">{result.render()}</div>', unsafe_allow_html=True)
+    with st.expander("JSON"):
+        st.json(result.to_dict())
+
+
+def stream_result(task, inputs, result_card):
+    """
+    Stream one answer into the result card.
+    
+    Returns:
+        str: The full answer, or None if the call failed
+    """
+    # Show loading spinner until the first chunk arrives
+    with st.spinner("🔄 Processing..."):
+
+        # ========== PROMPT ENGINEERING ==========
+        # Each task has a specific prompt template in tasks.py
+        # The prompts are designed to get structured, useful responses
+        # Transient errors are retried in gemini_client; anything
+        # left is shown as an error instead of a traceback
+        try:
+            stream = stream_task(task.id, *inputs)
+            chunks = iter(stream)
+            result = next(chunks, "")
+            result_card.markdown(f'<div class="task-card">{result}</div>', unsafe_allow_html=True)
+        except Exception as e:
+            st.error(f"❌ Analysis failed: {e}")
+            return None
+
+    # Render the rest of the answer as it streams in
+    try:
+        for chunk in chunks:
+            result += chunk
+            result_card.markdown(f'<div class="task-card">{result}</div>', unsafe_allow_html=True)
+    except Exception as e:
+        st.error(f"❌ Response interrupted: {e}")
+        return None
+
+    if stream.ttft is not None:
+        st.caption(f"⚡ First token in {stream.ttft:.2f}s" + (" (cached)" if stream.cached else ""))
+    return result
+
+
+# ============================
+# QUICK STATS (fragment, live numbers from metrics.py)
+# ============================
+
+@fragment
+def stats_panel():
+    st.markdown("### 📊 Quick Stats")
+    totals = metrics.totals()
+    cache_stats = metrics.snapshot()["cache"]
+    breaker_state = policy.breaker(DEFAULT_MODEL).state
+    st.metric("Total Tasks", str(len(tasks_by_id)))                      # Number of available NLP tasks
+    st.metric("AI Model", DEFAULT_MODEL)                                 # AI model being used
+    st.metric("Status", {"closed": "🟢 Online", "half_open": "🟡 Recovering"}.get(breaker_state, "🔴 Unavailable"))
+    st.metric("Requests Served", totals["requests"], delta=f"{totals['errors']} errors", delta_color="inverse")
+    if totals["p50_seconds"] is not None:
+        st.metric("Latency p50 / p95", f"{totals['p50_seconds']:.2f}s / {totals['p95_seconds']:.2f}s")
+    st.metric("Tokens In / Out", f"{totals['input_tokens']:,} / {totals['output_tokens']:,}")
+    if cache_stats:
+        st.metric("Cache Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+    st.button("🔄 Refresh stats")
+    with st.expander("Export metrics"):
+        st.download_button("⬇️ Prometheus", metrics.to_prometheus(), file_name="metrics.prom")
+        st.download_button("⬇️ JSON", metrics.to_json(), file_name="metrics.json")
+
 
 # ============================
 # MAIN APPLICATION (After Login)
 # ============================
 # This section is displayed only when user is logged in
-else:
+if st.session_state.logged_in:
     # Create a two-column layout: main content (2/3) and stats sidebar (1/3)
     col1, col2 = st.columns([2, 1])
-    
-    # ========== RIGHT COLUMN: Quick Stats ==========
-    # Display app statistics in the right sidebar
-    with col2:
-        st.markdown("### 📊 Quick Stats")
-        st.metric("Total Tasks", "21")          # Number of available NLP tasks
-        st.metric("AI Model", "Gemini 2.5")    # AI model being used
-        st.metric("Status", "🟢 Online")       # App status indicator
-    
+
     # ========== LEFT COLUMN: Main Interaction Area ==========
     with col1:
-        st.markdown("### 🚀 Welcome to AI NLP Toolkit")
-
-        # ========== TASK SELECTION DROPDOWN ==========
-        # User selects one of 21 available NLP tasks
-        # Each task has an emoji icon for better UX
-        task = st.selectbox(
-            "🎯 Select NLP Task",
-            [
-                "💭 Sentiment Analysis",
-                "🌐 Language Translation (English → Bangla)",
-                "🔍 Language Detection",
-                "📝 Text Summarization",
-                "🔑 Keyword Extraction",
-                "👤 Named Entity Recognition",
-                "📚 Part-of-Speech Tagging",
-                "🏷️ Topic Modeling",
-                "📊 Text Classification",
-                "❓ Question Answering",
-                "✍️ Text Generation",
-                "😊 Emotion Detection",
-                "🎯 Intent Detection",
-                "🔄 Paraphrase Detection",
-                "✏️ Text Paraphrasing",
-                "✅ Grammar Correction",
-                "⚠️ Hate Speech Detection",
-                "🚫 Spam Detection",
-                "📰 Fake News Detection",
-                "📖 Text Simplification",
-                "💡 Opinion Mining"
-            ]
-        )
-
-        # ========== TEXT INPUT AREA ==========
-        # Paraphrase Detection needs two separate inputs, handled differently
-        if task == "🔄 Paraphrase Detection":
-            user_text = None  # Will use separate inputs later
-        else:
-            # Standard single text area for most tasks
-            user_text = st.text_area("📄 Enter your text", height=150, placeholder="Type or paste your text here...")
-
-        # ========== RUN ANALYSIS BUTTON ==========
-        # When clicked, generates appropriate prompt and calls Gemini API
-        if st.button("🚀 Run Analysis", use_container_width=True):
-            # Show loading spinner while processing
-            with st.spinner("🔄 Processing..."):
-
-                # ========== PROMPT ENGINEERING ==========
-                # Each task has a specific prompt template optimized for Gemini
-                # The prompts are designed to get structured, useful responses
-
-                if task == "💭 Sentiment Analysis":
-                    prompt = f"Analyze the sentiment of this text and classify it as Positive, Negative, or Neutral with confidence score: {user_text}"
-
-                elif task == "🌐 Language Translation (English → Bangla)":
-                    prompt = f"Translate this English text to Bangla (Bengali): {user_text}"
-
-                elif task == "🔍 Language Detection":
-                    prompt = f"Detect the language of this text and provide the language name: {user_text}"
-
-                elif task == "📝 Text Summarization":
-                    prompt = f"Provide a concise summary of this text: {user_text}"
-
-                elif task == "🔑 Keyword Extraction":
-                    prompt = f"Extract the most important keywords and key phrases from this text: {user_text}"
-
-                elif task == "👤 Named Entity Recognition":
-                    prompt = f"Identify and categorize named entities (Person, Organization, Location, Date, etc.) in this text: {user_text}"
-
-                elif task == "📚 Part-of-Speech Tagging":
-                    prompt = f"Tag each word in this sentence with its part of speech (noun, verb, adjective, etc.): {user_text}"
-
-                elif task == "🏷️ Topic Modeling":
-                    prompt = f"Identify the main topic and sub-topics of this text: {user_text}"
-
-                elif task == "📊 Text Classification":
-                    prompt = f"Classify this text into appropriate categories (e.g., Technology, Sports, Politics, Entertainment, Business, Health, Science): {user_text}"
-
-                elif task == "❓ Question Answering":
-                    prompt = f"Provide a detailed and accurate answer to this question: {user_text}"
-
-                elif task == "✍️ Text Generation":
-                    prompt = f"Generate creative and engaging text based on this prompt: {user_text}"
-
-                elif task == "😊 Emotion Detection":
-                    prompt = f"Detect and identify the specific emotions (joy, sadness, anger, fear, surprise, disgust, etc.) expressed in this text: {user_text}"
-
-                elif task == "🎯 Intent Detection":
-                    prompt = f"Detect the user's intent in this text (e.g., question, request, complaint, feedback, greeting, booking): {user_text}"
-
-                elif task == "🔄 Paraphrase Detection":
-                    text1 = st.text_input("📄 First sentence")
-                    text2 = st.text_input("📄 Second sentence")
-                    prompt = f"Analyze if these two sentences are paraphrases (convey the same meaning):\n1. {text1}\n2. {text2}\nProvide a Yes/No answer with explanation."
-
-                elif task == "✏️ Text Paraphrasing":
-                    prompt = f"Paraphrase this text while maintaining its original meaning: {user_text}"
-
-                elif task == "✅ Grammar Correction":
-                    prompt = f"Correct all grammar, spelling, and punctuation errors in this text and explain the corrections: {user_text}"
-
-                elif task == "⚠️ Hate Speech Detection":
-                    prompt = f"Analyze if this text contains hate speech, offensive language, or harmful content. Classify as: Safe, Warning, or Harmful: {user_text}"
-
-                elif task == "🚫 Spam Detection":
-                    prompt = f"Analyze if this text is spam/promotional content or legitimate. Classify as Spam or Not Spam with confidence score: {user_text}"
-
-                elif task == "📰 Fake News Detection":
-                    prompt = f"Analyze this text for potential misinformation, fake news, or unreliable claims. Provide credibility assessment: {user_text}"
-
-                elif task == "📖 Text Simplification":
-                    prompt = f"Simplify this text to make it easier to understand for a general audience: {user_text}"
-
-                elif task == "💡 Opinion Mining":
-                    prompt = f"Extract and analyze opinions, attitudes, and subjective information from this text: {user_text}"
+        task_form()
 
-                response = model.generate_content(prompt)
-                
-                st.markdown("---")
-                st.markdown("### ✅ Analysis Result")
-                st.markdown(f'<div class="task-card">{response.text}</div>', unsafe_allow_html=True)
+    # ========== RIGHT COLUMN: Quick Stats ==========
+    # Drawn after the task form so a full rerun shows this run's numbers
+    with col2:
+        stats_panel()
 
+    st.caption(f"Signed in as {user.name} ({user.email})")
     if st.button("Logout"):
+        auth.logout(st.session_state.pop("auth_token", None))
         st.session_state.logged_in = False
-        st.rerun()
\ No newline at end of file
+        st.rerun()
+
+metrics.observe_stage("ui_rerun", time.perf_counter() - rerun_started)
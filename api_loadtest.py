@@ -0,0 +1,181 @@
+"""
+AI NLP Toolkit - HTTP API Load Test
+===================================
+Description: Drives the HTTP API (api_server.py) with many concurrent
+            keep-alive clients and reports throughput, latency and how
+            often the server pushed back with 429.
+
+By default the server is started in this process on a free port, with
+the offline fake Gemini backend (fake_backend.py) standing in for the
+network, so no API key is needed. Use --url to load-test a running
+server instead.
+
+Each client holds one connection open and sends requests back to back:
+single-text calls for a cycle of tasks, plus a batch call every
+--batch-every requests. Responses with status 429 are counted, not
+retried.
+
+Usage:
+    python api_loadtest.py --clients 50 --requests 40
+    python api_loadtest.py --clients 200 --queue 64 --latency lognormal:0.3,0.4
+    python api_loadtest.py --url http://127.0.0.1:8080 --clients 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from benchmark import percentile
+
+TASK_CYCLE = ("sentiment", "spam", "emotion", "keywords", "summarization", "language_detection")
+
+
+class Client:
+    """Minimal HTTP/1.1 JSON client over one keep-alive connection."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.__reader = None
+        self.__writer = None
+
+    async def request(self, method, path, payload=None):
+        """
+        Send one request, reconnecting if the server closed the connection.
+
+        Returns:
+            tuple: (status code, parsed JSON body or text)
+        """
+        if self.__writer is None:
+            self.__reader, self.__writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+        self.__writer.write(head.encode("latin-1") + body)
+        await self.__writer.drain()
+
+        lines = (await self.__reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ")[1])
+        headers = {name.strip().lower(): value.strip()
+                   for name, _, value in (line.partition(":") for line in lines[1:] if line)}
+        data = await self.__reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        if headers.get("content-type", "").startswith("application/json"):
+            return status, json.loads(data)
+        return status, data.decode("utf-8")
+
+    async def close(self):
+        if self.__writer is not None:
+            self.__writer.close()
+            self.__writer = None
+
+
+async def run_client(number, host, port, requests, batch_every, batch_size, results):
+    client = Client(host, port)
+    try:
+        for i in range(requests):
+            task_id = TASK_CYCLE[(number + i) % len(TASK_CYCLE)]
+            text = f"Client {number} message {i}: the delivery was late but support was helpful."
+            if batch_every and i % batch_every == batch_every - 1:
+                kind, path = "batch", f"/tasks/{task_id}/batch"
+                payload = {"items": [{"text": f"{text} (item {n})"} for n in range(batch_size)]}
+            else:
+                kind, path, payload = "single", f"/tasks/{task_id}", {"text": text}
+            start = time.perf_counter()
+            try:
+                status, _ = await client.request("POST", path, payload)
+            except (OSError, asyncio.IncompleteReadError) as e:
+                status = type(e).__name__
+                await client.close()
+            results.append((kind, status, time.perf_counter() - start))
+    finally:
+        await client.close()
+
+
+def summarize(results, elapsed):
+    report = {"requests": len(results), "seconds": round(elapsed, 3),
+              "requests_per_sec": round(len(results) / elapsed, 1) if elapsed else None,
+              "status": dict(Counter(str(status) for _, status, _ in results))}
+    for kind in ("single", "batch"):
+        ok = [seconds for k, status, seconds in results if k == kind and status == 200]
+        report[kind] = {"ok": len(ok), "p50_ms": _ms(percentile(ok, 50)), "p95_ms": _ms(percentile(ok, 95)),
+                        "p99_ms": _ms(percentile(ok, 99))}
+    rejected = sum(1 for _, status, _ in results if status == 429)
+    report["rejected_rate"] = round(rejected / len(results), 4) if results else 0.0
+    return report
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+async def main_async(args):
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        os.environ.setdefault("NLP_CACHE", "0")
+        from api_server import APIServer
+        from fake_backend import FakeBackend
+        from gemini_client import use_backend
+
+        use_backend(FakeBackend(latency=args.latency, error_rate=args.error_rate))
+        server = APIServer("127.0.0.1", 0, workers=args.workers, queue_size=args.queue)
+        await server.start()
+        host, port = server.host, server.port
+
+    results = []
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_client(n, host, port, args.requests, args.batch_every, args.batch_size, results)
+                               for n in range(args.clients)))
+    finally:
+        elapsed = time.perf_counter() - start
+        if server is not None:
+            await server.stop()
+    report = summarize(results, elapsed)
+    report["meta"] = {"clients": args.clients, "requests_per_client": args.requests,
+                      "target": args.url or f"in-process (fake backend, {args.latency})",
+                      "workers": server.workers if server else None, "queue": server.queue_size if server else None}
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the HTTP JSON API.")
+    parser.add_argument("--url", help="Running server to test (default: start one in-process)")
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent keep-alive connections")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--batch-every", type=int, default=5, help="Every Nth request is a batch (0: none)")
+    parser.add_argument("--batch-size", type=int, default=10, help="Items per batch request")
+    parser.add_argument("--workers", type=int, help="Server workers (in-process server only)")
+    parser.add_argument("--queue", type=int, help="Server queue size (in-process server only)")
+    parser.add_argument("--latency", default="fixed:0.05", help="Fake Gemini latency spec (see fake_backend.py)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake Gemini error rate")
+    parser.add_argument("--out", help="Also save the report as JSON here")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(main_async(args))
+    print(f"API load test: {args.clients} clients x {args.requests} requests against {report['meta']['target']}")
+    print(f"  {report['requests']} requests in {report['seconds']}s ({report['requests_per_sec']}/s), "
+          f"status {report['status']}, 429 rate {report['rejected_rate']:.1%}")
+    for kind in ("single", "batch"):
+        numbers = report[kind]
+        print(f"  {kind:<7} {numbers['ok']:>6} ok  p50 {numbers['p50_ms']} ms  p95 {numbers['p95_ms']} ms  "
+              f"p99 {numbers['p99_ms']} ms")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {args.out}")
+    failed = sum(n for status, n in report["status"].items() if status not in ("200", "429"))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
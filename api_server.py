@@ -0,0 +1,430 @@
+"""
+AI NLP Toolkit - HTTP JSON API
+==============================
+Description: Serves all 21 tasks over HTTP/1.1 so other services can call
+            the toolkit, using the same prompts, cache and resilience
+            policy as the CLI and the web UI.
+
+Endpoints:
+    GET  /health                   status and queue depth
+    GET  /tasks                    task ids, names and input fields
+    POST /tasks/<id>               {"text": "..."} -> {"task", "result"}
+    POST /tasks/<id>/batch         {"items": [{"text": "..."}, ...]}
+                                   -> {"task", "results": [{"result"} | {"error"}]}
+    GET  /metrics                  Prometheus text (metrics.py)
+
+Request bodies use the task's input field names, like the batch mode's
+JSONL records (paraphrase_detection takes "text1" and "text2").
+
+The server runs on asyncio (standard library only). Connections are
+kept alive between requests. Each task call becomes a job on a bounded
+queue, which a fixed pool of worker coroutines drains through the
+AsyncEngine (concurrency and quota limits, see async_engine.py). When the
+queue cannot take a request's jobs, the request is refused with 429 and
+a Retry-After header instead of piling up; a batch is accepted or refused
+as a whole.
+
+With micro-batching on (NLP_API_MICRO_BATCH or `serve --micro-batch`),
+single-text calls of batchable tasks (sentiment, spam, ...) from all
+clients are handed to a MicroBatcher per task, which packs them into one
+Gemini request per batch (microbatch.py). Calls waiting in a batcher
+still count against the queue limit.
+
+Settings come from the environment (command-line flags take precedence):
+    NLP_API_HOST        bind address (default 127.0.0.1)
+    NLP_API_PORT        port (default 8080)
+    NLP_API_WORKERS     worker coroutines (default GEMINI_CONCURRENCY or 8)
+    NLP_API_QUEUE       jobs waiting for a worker before 429 (default 256)
+    NLP_API_MAX_BODY    max request body in bytes (default 1 MiB)
+    NLP_API_MAX_BATCH   max items per batch request (default 100)
+    NLP_API_IDLE        seconds an idle keep-alive connection stays open (default 30)
+    NLP_API_MICRO_BATCH max calls packed per request for batchable tasks (default 0: off)
+    NLP_API_MICRO_WAIT  ms a call waits for its batch to fill (default 50)
+
+Usage:
+    python app.py serve --port 8080
+    curl -s localhost:8080/tasks/sentiment -d '{"text": "I love it"}'
+    curl -s localhost:8080/tasks/spam/batch -d '{"items": [{"text": "WIN!"}, {"text": "hi"}]}'
+"""
+
+import asyncio
+import json
+import os
+import time
+from http import HTTPStatus
+
+from async_engine import AsyncEngine
+from batch import record_inputs
+from metrics import metrics
+from preprocess import dedupe
+from resilience import CircuitOpenError
+from tasks import TASKS, TASKS_BY_ID
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_QUEUE = 256
+DEFAULT_MAX_BODY = 1 << 20
+DEFAULT_MAX_BATCH = 100
+DEFAULT_IDLE = 30
+MAX_HEADER_BYTES = 16 * 1024
+RETRY_AFTER_SECONDS = 1
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+class HTTPError(Exception):
+    """An error response: status code and a message for the JSON body."""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+# ============================
+# WORK QUEUE
+# ============================
+
+class WorkQueue:
+    """
+    Bounded job queue drained by a fixed pool of worker coroutines.
+
+    Attributes:
+        workers (int): Number of worker coroutines
+        capacity (int): Jobs that may wait for a worker or a micro-batch
+        rejected (int): Jobs refused because the queue was full
+        micro_batch (int): Max jobs packed per request (below 2: off)
+        micro_wait_ms (int): How long a micro-batch waits to fill up
+    """
+
+    def __init__(self, engine, workers, capacity, micro_batch=0, micro_wait_ms=None):
+        self.engine = engine
+        self.workers = workers
+        self.capacity = capacity
+        self.rejected = 0
+        self.micro_batch = micro_batch
+        self.micro_wait_ms = micro_wait_ms
+        self.__queue = asyncio.Queue(maxsize=capacity)
+        self.__tasks = []
+        self.__batchers = {}  # task id -> MicroBatcher
+        self.__batched = 0    # jobs handed to a batcher and not answered yet
+
+    def start(self):
+        self.__tasks = [asyncio.create_task(self.__worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self.__tasks:
+            task.cancel()
+        await asyncio.gather(*self.__tasks, return_exceptions=True)
+        for batcher in self.__batchers.values():
+            await asyncio.to_thread(batcher.close)
+
+    @property
+    def depth(self):
+        return self.__queue.qsize() + self.__batched
+
+    def submit_all(self, jobs):
+        """
+        Queue (task id, inputs) jobs, all or none.
+
+        Returns:
+            list: One future per job (result text, or the task's exception)
+
+        Raises:
+            HTTPError: 429 if the queue has no room for every job
+        """
+        if self.capacity - self.depth < len(jobs):
+            self.rejected += len(jobs)
+            raise HTTPError(HTTPStatus.TOO_MANY_REQUESTS, "Server busy, retry later",
+                            {"Retry-After": str(RETRY_AFTER_SECONDS)})
+        loop = asyncio.get_running_loop()
+        futures = []
+        for task_id, inputs in jobs:
+            future = loop.create_future()
+            # Cannot fail: room was checked above and nothing awaits in between
+            self.__queue.put_nowait((task_id, inputs, future))
+            futures.append(future)
+        metrics.adjust_in_flight("api_queue", len(jobs))
+        return futures
+
+    async def __worker(self):
+        while True:
+            task_id, inputs, future = await self.__queue.get()
+            metrics.adjust_in_flight("api_queue", -1)
+            try:
+                batcher = self.__batcher(task_id, inputs)
+                if future.cancelled():
+                    pass
+                elif batcher is not None:
+                    self.__hand_off(batcher, inputs[0], future)
+                else:
+                    future.set_result(await self.engine.run_task(task_id, *inputs))
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            finally:
+                self.__queue.task_done()
+
+    def __batcher(self, task_id, inputs):
+        # Only single-text jobs of batchable tasks are packed
+        if self.micro_batch < 2 or len(inputs) != 1 or not TASKS_BY_ID[task_id].batchable:
+            return None
+        batcher = self.__batchers.get(task_id)
+        if batcher is None:
+            from microbatch import DEFAULT_MAX_WAIT_MS, MicroBatcher
+            batcher = self.__batchers[task_id] = MicroBatcher(
+                task_id, self.micro_batch, self.micro_wait_ms or DEFAULT_MAX_WAIT_MS,
+                workers=self.engine.concurrency, engine=self.engine)
+        return batcher
+
+    def __hand_off(self, batcher, text, future):
+        # The worker moves on; the job's future is answered when its batch returns
+        self.__batched += 1
+        answer = asyncio.wrap_future(batcher.submit(text))
+
+        def done(answer):
+            self.__batched -= 1
+            if future.cancelled():
+                return
+            if answer.exception() is not None:
+                future.set_exception(answer.exception())
+            else:
+                future.set_result(answer.result())
+
+        answer.add_done_callback(done)
+
+
+# ============================
+# API SERVER CLASS
+# ============================
+
+class APIServer:
+    """
+    HTTP/1.1 JSON API over the task registry.
+
+    Attributes:
+        host (str), port (int): Listening address (port 0 picks a free one)
+        max_body (int): Max request body in bytes
+        max_batch (int): Max items per batch request
+        idle_timeout (float): Seconds before an idle connection is closed
+    """
+
+    def __init__(self, host=None, port=None, workers=None, queue_size=None, max_body=None, max_batch=None,
+                 idle_timeout=None, engine=None, micro_batch=None):
+        self.host = host or os.getenv("NLP_API_HOST", DEFAULT_HOST)
+        self.port = _env_int("NLP_API_PORT", DEFAULT_PORT) if port is None else port
+        self.engine = engine or AsyncEngine()
+        self.workers = workers or _env_int("NLP_API_WORKERS", self.engine.concurrency)
+        self.queue_size = queue_size or _env_int("NLP_API_QUEUE", DEFAULT_QUEUE)
+        self.max_body = max_body or _env_int("NLP_API_MAX_BODY", DEFAULT_MAX_BODY)
+        self.max_batch = max_batch or _env_int("NLP_API_MAX_BATCH", DEFAULT_MAX_BATCH)
+        self.idle_timeout = idle_timeout or float(os.getenv("NLP_API_IDLE", DEFAULT_IDLE))
+        self.micro_batch = _env_int("NLP_API_MICRO_BATCH", 0) if micro_batch is None else micro_batch
+        self.micro_wait_ms = _env_int("NLP_API_MICRO_WAIT", 0) or None
+        self.queue = None
+        self.__server = None
+        self.__connections = {}  # handler task -> StreamWriter
+        # Task list for GET /tasks, built once
+        self.__task_list = json.dumps({"tasks": [
+            {"id": task.id, "name": task.name, "inputs": list(task.template.fields)} for task in TASKS
+        ]}).encode("utf-8")
+
+    async def start(self):
+        """Start listening; returns once the socket is bound (see self.port)."""
+        self.queue = WorkQueue(self.engine, self.workers, self.queue_size, self.micro_batch, self.micro_wait_ms)
+        self.queue.start()
+        self.__server = await asyncio.start_server(self.__connection, self.host, self.port,
+                                                   limit=MAX_HEADER_BYTES)
+        self.port = self.__server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stop accepting, close open connections, then stop the workers."""
+        self.__server.close()
+        await self.__server.wait_closed()
+        # Idle keep-alive connections see end-of-stream and their handlers return
+        for writer in self.__connections.values():
+            writer.close()
+        await asyncio.gather(*self.__connections, return_exceptions=True)
+        await self.queue.stop()
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"NLP API listening on http://{self.host}:{self.port} "
+              f"({self.workers} workers, queue {self.queue_size})")
+        try:
+            await self.__server.serve_forever()
+        finally:
+            await self.stop()
+
+    # ---------- connections ----------
+
+    async def __connection(self, reader, writer):
+        self.__connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self.__read_request(reader), self.idle_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HTTPError as e:
+                    # The rest of the stream cannot be trusted after a bad request
+                    await self.__send(writer, e.status, {"error": str(e)}, False, e.headers)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                start = time.perf_counter()
+                try:
+                    status, payload = await self.__route(method, path, body)
+                    extra = {}
+                except HTTPError as e:
+                    status, payload, extra = e.status, {"error": str(e)}, e.headers
+                metrics.observe_stage("api_request", time.perf_counter() - start)
+                await self.__send(writer, status, payload, keep_alive, extra)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            del self.__connections[asyncio.current_task()]
+            writer.close()
+
+    async def __read_request(self, reader):
+        # Returns (method, path, headers, body), or None at a clean end of stream
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request headers too large") from None
+        except asyncio.IncompleteReadError as e:
+            if not e.partial.strip():
+                return None
+            raise
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _version = lines[0].split(" ")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line") from None
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "Chunked bodies are not supported; send Content-Length")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length") from None
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > self.max_body:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Body larger than {self.max_body} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], headers, body
+
+    async def __send(self, writer, status, payload, keep_alive, headers=None):
+        # dict -> JSON, bytes -> pre-encoded JSON, str -> Prometheus text
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        status = HTTPStatus(status)
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}",
+                 f"Content-Type: {content_type}",
+                 f"Content-Length: {len(body)}",
+                 "Connection: keep-alive" if keep_alive else "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    # ---------- routing ----------
+
+    async def __route(self, method, path, body):
+        parts = [part for part in path.split("/") if part]
+        if parts == ["health"] and method == "GET":
+            return HTTPStatus.OK, {"status": "ok", "queue": self.queue.depth, "workers": self.workers,
+                                   "rejected": self.queue.rejected}
+        if parts == ["tasks"] and method == "GET":
+            return HTTPStatus.OK, self.__task_list
+        if parts == ["metrics"] and method == "GET":
+            return HTTPStatus.OK, metrics.to_prometheus()
+        if len(parts) in (2, 3) and parts[0] == "tasks" and parts[2:] in ([], ["batch"]):
+            if method != "POST":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST")
+            task = TASKS_BY_ID.get(parts[1])
+            if task is None:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown task '{parts[1]}'")
+            data = _parse_json(body)
+            if len(parts) == 3:
+                return HTTPStatus.OK, await self.__batch(task, data)
+            return HTTPStatus.OK, await self.__single(task, data)
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {method} {path}")
+
+    async def __single(self, task, data):
+        inputs = _inputs(task, data)
+        future, = self.queue.submit_all([(task.id, inputs)])
+        try:
+            result = await future
+        except Exception as e:
+            raise _upstream_error(e) from None
+        return {"task": task.id, "result": result}
+
+    async def __batch(self, task, data):
+        items = data.get("items") if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be {\"items\": [...]} with at least one item")
+        if len(items) > self.max_batch:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"At most {self.max_batch} items per batch")
+        # Bad items get their error in place; the others are queued together,
+        # identical inputs once (preprocess.py)
+        results = [None] * len(items)
+        valid, positions = [], []
+        for i, item in enumerate(items):
+            try:
+                valid.append(_inputs(task, item))
+                positions.append(i)
+            except HTTPError as e:
+                results[i] = {"error": str(e)}
+        unique, slots = dedupe(valid)
+        futures = self.queue.submit_all([(task.id, inputs) for inputs in unique]) if unique else []
+        outcomes = await asyncio.gather(*futures, return_exceptions=True)
+        for i, slot in zip(positions, slots):
+            outcome = outcomes[slot]
+            results[i] = {"error": str(outcome)} if isinstance(outcome, Exception) else {"result": outcome}
+        return {"task": task.id, "results": results}
+
+
+def _parse_json(body):
+    try:
+        return json.loads(body or b"null")
+    except ValueError as e:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}") from None
+
+
+def _inputs(task, record):
+    # Same record shape as batch mode: the task's template field names
+    if not isinstance(record, dict):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a JSON object")
+    try:
+        return record_inputs(task, record)
+    except ValueError as e:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, str(e)) from None
+
+
+def _upstream_error(error):
+    if isinstance(error, CircuitOpenError):
+        return HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, str(error), {"Retry-After": str(RETRY_AFTER_SECONDS)})
+    return HTTPError(HTTPStatus.BAD_GATEWAY, f"{type(error).__name__}: {error}")
+
+
+def serve(host=None, port=None, workers=None, queue_size=None, micro_batch=None):
+    """Run the API server until interrupted (blocking)."""
+    server = APIServer(host, port, workers, queue_size, micro_batch=micro_batch)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
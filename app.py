@@ -10,22 +10,59 @@ Features:
 - Terminal-based user authentication
 - 21 different NLP tasks accessible via numbered menu
 - Simple and fast - no web browser required
-- Session-based user management (in-memory database)
+- Shared user accounts (auth.py: SQLite store, salted password hashes)
 
 Usage:
-    python app.py
+    python app.py                                   # interactive menu
+    python app.py --version / --list-tasks          # no Gemini SDK import
+    python app.py run --task sentiment --in corpus.jsonl --out results.jsonl
+    cat corpus.jsonl | python app.py run --task spam > results.jsonl
+    printf 'sentiment\\tI love it\\n' | python app.py pipe   # task<TAB>text per line
+    printf 'all\\tWIN A FREE PHONE\\n' | python app.py pipe  # every default task, one request
+    python app.py pipe --structured < lines.tsv     # JSON results (see structured.py)
+    NLP_STRUCTURED=1 python app.py                  # compact JSON answers, rendered locally
+    python app.py serve --port 8080                 # HTTP JSON API (see api_server.py)
+    python app.py job start --task sentiment --in corpus.jsonl --out results.jsonl   # resumable (jobs.py)
+    python app.py job resume 3 / job status / job export 3 --out results.csv
 
 Note: This is a CLI alternative to UI_streamlit.py
-      User data is stored in memory and lost when app exits.
+      Accounts are shared with the web UI through the user store (auth.py).
 """
 
-import google.generativeai as genai
-from dotenv import load_dotenv 
+import argparse
+import json
 import os
+import sys
 
-# Load environment variables from .env file
-# This file should contain: GOOGLE_API_KEY or GEMINI_API_KEY
-load_dotenv()
+# gemini_client loads the .env file (GOOGLE_API_KEY or GEMINI_API_KEY) on
+# import; the Gemini SDK itself is only imported by the first model call
+from auth import AuthError, get_auth
+from batch import run_file
+from gemini_client import get_model, warm_up
+from metrics import metrics
+from multitask import run_multi_task
+from preprocess import saved_line
+from structured import StructuredOutputError, run_structured, supports_structured, to_json
+from tasks import TASK_IDS, TASKS, TASKS_BY_NUMBER, get_task, run_task, stream_task
+
+__version__ = "1.1.0"
+
+# Menu number / pipe name of "Analyze everything" (see multitask.py)
+MULTI_CHOICE = str(len(TASKS) + 1)
+MULTI_NAME = "all"
+
+# Task menu text, built once from the task registry
+TASK_MENU = "\n".join(
+    ["", "        ========================================",
+     "        🤖 AI NLP Toolkit - Select Task",
+     "        ========================================"]
+    + [f"        {(task.number + '.').ljust(3)} {task.label}" for task in TASKS]
+    + [f"        {(MULTI_CHOICE + '.').ljust(3)} 🧩 Analyze Everything (one request)",
+       "        0.  🚪 Exit",
+       "        ========================================",
+       "        Enter your choice: ",
+       "        "]
+)
 
 # ============================
 # BASE MODEL CLASS
@@ -41,7 +78,10 @@ class BaseModel:
     
     def getmodel(self):
         """
-        Initialize and return the Gemini AI model.
+        Return the shared Gemini AI model.
+        
+        The client comes from the process-wide pool in gemini_client.py,
+        so it is built once and reused by every task call.
         
         Returns:
             GenerativeModel: Configured Gemini model instance
@@ -50,10 +90,8 @@ class BaseModel:
             Exception: If API key is invalid or model initialization fails
         """
         try:
-            # Configure Gemini with API key from environment
-            genai.configure(api_key = os.getenv("GEMINI_API_KEY"))
-            # Initialize Gemini 2.5 Flash model (fast and cost-effective)
-            model = genai.GenerativeModel("gemini-2.5-flash")
+            # Gemini 2.5 Flash model (fast and cost-effective), built once
+            model = get_model("gemini-2.5-flash")
             return model
         except Exception as e:
             print(f"Error initializing model: {e}")
@@ -71,18 +109,46 @@ class AppFeatures(BaseModel):
     Inherits from BaseModel to access Gemini AI capabilities.
     Manages user authentication and provides menu-driven access to 21 NLP tasks.
     
+    Every screen (first menu, register, login, task menu, task) is a method
+    that returns the next screen instead of calling it, and run() loops over
+    them. The stack depth stays the same however long the session lasts.
+    
     Attributes:
-        __database (dict): In-memory user database {email: [name, password]}
+        __auth (Auth): Shared user and session store (auth.py)
+        __token (str): Session token after a successful login
     """
     
     def __init__(self):
         """
         Initialize the application.
         
-        Creates empty user database and shows the first menu (login/register).
+        Connects to the user store. Call run() to show the first menu.
         """
-        self.__database = {}  # Private: stores registered users
-        self.first_menu()     # Start the application flow
+        self.__auth = get_auth()  # Private: registered users and sessions
+        self.__token = None
+        
+        # Optional: ask for JSON results and render them here (structured.py)
+        self.__structured = os.getenv("NLP_STRUCTURED") == "1"
+        
+        # Optional: open the Gemini connection before the first task
+        if os.getenv("GEMINI_WARMUP") == "1":
+            warm_up()
+    
+    def run(self):
+        """
+        Run the interactive session until the user exits.
+        
+        Each screen returns the next one as a (method, args) pair, or None
+        to quit. Ctrl-D / end of input also ends the session.
+        """
+        screen = (self.first_menu, ())
+        try:
+            while screen is not None:
+                method, args = screen
+                screen = method(*args)
+        except (EOFError, KeyboardInterrupt):
+            print()
+        print("Thank you for using AI NLP Toolkit! Goodbye! 👋")
     
     def first_menu(self):
         """
@@ -92,6 +158,9 @@ class AppFeatures(BaseModel):
         1. Register a new account
         2. Login to existing account
         3. Exit the application
+        
+        Returns:
+            tuple: Next screen, or None to exit
         """
         first_input = input(
             """
@@ -107,102 +176,40 @@ class AppFeatures(BaseModel):
         # Handle user choice
         if first_input =="1":
             # Navigate to registration
-            self.__register()
+            return self.__register, ()
             
         elif first_input =="2":
             # Navigate to login
-            self.__login()
+            return self.__login, ()
         else:
             # Exit the application
-            exit()
+            return None
         
         
     def second_menu(self):
         """
         Display the main NLP tasks menu (shown after login).
         
-        Presents 21 different NLP tasks and routes to appropriate handler.
-        Each task calls Gemini AI with a specific prompt template.
-        """
-        second_input = input(
-        """
-        ========================================
-        🤖 AI NLP Toolkit - Select Task
-        ========================================
-        1.  💭 Sentiment Analysis
-        2.  🌐 Language Translation (Bangla)
-        3.  🔍 Language Detection
-        4.  📝 Text Summarization
-        5.  🔑 Keyword Extraction
-        6.  👤 Named Entity Recognition
-        7.  📚 Part-of-Speech Tagging
-        8.  🏷️ Topic Modeling
-        9.  📊 Text Classification
-        10. ❓ Question Answering
-        11. ✍️ Text Generation
-        12. 😊 Emotion Detection
-        13. 🎯 Intent Detection
-        14. 🔄 Paraphrase Detection
-        15. ✏️ Text Paraphrasing
-        16. ✅ Grammar Correction
-        17. ⚠️ Hate Speech Detection
-        18. 🚫 Spam Detection
-        19. 📰 Fake News Detection
-        20. 📖 Text Simplification
-        21. 💡 Opinion Mining
-        0.  🚪 Exit
-        ========================================
-        Enter your choice: 
+        Presents 21 different NLP tasks and routes to the shared task runner.
+        The menu and dispatch both come from the task registry in tasks.py.
+        
+        Returns:
+            tuple: Next screen, or None to exit
         """
-    )
-        if second_input == "1":
-            self.__sentiment_analysis()
-        elif second_input == "2":
-            self.__language_translation()
-        elif second_input == "3":
-            self.__language_detection()
-        elif second_input == "4":
-            self.__text_summarization()
-        elif second_input == "5":
-            self.__keyword_extraction()
-        elif second_input == "6":
-            self.__named_entity_recognition()
-        elif second_input == "7":
-            self.__part_of_speech_tagging()
-        elif second_input == "8":
-            self.__topic_modeling()
-        elif second_input == "9":
-            self.__text_classification()
-        elif second_input == "10":
-            self.__question_answering()
-        elif second_input == "11":
-            self.__text_generation()
-        elif second_input == "12":
-            self.__emotion_detection()
-        elif second_input == "13":
-            self.__intent_detection()
-        elif second_input == "14":
-            self.__paraphrase_detection()
-        elif second_input == "15":
-            self.__text_paraphrasing()
-        elif second_input == "16":
-            self.__grammar_correction()
-        elif second_input == "17":
-            self.__hate_speech_detection()
-        elif second_input == "18":
-            self.__spam_detection()
-        elif second_input == "19":
-            self.__fake_news_detection()
-        elif second_input == "20":
-            self.__text_simplification()
-        elif second_input == "21":
-            self.__opinion_mining()
+        second_input = input(TASK_MENU).strip()
+        
+        # O(1) dispatch by menu number
+        task = TASKS_BY_NUMBER.get(second_input)
+        if task is not None:
+            return self.__run_task, (task,)
+        elif second_input == MULTI_CHOICE:
+            return self.__run_multi_task, ()
         elif second_input == "0":
-            print("Thank you for using AI NLP Toolkit! Goodbye! 👋")
-            exit()
+            self.__auth.logout(self.__token)
+            return None
         else:
             print("❌ Invalid choice! Please try again.")
-            self.second_menu()
+            return self.second_menu, ()
     
     
     def __register(self):
@@ -211,7 +218,7 @@ class AppFeatures(BaseModel):
         
         Collects name, email, and password.
         Checks for duplicate emails before creating account.
-        Stores user in in-memory database.
+        Stores the user (with a salted password hash) in the user store.
         
         Flow: Register → Return to first_menu → Login
         """
@@ -220,250 +227,303 @@ class AppFeatures(BaseModel):
         email = input("Enter your Email: ")
         password = input("Enter your Password: ")
         
-        # Check if email already exists
-        if email in self.__database:
-            print("Email already exists ")
-        else:
-            # Store new user: email -> [name, password]
-            self.__database[email] = [name, password]
-            
+        # The store refuses duplicate emails
+        try:
+            self.__auth.register(name, email, password)
             print("Registration successful. Now you can login!")
+        except AuthError as e:
+            print(e)
         # Return to first menu for login
-        self.first_menu()
+        return self.first_menu, ()
         
         
     def __login(self):
         """
         Handle user login process.
         
-        Verifies email and password against database.
+        Verifies email and password against the user store.
         On success: Navigate to second_menu (NLP tasks)
-        On failure: Retry login or redirect to registration
+        On failure: Back to first_menu (retry login or register)
         """
         # Collect login credentials
         email = input("Enter your Email: ")
         password = input("Enter you Password")
         
-        # Verify credentials
-        if email in self.__database:
-            # Email exists, check password
-            if self.__database[email][1] == password:
-                print("Login Sucessfull!")
-                
-                # Navigate to main app (NLP tasks menu)
-                self.second_menu()
-            else:
-                # Wrong password, retry login
-                print("Your password is incorrect! please try again")
-                self.__login()
-                
-        else:
-            # Email not found, redirect to registration
-            print("Email not found! Please register firest")
-            self.first_menu()
+        # Verify credentials (one message for unknown email and wrong password)
+        try:
+            self.__token = self.__auth.login(email, password)
+        except AuthError as e:
+            print(f"{e}. Please try again or register first")
+            return self.first_menu, ()
+        
+        print("Login Sucessfull!")
+        # Navigate to main app (NLP tasks menu)
+        return self.second_menu, ()
     
     # ============================
-    # NLP TASK METHODS
+    # NLP TASK RUNNER
     # ============================
-    # Each method below handles a specific NLP task:
-    # 1. Get user input
-    # 2. Initialize Gemini model
-    # 3. Generate prompt and call AI
-    # 4. Display result
-    # 5. Return to second_menu
+    # Every task follows the same steps:
+    # 1. Get user input (one prompt per input field)
+    # 2. Build the prompt from the task registry and call Gemini
+    # 3. Display result
+    # 4. Return to second_menu
     
-    def __sentiment_analysis(self):
+    def __run_task(self, task):
         """
-        Analyze sentiment of text (Positive/Negative/Neutral).
+        Run one NLP task from the registry.
         
-        Example input: "This movie is amazing!"
-        Expected output: Positive sentiment with confidence score
-        """
-        user_text = input("Enter your text: ")
+        Example: Sentiment Analysis
+            input: "This movie is amazing!"
+            output: Positive sentiment with confidence score
         
-        model = self.getmodel()
-        # Send prompt to Gemini AI
-        response = model.generate_content(f"Give me the sentiment fo this sentence: {user_text}")
-        results = response.text
-        print(results)
-        # Return to task menu
-        self.second_menu()
-    
-    def __language_translation(self):
+        Args:
+            task (Task): Task selected from the menu
         """
-        Translate English text to Bangla (Bengali).
+        inputs = [input(prompt) for prompt in task.cli_prompts]
         
-        Example: "I love programming" → "আমি প্রোগ্রামিং ভালোবাসি"
-        """
-        user_text = input("Enter your text: ")
-        model = self.getmodel()
-        response = model.generate_content(f"Give me Bangla transilation of this sentence: {user_text}")
-        results = response.text
-        print(results)
-        self.second_menu()
+        if self.__structured and supports_structured(task.id):
+            try:
+                result = run_structured(task.id, *inputs)
+                print(f"\n{task.heading or task.label}\n{result.render()}\n")
+                return self.second_menu, ()
+            except StructuredOutputError as e:
+                print(f"(structured reply unusable: {e}; showing the full answer)")
+            except Exception as e:
+                print(f"\n❌ Task failed: {e}\n")
+                return self.second_menu, ()
+        
+        # Send prompt to Gemini AI and print the answer as it streams in
+        # Transient errors are retried in gemini_client; anything left is
+        # reported here so the session keeps going
+        if task.heading:
+            print(f"\n{task.heading}")
+        try:
+            for chunk in stream_task(task.id, *inputs):
+                print(chunk, end="", flush=True)
+            print("\n" if task.heading else "")
+        except Exception as e:
+            print(f"\n❌ Task failed: {e}\n")
+        # Return to task menu
+        return self.second_menu, ()
     
-    def __language_detection(self):
+    def __run_multi_task(self):
         """
-        Detect the language of input text.
+        Run the default task bundle (sentiment, emotion, intent, NER,
+        keywords, spam) on one text with a single combined request.
         
-        Supports multiple languages: English, Bangla, Hindi, French, etc.
+        Each task gets its own section; a task whose section could not be
+        parsed is retried on its own, and a task that still fails is
+        reported without hiding the others.
         """
-        user_text = input("Enter your text: ")
-        model = self.getmodel()
-        response = model.generate_content(f"Detect the language of this sentence: {user_text}")
-        results = response.text
-        print(results)
-        self.second_menu()
-
-    def __text_summarization(self):
-        user_text = input("Enter your text: ")
-        model = self.getmodel()
-        response = model.generate_content(f"Summarize of this sentence: {user_text}")
-        results = response.text
-        print(results)
-        self.second_menu()
-
-    def __keyword_extraction(self):
-        user_text = input("Enter your text: ")
-        model = self.getmodel()
-        response = model.generate_content(f"Extract the important keywords from this sentence: {user_text}")
-        results = response.text
-        print(results)
-        self.second_menu()
-
-    def __named_entity_recognition(self):
-        user_text = input("Enter your text: ")
-        model = self.getmodel()
-        response = model.generate_content(f"Identify named entities (like person, place, organization) in this sentence: {user_text}")
-        results = response.text
-        print(results)
-        self.second_menu()
-
-    def __part_of_speech_tagging(self):
-        user_text = input("Enter your text: ")
-        model = self.getmodel()
-        response = model.generate_content(f"Tag each word in this sentence with its part of speech: {user_text}")
-        results = response.text
-        print(results)
-        self.second_menu()
+        text = input("Enter your text: ")
+        try:
+            results, errors = run_multi_task(text)
+        except Exception as e:
+            print(f"\n❌ Analysis failed: {e}\n")
+            return self.second_menu, ()
+        for task_id, answer in results.items():
+            print(f"\n{get_task(task_id).label}\n{answer}")
+        for task_id, message in errors.items():
+            print(f"\n{get_task(task_id).label}\n❌ Task failed: {message}")
+        print()
+        return self.second_menu, ()
 
-    def __topic_modeling(self):
-        user_text = input("Enter your text: ")
-        model = self.getmodel()
-        response = model.generate_content(f"Identify the main topic of this sentence: {user_text}")
-        results = response.text
-        print(results)
-        self.second_menu()
 
-    def __text_classification(self):
-        user_text = input("Enter your text: ")
-        model = self.getmodel()
-        response = model.generate_content(f"Classify this sentence into a category (e.g. sports, politics, technology): {user_text}")
-        results = response.text
-        print(results)
-        self.second_menu()
+# ============================
+# PIPE MODE
+# ============================
 
-    def __question_answering(self):
-        user_text = input("Enter your question: ")
-        model = self.getmodel()
-        response = model.generate_content(f"Answer the question based on the user question: {user_text}")
-        results = response.text
-        print(results)
-        self.second_menu()
+def _escape(text):
+    # Keep one result per output line
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\r", "\\r").replace("\n", "\\n")
 
-    def __text_generation(self):
-        user_text = input("Enter a prompt: ")
-        model = self.getmodel()
-        response = model.generate_content(f"Generate a short text based on this prompt: {user_text}")
-        results = response.text
-        print(results)
-        self.second_menu()
 
-    def __emotion_detection(self):
-        user_text = input("Enter your text: ")
-        model = self.getmodel()
-        response = model.generate_content(f"Detect the emotion expressed in this sentence (happy, sad, angry, etc.): {user_text}")
-        results = response.text
-        print(results)
-        self.second_menu()
+def run_pipe(stream_in=sys.stdin, stream_out=sys.stdout, structured=False):
+    """
+    Answer `task<TAB>text` lines from a stream, one output line per input line.
+    
+    The task is a task id or a menu number; two-input tasks take a second
+    tab-separated text (`paraphrase_detection<TAB>text1<TAB>text2`). Blank
+    lines and lines starting with # are skipped. Each answer is written as
+    `task<TAB>result` (tabs and newlines escaped as \\t / \\n), or
+    `task<TAB>ERROR<TAB>message`, and flushed straight away, so the session
+    uses constant memory however many lines are piped in.
+    
+    The task name `all` runs the "Analyze everything" bundle (multitask.py)
+    and its result is a JSON object {"results": {...}, "errors": {...}}.
+    With `structured=True`, tasks that have a structured result type
+    (structured.py) answer with compact JSON instead of markdown.
+    
+    Returns:
+        tuple: (lines answered, lines failed)
+    """
+    answered = failed = 0
+    for line in stream_in:
+        line = line.rstrip("\r\n")
+        if not line.strip() or line.startswith("#"):
+            continue
+        name, _, rest = line.partition("\t")
+        name = name.strip()
+        try:
+            if name in (MULTI_NAME, MULTI_CHOICE):
+                results, errors = run_multi_task(rest)
+                result = json.dumps({"results": results, "errors": errors}, ensure_ascii=False)
+            else:
+                task = TASKS_BY_NUMBER.get(name) or get_task(name)
+                inputs = rest.split("\t") if task.arity > 1 else [rest]
+                if structured and supports_structured(task.id):
+                    result = to_json(run_structured(task.id, *inputs))
+                else:
+                    result = run_task(task.id, *inputs)
+            stream_out.write(f"{name}\t{_escape(result)}\n")
+            answered += 1
+        except Exception as e:
+            message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+            stream_out.write(f"{name}\tERROR\t{_escape(message)}\n")
+            failed += 1
+        stream_out.flush()
+    return answered, failed
 
-    def __intent_detection(self):
-        user_text = input("Enter your text: ")
-        model = self.getmodel()
-        response = model.generate_content(f"Detect the intent of this sentence (e.g. booking, inquiry, complaint): {user_text}")
-        results = response.text
-        print(results)
-        self.second_menu()
+# ============================
+# APPLICATION ENTRY POINT
+# ============================
 
-    def __paraphrase_detection(self):
-        text1 = input("Enter first sentence: ")
-        text2 = input("Enter second sentence: ")
-        model = self.getmodel()
-        response = model.generate_content(f"Check if these two sentences mean the same thing:\n1. {text1}\n2. {text2}")
-        results = response.text
-        print(results)
-        self.second_menu()
+def build_parser():
+    """
+    Build the command line parser.
+    
+    With no sub-command the interactive menu starts. The `run` sub-command
+    is the headless batch mode (see batch.py), `job` the same as durable,
+    resumable jobs (see jobs.py), `serve` the HTTP API (see api_server.py).
+    """
+    parser = argparse.ArgumentParser(prog="app.py", description="AI NLP Toolkit powered by Google Gemini")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    parser.add_argument("--list-tasks", action="store_true", help="Print the task ids and names, then exit")
+    commands = parser.add_subparsers(dest="command")
+    
+    run = commands.add_parser("run", help="Run one task over a JSONL/CSV file without prompts")
+    run.add_argument("--task", required=True, choices=TASK_IDS, help="Task id, e.g. sentiment")
+    run.add_argument("--in", dest="in_path", default="-", help="Input file (default: stdin)")
+    run.add_argument("--out", dest="out_path", default="-", help="Output file (default: stdout)")
+    run.add_argument("--in-format", choices=["jsonl", "csv"], help="Input format (default: from file extension)")
+    run.add_argument("--out-format", choices=["jsonl", "csv"], help="Output format (default: same as input)")
+    run.add_argument("--concurrency", type=int, default=1,
+                     help="Requests in flight (default: 1, sequential). Quota from GEMINI_RPM / GEMINI_TPM")
+    run.add_argument("--micro-batch", type=int, default=0,
+                     help="Pack this many records into one request (classification tasks only)")
+    run.add_argument("--metrics-out", help="Write latency/token/cache metrics here when done (.prom or .json)")
+    
+    pipe = commands.add_parser("pipe", help="Answer task<TAB>text lines from stdin, one result line each")
+    pipe.add_argument("--structured", action="store_true",
+                      help="Answer with JSON results for tasks that support it (sentiment, spam, ner, ...)")
+    pipe.add_argument("--metrics-out", help="Write latency/token/cache metrics here when done (.prom or .json)")
+    
+    serve = commands.add_parser("serve", help="Serve every task as an HTTP JSON API")
+    serve.add_argument("--host", help="Bind address (default: NLP_API_HOST or 127.0.0.1)")
+    serve.add_argument("--port", type=int, help="Port (default: NLP_API_PORT or 8080)")
+    serve.add_argument("--workers", type=int, help="Worker coroutines (default: NLP_API_WORKERS or GEMINI_CONCURRENCY)")
+    serve.add_argument("--queue", type=int, help="Queued calls before answering 429 (default: NLP_API_QUEUE or 256)")
+    serve.add_argument("--micro-batch", type=int,
+                       help="Pack up to N calls of batchable tasks per Gemini request (default: NLP_API_MICRO_BATCH or off)")
+    
+    job = commands.add_parser("job", help="Checkpointed batch jobs that resume after a crash or quota stop")
+    job_commands = job.add_subparsers(dest="job_command", required=True)
+    start = job_commands.add_parser("start", help="Create a job from a JSONL/CSV file and run it")
+    start.add_argument("--task", required=True, choices=TASK_IDS + (MULTI_NAME,),
+                       help=f"Task id, or '{MULTI_NAME}' for every default task")
+    start.add_argument("--in", dest="in_path", default="-", help="Input file (default: stdin)")
+    start.add_argument("--in-format", choices=["jsonl", "csv"], help="Input format (default: from file extension)")
+    start.add_argument("--out", dest="out_path", help="Write the results here once the job is done")
+    start.add_argument("--out-format", choices=["jsonl", "csv"], help="Output format (default: same as input)")
+    start.add_argument("--concurrency", type=int, default=1, help="Requests in flight (default: 1)")
+    resume = job_commands.add_parser("resume", help="Continue a job from its checkpoint")
+    resume.add_argument("job_id", type=int)
+    resume.add_argument("--concurrency", type=int, help="Requests in flight (default: as started)")
+    resume.add_argument("--retry-failed", action="store_true", help="Run failed items again too")
+    resume.add_argument("--out", dest="out_path", help="Write the results here once the job is done")
+    status = job_commands.add_parser("status", help="Show progress of one job or all jobs")
+    status.add_argument("job_id", type=int, nargs="?")
+    export = job_commands.add_parser("export", help="Write a job's results in input order")
+    export.add_argument("job_id", type=int)
+    export.add_argument("--out", dest="out_path", default="-", help="Output file (default: stdout)")
+    export.add_argument("--out-format", choices=["jsonl", "csv"], help="Output format (default: from extension)")
+    return parser
 
-    def __text_paraphrasing(self):
-        user_text = input("Enter text to paraphrase (e.g., 'The weather is very hot today'): ")
-        model = self.getmodel()
-        response = model.generate_content(f"Paraphrase this text while maintaining its original meaning: {user_text}")
-        results = response.text
-        print(f"\n\u2705 Paraphrased Text:\n{results}\n")
-        self.second_menu()
 
-    def __grammar_correction(self):
-        user_text = input("Enter text with grammar errors (e.g., 'She don't like going to school everyday'): ")
-        model = self.getmodel()
-        response = model.generate_content(f"Correct all grammar, spelling, and punctuation errors in this text and explain the corrections: {user_text}")
-        results = response.text
-        print(f"\n\u2705 Corrected Text:\n{results}\n")
-        self.second_menu()
+def write_metrics(path):
+    """Save metrics: .prom → Prometheus text format, anything else → JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(metrics.to_prometheus() if path.endswith(".prom") else metrics.to_json())
 
-    def __hate_speech_detection(self):
-        user_text = input("Enter text to analyze (e.g., 'You should try harder next time'): ")
-        model = self.getmodel()
-        response = model.generate_content(f"Analyze if this text contains hate speech, offensive language, or harmful content. Classify as: Safe, Warning, or Harmful: {user_text}")
-        results = response.text
-        print(f"\n\u26a0\ufe0f Analysis Result:\n{results}\n")
-        self.second_menu()
 
-    def __spam_detection(self):
-        user_text = input("Enter text to check (e.g., 'Congratulations! You won $1000. Click here now!'): ")
-        model = self.getmodel()
-        response = model.generate_content(f"Analyze if this text is spam/promotional content or legitimate. Classify as Spam or Not Spam with confidence score: {user_text}")
-        results = response.text
-        print(f"\n\ud83d\udeab Analysis Result:\n{results}\n")
-        self.second_menu()
+def run_job_command(args):
+    """Handle `app.py job ...` (see jobs.py)."""
+    import jobs
+    
+    store = jobs.JobStore()
+    try:
+        if args.job_command == "start":
+            job = jobs.start_job(args.task, args.in_path, args.in_format, args.out_path, args.out_format,
+                                 concurrency=args.concurrency, store=store)
+        elif args.job_command == "resume":
+            job = jobs.resume_job(args.job_id, args.concurrency, args.retry_failed, args.out_path, store=store)
+        elif args.job_command == "status":
+            for job in [store.job(args.job_id)] if args.job_id else store.jobs():
+                print(jobs.job_summary(job))
+            return 0
+        else:
+            count = jobs.export_job(args.job_id, args.out_path, args.out_format, store)
+            print(f"job {args.job_id}: {count} records exported", file=sys.stderr)
+            return 0
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 1
+    except (jobs.JobBusy, jobs.JobInvalid) as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        store.close()
+    return 0 if job["status"] == "done" and not job["failed"] else 1
 
-    def __fake_news_detection(self):
-        user_text = input("Enter news text to verify (e.g., 'Scientists discover cure for all diseases'): ")
-        model = self.getmodel()
-        response = model.generate_content(f"Analyze this text for potential misinformation, fake news, or unreliable claims. Provide credibility assessment: {user_text}")
-        results = response.text
-        print(f"\n\ud83d\udcf0 Credibility Assessment:\n{results}\n")
-        self.second_menu()
 
-    def __text_simplification(self):
-        user_text = input("Enter complex text to simplify (e.g., 'The implementation of advanced algorithms...'): ")
-        model = self.getmodel()
-        response = model.generate_content(f"Simplify this text to make it easier to understand for a general audience: {user_text}")
-        results = response.text
-        print(f"\n\ud83d\udcd6 Simplified Text:\n{results}\n")
-        self.second_menu()
+def main(argv=None):
+    """Parse arguments and start either batch mode or the interactive menu."""
+    args = build_parser().parse_args(argv)
+    
+    # Quick paths for scripts: no SDK import, no network
+    if args.list_tasks:
+        for task in TASKS:
+            print(f"{task.id}\t{task.name}")
+        return 0
+    
+    if args.command == "run":
+        summary = run_file(args.task, args.in_path, args.out_path, args.in_format, args.out_format,
+                           concurrency=args.concurrency, micro_batch=args.micro_batch)
+        if args.metrics_out:
+            write_metrics(args.metrics_out)
+        return 1 if summary["errors"] else 0
+    
+    if args.command == "pipe":
+        answered, failed = run_pipe(structured=args.structured)
+        print(f"pipe: {answered} answered, {failed} failed, {saved_line()}", file=sys.stderr)
+        if args.metrics_out:
+            write_metrics(args.metrics_out)
+        return 1 if failed else 0
+    
+    if args.command == "serve":
+        # Imported here so the menu and batch modes never load asyncio
+        from api_server import serve
+        serve(args.host, args.port, args.workers, args.queue, args.micro_batch)
+        return 0
+    
+    if args.command == "job":
+        return run_job_command(args)
+    
+    # Create an instance of AppFeatures and start the menu loop
+    AppFeatures().run()
+    return 0
 
-    def __opinion_mining(self):
-        user_text = input("Enter text for opinion analysis (e.g., 'I think this product is great but expensive'): ")
-        model = self.getmodel()
-        response = model.generate_content(f"Extract and analyze opinions, attitudes, and subjective information from this text: {user_text}")
-        results = response.text
-        print(f"\n\ud83d\udca1 Opinion Analysis:\n{results}\n")
-        self.second_menu()
-# ============================
-# APPLICATION ENTRY POINT
-# ============================
-# Create an instance of AppFeatures to start the application
-# This triggers __init__() which shows the first menuapp = AppFeatures() 
-                
 
-        
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
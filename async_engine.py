@@ -0,0 +1,441 @@
+"""
+AI NLP Toolkit - Async Execution Engine
+=======================================
+Description: asyncio engine that runs many Gemini calls at once with a
+            concurrency limit and token-bucket rate limiting.
+
+A blocking `model.generate_content(prompt)` call means one request per
+network round-trip. This engine uses `generate_content_async` instead and
+keeps up to `concurrency` requests in flight, while two token buckets
+(requests per minute and tokens per minute) keep the send rate inside the
+Gemini quota so batch jobs do not trip 429 errors.
+
+The buckets are process-wide: every engine with the same quota, every
+event loop (each run_task_sync() call runs its own) and every thread
+(e.g. Streamlit background jobs) draws on the same two buckets.
+
+Quota defaults come from the environment (unset means unlimited):
+    GEMINI_CONCURRENCY   max requests in flight (default 8)
+    GEMINI_RPM           requests per minute
+    GEMINI_TPM           tokens per minute (input + output)
+
+Usage:
+    from async_engine import AsyncEngine
+
+    engine = AsyncEngine(concurrency=16, rpm=1000, tpm=1_000_000)
+
+    # async API
+    text = await engine.run_task("sentiment", "I love this!")
+
+    # sync wrapper (for the CLI and other blocking code)
+    text = engine.run_task_sync("sentiment", "I love this!")
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+from cache import cache_key, get_cache
+from gemini_client import DEFAULT_MODEL, estimate_tokens, generate_content, generate_content_async
+from longdoc import needs_chunking, run_long_task
+from metrics import metrics
+from preprocess import Deduper, prepare
+from profiles import route
+from tasks import get_task, record_path, semantic_cache_for
+
+# Output tokens reserved per request when the task does not set max_output_tokens
+DEFAULT_OUTPUT_TOKENS = 512
+
+
+def _env_int(name, default=None):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+# ============================
+# TOKEN BUCKET CLASS
+# ============================
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `rate_per_minute`.
+
+    The bucket holds at most `capacity` tokens (default: ten seconds of
+    quota), so a burst cannot spend much more than the per-minute quota
+    in any rolling minute. Requests larger than the capacity wait for a
+    full bucket and then leave it in debt.
+
+    The balance is guarded by a threading lock and not tied to an event
+    loop: coroutines wait with asyncio.sleep (acquire), blocking code with
+    time.sleep (acquire_blocking).
+
+    Attributes:
+        rate (float): Tokens added per second
+        capacity (float): Maximum tokens held
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity or max(1.0, rate_per_minute / 6.0))
+        self.__tokens = self.capacity
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def __refill(self):
+        # Called with the lock held
+        now = time.monotonic()
+        self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated) * self.rate)
+        self.__updated = now
+
+    def __take(self, amount):
+        # Take the tokens and return 0, or return how long to wait first
+        needed = min(amount, self.capacity)
+        with self.__lock:
+            self.__refill()
+            if self.__tokens >= needed:
+                self.__tokens -= amount
+                return 0.0
+            return (needed - self.__tokens) / self.rate
+
+    async def acquire(self, amount=1):
+        """Wait until `amount` tokens are available, then take them."""
+        while True:
+            wait = self.__take(amount)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self, amount=1):
+        """Blocking version of acquire() for threads without an event loop."""
+        while True:
+            wait = self.__take(amount)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def settle(self, amount):
+        """
+        Correct the balance after the fact.
+
+        A positive amount takes extra tokens (the estimate was too low), a
+        negative amount gives tokens back (the estimate was too high).
+        """
+        with self.__lock:
+            self.__refill()
+            self.__tokens = min(self.capacity, self.__tokens - amount)
+
+    @property
+    def available(self):
+        with self.__lock:
+            self.__refill()
+            return self.__tokens
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def shared_bucket(kind, rate_per_minute):
+    """
+    The process-wide bucket for one quota ("requests" or "tokens" at a
+    rate), created on first use; None for an unlimited quota.
+    """
+    if not rate_per_minute:
+        return None
+    with _buckets_lock:
+        bucket = _buckets.get((kind, rate_per_minute))
+        if bucket is None:
+            bucket = _buckets[(kind, rate_per_minute)] = TokenBucket(rate_per_minute)
+        return bucket
+
+
+# ============================
+# ASYNC ENGINE CLASS
+# ============================
+
+class AsyncEngine:
+    """
+    Runs Gemini calls concurrently within a concurrency limit and quota.
+
+    Attributes:
+        concurrency (int): Maximum requests in flight
+        requests (TokenBucket): Requests-per-minute bucket (or None)
+        tokens (TokenBucket): Tokens-per-minute bucket (or None)
+    """
+
+    def __init__(self, concurrency=None, rpm=None, tpm=None):
+        """
+        Args:
+            concurrency (int): Max requests in flight (default GEMINI_CONCURRENCY or 8)
+            rpm (int): Requests per minute (default GEMINI_RPM, unlimited if unset)
+            tpm (int): Tokens per minute (default GEMINI_TPM, unlimited if unset)
+        """
+        self.concurrency = concurrency or _env_int("GEMINI_CONCURRENCY", 8)
+        self.requests = shared_bucket("requests", rpm or _env_int("GEMINI_RPM"))
+        self.tokens = shared_bucket("tokens", tpm or _env_int("GEMINI_TPM"))
+        # A threading semaphore, so the limit holds across event loops and threads
+        self.__slots = threading.BoundedSemaphore(self.concurrency)
+        # Coroutines waiting for a slot, as (loop, future); each release wakes the first
+        self.__waiters = deque()
+        self.__waiters_lock = threading.Lock()
+
+    async def __acquire_slot(self):
+        while not self.__slots.acquire(blocking=False):
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            with self.__waiters_lock:
+                self.__waiters.append(waiter)
+            # A slot released before the waiter was listed would wake nobody
+            if self.__slots.acquire(blocking=False):
+                self.__forget(waiter)
+                return
+            try:
+                await waiter[1]
+            except asyncio.CancelledError:
+                # Already woken for a slot it will not take: pass the wake-up on
+                if not self.__forget(waiter):
+                    self.__wake_next()
+                raise
+
+    def __forget(self, waiter):
+        # True if the waiter was still listed (not woken yet)
+        with self.__waiters_lock:
+            try:
+                self.__waiters.remove(waiter)
+                return True
+            except ValueError:
+                return False
+
+    def __release_slot(self):
+        self.__slots.release()
+        self.__wake_next()
+
+    def __wake_next(self):
+        while True:
+            with self.__waiters_lock:
+                if not self.__waiters:
+                    return
+                loop, future = self.__waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+                return
+            except RuntimeError:
+                # That waiter's event loop is closed; wake the next one
+                continue
+
+    def reserve(self, prompt, generation_config=None):
+        """
+        Estimated tokens one request will use (prompt plus output cap),
+        reserved from the tokens-per-minute bucket and settled against
+        the real usage afterwards.
+        """
+        max_output = (generation_config or {}).get("max_output_tokens", DEFAULT_OUTPUT_TOKENS)
+        return estimate_tokens(prompt) + max_output
+
+    def settle(self, response, reserved):
+        """Correct the token bucket once a response's usage is known."""
+        usage = getattr(response, "usage_metadata", None)
+        if self.tokens and usage is not None and getattr(usage, "total_token_count", None):
+            self.tokens.settle(usage.total_token_count - reserved)
+
+    async def generate(self, prompt, model_name=DEFAULT_MODEL, generation_config=None, task_id=None, profile=None):
+        """
+        Send one prompt to Gemini, waiting for a concurrency slot and quota.
+
+        Time spent waiting for a slot or quota shows up as the "engine_queue"
+        in-flight gauge in metrics.py.
+
+        Returns:
+            GenerateContentResponse: Gemini response
+        """
+        # Estimate only; settled against usage_metadata once the response arrives
+        reserved = self.reserve(prompt, generation_config)
+        metrics.adjust_in_flight("engine_queue", 1)
+        try:
+            if self.requests:
+                await self.requests.acquire(1)
+            if self.tokens:
+                await self.tokens.acquire(reserved)
+            await self.__acquire_slot()
+        finally:
+            metrics.adjust_in_flight("engine_queue", -1)
+
+        try:
+            response = await generate_content_async(prompt, model_name, generation_config, task_id=task_id,
+                                                    profile=profile)
+        finally:
+            self.__release_slot()
+
+        self.settle(response, reserved)
+        return response
+
+    def generate_blocking(self, prompt, model_name=DEFAULT_MODEL, generation_config=None, task_id=None,
+                          profile=None):
+        """
+        Blocking version of generate() for worker threads (e.g. packed
+        micro-batch requests), drawing on the same slots and quota.
+
+        Returns:
+            GenerateContentResponse: Gemini response
+        """
+        reserved = self.reserve(prompt, generation_config)
+        metrics.adjust_in_flight("engine_queue", 1)
+        try:
+            if self.requests:
+                self.requests.acquire_blocking(1)
+            if self.tokens:
+                self.tokens.acquire_blocking(reserved)
+            self.__slots.acquire()
+        finally:
+            metrics.adjust_in_flight("engine_queue", -1)
+
+        try:
+            response = generate_content(prompt, model_name, generation_config, task_id=task_id, profile=profile)
+        finally:
+            self.__release_slot()
+
+        self.settle(response, reserved)
+        return response
+
+    async def run_task(self, task_id, *inputs):
+        """
+        Async counterpart of tasks.run_task(), sharing the same response cache.
+
+        Returns:
+            str: Gemini response text
+        """
+        task = get_task(task_id)
+        with metrics.track_task(task.id):
+            return await self.__run_task(task, prepare(task, inputs))
+
+    async def __run_task(self, task, inputs):
+        prompt = task.render(*inputs)
+
+        # Offline cascade (e.g. local language identification)
+        if task.local is not None:
+            start = time.perf_counter()
+            answer = task.local_answer(*inputs)
+            if answer is not None:
+                record_path(task.id, "local", time.perf_counter() - start)
+                return answer
+
+        # Long documents fan out over longdoc's own worker threads
+        if needs_chunking(task, inputs):
+            return await asyncio.to_thread(run_long_task, task, inputs[0])
+
+        choice = route(task, inputs)
+
+        async def generate():
+            response = await self.generate(prompt, choice.model, choice.generation_config, task_id=task.id,
+                                           profile=choice.profile)
+            return response.text
+
+        start = time.perf_counter()
+        answer = await self.__generate_cached(task, inputs, choice, generate)
+        if task.local is not None:
+            record_path(task.id, "escalated", time.perf_counter() - start)
+        return answer
+
+    async def __generate_cached(self, task, inputs, choice, generate):
+        cache = get_cache(choice.generation_config)
+        if cache is None:
+            return await generate()
+        key = cache_key(choice.model, choice.generation_config, task.id, inputs)
+        semantic = semantic_cache_for(task, inputs)
+        if semantic is None:
+            return await cache.aget_or_compute(key, generate)
+
+        async def generate_or_reuse():
+            # Embedding and index search are blocking; no sampled audits on this path
+            answer, vector = await asyncio.to_thread(semantic.lookup, task, inputs[0])
+            if answer is not None:
+                return answer
+            answer = await generate()
+            await asyncio.to_thread(semantic.add, task, vector, key)
+            return answer
+
+        return await cache.aget_or_compute(key, generate_or_reuse)
+
+    async def map_task(self, task_id, items):
+        """
+        Run a task over many inputs, yielding results as they complete.
+
+        At most twice `concurrency` items are pulled from `items` at a time,
+        so a lazy generator of records is never read into memory at once.
+        Identical inputs are sent once and share the result (preprocess.py).
+
+        Args:
+            task_id (str): Task id
+            items: Iterable of (key, inputs) pairs; key is passed back untouched
+
+        Yields:
+            tuple: (key, result, error) with result or error set to None
+        """
+        deduper = Deduper()
+
+        async def one(key, inputs):
+            try:
+                return key, await deduper.arun(inputs, lambda: self.run_task(task_id, *inputs)), None
+            except Exception as e:
+                return key, None, e
+
+        window = self.concurrency * 2
+        pending = set()
+        for key, inputs in items:
+            pending.add(asyncio.ensure_future(one(key, inputs)))
+            if len(pending) >= window:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+    def run_task_sync(self, task_id, *inputs):
+        """Blocking wrapper around run_task() for synchronous callers."""
+        return run_sync(self.run_task(task_id, *inputs))
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+# ============================
+# SYNC HELPERS
+# ============================
+
+def run_sync(coro):
+    """
+    Run a coroutine to completion from synchronous code.
+
+    Uses asyncio.run() normally. If an event loop is already running in
+    this thread (e.g. inside Streamlit or a notebook), the coroutine runs
+    on a fresh loop in a helper thread instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result = {}
+
+    def target():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+# Process-wide default engine (quota from the environment)
+engine = AsyncEngine()
@@ -0,0 +1,436 @@
+"""
+AI NLP Toolkit - User and Session Store
+=======================================
+Description: Registration, login and session tokens shared by every
+            process (CLI, Streamlit replicas) that points at the same
+            user database.
+
+Accounts used to live in `st.session_state.users` (one browser tab) and in
+`AppFeatures.__database` (one CLI process), so a user registered in one
+place did not exist anywhere else and nothing survived a restart.
+
+Users and sessions are now kept in a pluggable store: SQLite by default
+(primary-key lookups, WAL mode, safe to share between processes on one
+machine; WAL needs shared memory, so not over NFS/SMB network volumes),
+or in memory for tests. Passwords are stored
+as salted PBKDF2-SHA256 hashes.
+
+A login returns a signed session token:
+
+    <session id>.<expiry (epoch seconds)>.<HMAC-SHA256 signature>
+
+Forged or expired tokens are rejected without touching the store. A token
+that checks out is looked up in the store once (so logouts are honoured)
+and then trusted from an in-process cache for a short time, so Streamlit
+reruns of a logged-in session do not query the database. A logout on one
+replica therefore reaches the others within that cache time.
+
+The signing key comes from NLP_AUTH_SECRET, or is generated once and kept
+in the store, so every process using the same database accepts the same
+tokens.
+
+Settings come from the environment:
+    NLP_USER_DB            SQLite file (default .nlp_users.sqlite3;
+                           ":memory:" keeps users in this process only)
+    NLP_AUTH_SECRET        token signing key (default: stored in the database)
+    NLP_SESSION_TTL        seconds a login stays valid (default 12 hours)
+    NLP_AUTH_ITERATIONS    PBKDF2 iterations for new hashes (default 600000)
+    NLP_AUTH_CACHE_TTL     seconds a checked token is trusted without the
+                           store (default 60; 0 checks every time)
+
+Usage:
+    from auth import AuthError, get_auth
+
+    auth = get_auth()
+    auth.register("Ada", "ada@example.com", "correct horse")
+    token = auth.login("ada@example.com", "correct horse")
+    user = auth.validate(token)      # User('ada@example.com') or None
+    auth.logout(token)
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from cache import LRUCache
+
+DEFAULT_DB_PATH = ".nlp_users.sqlite3"
+DEFAULT_SESSION_TTL = 12 * 3600
+DEFAULT_ITERATIONS = 600_000
+DEFAULT_CACHE_TTL = 60
+TOKEN_CACHE_ENTRIES = 10_000
+HASH_ALGORITHM = "pbkdf2_sha256"
+
+
+class AuthError(ValueError):
+    """Raised when a registration or login is refused (message is safe to show)."""
+
+
+# ============================
+# PASSWORD HASHING
+# ============================
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def hash_password(password, iterations=None, salt=None):
+    """
+    Hash a password with a random salt.
+
+    Returns:
+        str: "pbkdf2_sha256$<iterations>$<salt>$<hash>" (base64url parts)
+    """
+    iterations = iterations or int(os.getenv("NLP_AUTH_ITERATIONS", DEFAULT_ITERATIONS))
+    salt = salt or secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{HASH_ALGORITHM}${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(password, encoded):
+    """Check a password against a hash_password() string (constant-time compare)."""
+    try:
+        algorithm, iterations, salt, digest = encoded.split("$")
+        if algorithm != HASH_ALGORITHM:
+            return False
+        expected = _unb64(digest)
+        actual = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), _unb64(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def normalize_email(email):
+    """Emails are matched case-insensitively, ignoring surrounding spaces."""
+    return email.strip().lower()
+
+
+class User:
+    """A registered user (no password data)."""
+
+    __slots__ = ("email", "name")
+
+    def __init__(self, email, name):
+        self.email = email
+        self.name = name
+
+    def __repr__(self):
+        return f"User({self.email!r})"
+
+
+# ============================
+# STORES
+# ============================
+
+class UserStore:
+    """
+    Storage interface for users, sessions and the token signing key.
+
+    Subclass it to keep accounts somewhere else (e.g. a shared SQL
+    server); the auth logic only uses these methods.
+    """
+
+    def add_user(self, email, name, password_hash):
+        """Insert a user. Returns False if the email is already registered."""
+        raise NotImplementedError
+
+    def get_user(self, email):
+        """Return (name, password_hash), or None."""
+        raise NotImplementedError
+
+    def add_session(self, session_id, email, expires):
+        raise NotImplementedError
+
+    def get_session(self, session_id):
+        """Return (email, expires), or None if unknown or logged out."""
+        raise NotImplementedError
+
+    def delete_session(self, session_id):
+        raise NotImplementedError
+
+    def purge_sessions(self, now):
+        """Delete sessions that expired before `now`. Returns the number removed."""
+        raise NotImplementedError
+
+    def secret(self):
+        """Return the token signing key, creating it on first use (bytes)."""
+        raise NotImplementedError
+
+
+class MemoryUserStore(UserStore):
+    """Dict-backed store for one process (tests, throwaway sessions)."""
+
+    def __init__(self):
+        self.__users = {}
+        self.__sessions = {}
+        self.__secret = secrets.token_bytes(32)
+        self.__lock = threading.Lock()
+
+    def add_user(self, email, name, password_hash):
+        with self.__lock:
+            if email in self.__users:
+                return False
+            self.__users[email] = (name, password_hash)
+            return True
+
+    def get_user(self, email):
+        return self.__users.get(email)
+
+    def add_session(self, session_id, email, expires):
+        with self.__lock:
+            self.__sessions[session_id] = (email, expires)
+
+    def get_session(self, session_id):
+        return self.__sessions.get(session_id)
+
+    def delete_session(self, session_id):
+        with self.__lock:
+            self.__sessions.pop(session_id, None)
+
+    def purge_sessions(self, now):
+        with self.__lock:
+            expired = [sid for sid, (_, expires) in self.__sessions.items() if expires < now]
+            for sid in expired:
+                del self.__sessions[sid]
+            return len(expired)
+
+    def secret(self):
+        return self.__secret
+
+
+class SQLiteUserStore(UserStore):
+    """
+    Users and sessions in a SQLite file, shared by every process using it.
+
+    Attributes:
+        path (str): SQLite file path
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self.__conn.execute("PRAGMA journal_mode=WAL")
+        self.__conn.execute("PRAGMA synchronous=NORMAL")
+        self.__conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            " email TEXT PRIMARY KEY, name TEXT NOT NULL,"
+            " password_hash TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self.__conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY, email TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        self.__conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+        self.__conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+
+    def add_user(self, email, name, password_hash):
+        with self.__lock:
+            cursor = self.__conn.execute(
+                "INSERT OR IGNORE INTO users (email, name, password_hash, created) VALUES (?, ?, ?, ?)",
+                (email, name, password_hash, time.time()),
+            )
+            return cursor.rowcount == 1
+
+    def get_user(self, email):
+        with self.__lock:
+            return self.__conn.execute("SELECT name, password_hash FROM users WHERE email = ?", (email,)).fetchone()
+
+    def add_session(self, session_id, email, expires):
+        with self.__lock:
+            self.__conn.execute("INSERT INTO sessions (id, email, expires) VALUES (?, ?, ?)",
+                                (session_id, email, expires))
+
+    def get_session(self, session_id):
+        with self.__lock:
+            return self.__conn.execute("SELECT email, expires FROM sessions WHERE id = ?", (session_id,)).fetchone()
+
+    def delete_session(self, session_id):
+        with self.__lock:
+            self.__conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def purge_sessions(self, now):
+        with self.__lock:
+            return self.__conn.execute("DELETE FROM sessions WHERE expires < ?", (now,)).rowcount
+
+    def secret(self):
+        # INSERT OR IGNORE: when two processes start at once, both read the first key written
+        with self.__lock:
+            self.__conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('secret', ?)",
+                                (secrets.token_bytes(32),))
+            return bytes(self.__conn.execute("SELECT value FROM meta WHERE key = 'secret'").fetchone()[0])
+
+    def close(self):
+        self.__conn.close()
+
+
+# ============================
+# AUTH SERVICE
+# ============================
+
+class Auth:
+    """
+    Registration, login and token validation on top of a UserStore.
+
+    Attributes:
+        store (UserStore): Where users and sessions live
+        session_ttl (float): Seconds a login stays valid
+        cache_ttl (float): Seconds a checked token is trusted without the store
+    """
+
+    def __init__(self, store, secret=None, session_ttl=None, cache_ttl=None):
+        self.store = store
+        self.session_ttl = session_ttl or float(os.getenv("NLP_SESSION_TTL", DEFAULT_SESSION_TTL))
+        self.cache_ttl = float(os.getenv("NLP_AUTH_CACHE_TTL", DEFAULT_CACHE_TTL)) if cache_ttl is None else cache_ttl
+        self.__secret = secret or store.secret()
+        self.__verified = LRUCache(TOKEN_CACHE_ENTRIES)  # token -> (User, checked at)
+        self.__stats_lock = threading.Lock()
+        self.__stats = {"registered": 0, "logins": 0, "failed_logins": 0, "validations": 0,
+                        "rejected": 0, "cache_hits": 0, "store_reads": 0}
+
+    def __count(self, **amounts):
+        with self.__stats_lock:
+            for name, amount in amounts.items():
+                self.__stats[name] += amount
+
+    def register(self, name, email, password):
+        """
+        Create an account.
+
+        Raises:
+            AuthError: If a field is empty or the email is already registered
+        """
+        email = normalize_email(email)
+        if not name.strip() or not email or not password:
+            raise AuthError("Name, email and password are required")
+        if "@" not in email:
+            raise AuthError("Please enter a valid email address")
+        if not self.store.add_user(email, name.strip(), hash_password(password)):
+            raise AuthError("Email already exists!")
+        self.__count(registered=1)
+
+    def login(self, email, password):
+        """
+        Check a password and open a session.
+
+        Returns:
+            str: Signed session token
+
+        Raises:
+            AuthError: If the email or password is wrong
+        """
+        email = normalize_email(email)
+        row = self.store.get_user(email)
+        if row is None:
+            # Hash anyway, so an unknown email takes as long as a wrong password
+            hash_password(password)
+        if row is None or not verify_password(password, row[1]):
+            self.__count(failed_logins=1)
+            raise AuthError("Invalid email or password")
+        session_id = _b64(secrets.token_bytes(16))
+        expires = int(time.time() + self.session_ttl)
+        self.store.add_session(session_id, email, expires)
+        with self.__stats_lock:
+            self.__stats["logins"] += 1
+            # Expired sessions are cleared every so often rather than on every login
+            purge = self.__stats["logins"] % 1000 == 0
+        if purge:
+            self.store.purge_sessions(time.time())
+        token = f"{session_id}.{expires}.{self.__sign(session_id, expires)}"
+        self.__verified.set(token, (User(email, row[0]), time.monotonic()))
+        return token
+
+    def validate(self, token):
+        """
+        Return the token's user, or None if it is missing, forged, expired
+        or logged out.
+        """
+        if not token:
+            return None
+        self.__count(validations=1)
+        try:
+            session_id, expires, signature = token.split(".")
+            expires = int(expires)
+        except ValueError:
+            self.__count(rejected=1)
+            return None
+        if not hmac.compare_digest(signature, self.__sign(session_id, expires)) or expires < time.time():
+            self.__count(rejected=1)
+            self.__verified.pop(token)
+            return None
+
+        cached = self.__verified.get(token)
+        if cached is not None and time.monotonic() - cached[1] < self.cache_ttl:
+            self.__count(cache_hits=1)
+            return cached[0]
+
+        self.__count(store_reads=1)
+        session = self.store.get_session(session_id)
+        row = self.store.get_user(session[0]) if session is not None else None
+        if row is None:
+            self.__count(rejected=1)
+            self.__verified.pop(token)
+            return None
+        user = User(session[0], row[0])
+        self.__verified.set(token, (user, time.monotonic()))
+        return user
+
+    def logout(self, token):
+        """End a session (other processes notice within cache_ttl seconds)."""
+        self.__verified.pop(token)
+        session_id = token.split(".")[0] if token else ""
+        if session_id:
+            self.store.delete_session(session_id)
+
+    def __sign(self, session_id, expires):
+        message = f"{session_id}.{expires}".encode("ascii")
+        return _b64(hmac.new(self.__secret, message, hashlib.sha256).digest())
+
+    def stats(self):
+        """Counters for logins, validations and verification-cache hits."""
+        with self.__stats_lock:
+            stats = dict(self.__stats)
+        checked = stats["cache_hits"] + stats["store_reads"]
+        stats["cache_hit_rate"] = round(stats["cache_hits"] / checked, 4) if checked else 0.0
+        return stats
+
+
+# ============================
+# PROCESS-WIDE DEFAULT
+# ============================
+
+_auth = None
+_auth_lock = threading.Lock()
+
+
+def get_auth():
+    """
+    Return the process-wide Auth built from the environment (see the
+    module docstring), creating it on first use.
+    """
+    global _auth
+    if _auth is None:
+        with _auth_lock:
+            if _auth is None:
+                path = os.getenv("NLP_USER_DB", DEFAULT_DB_PATH)
+                store = MemoryUserStore() if path == ":memory:" else SQLiteUserStore(path)
+                secret = os.getenv("NLP_AUTH_SECRET")
+                _auth = Auth(store, secret.encode("utf-8") if secret else None)
+    return _auth
+
+
+def use_auth(auth):
+    """Replace the process-wide Auth (e.g. one with a custom store). Returns the previous one."""
+    global _auth
+    with _auth_lock:
+        previous, _auth = _auth, auth
+    return previous
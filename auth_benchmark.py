@@ -0,0 +1,149 @@
+"""
+AI NLP Toolkit - Login / Session Benchmark
+==========================================
+Description: Measures register, login and token-validation throughput of
+            the user store (auth.py) with many concurrent sessions.
+
+Phases, each run on a thread pool:
+    register        create --users accounts (salted PBKDF2 hashing)
+    login           open --sessions sessions, spread over the users
+    validate        check every token --checks times, as Streamlit reruns
+                    do; tokens are trusted from the in-process cache
+    validate_store  the same with the verification cache off, so every
+                    check reads the store (what each rerun would cost
+                    without the cache)
+
+Login is deliberately slow (it is the password hash); validation should
+be orders of magnitude faster. Results are saved as JSON tagged with the
+git commit; use --compare to diff two runs.
+
+Usage:
+    python auth_benchmark.py --users 50 --sessions 2000 --checks 20
+    python auth_benchmark.py --db :memory: --iterations 1000     # store overhead only
+    python auth_benchmark.py --compare auth-benchmark-1a2b3c4.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from auth import DEFAULT_ITERATIONS, Auth, MemoryUserStore, SQLiteUserStore
+from benchmark import git_commit, percentile
+
+PHASES = ("register", "login", "validate", "validate_store")
+
+
+def timed_calls(threads, fn, items):
+    """
+    Call fn(item) for every item on a thread pool.
+
+    Returns:
+        tuple: (list of per-call seconds, wall-clock seconds)
+    """
+    def one(item):
+        start = time.perf_counter()
+        fn(item)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        timings = list(pool.map(one, items))
+    return timings, time.perf_counter() - start
+
+
+def summarize(timings, elapsed):
+    return {
+        "calls": len(timings),
+        "ops_per_sec": round(len(timings) / elapsed, 1) if elapsed else None,
+        "p50_ms": _ms(percentile(timings, 50)),
+        "p95_ms": _ms(percentile(timings, 95)),
+        "p99_ms": _ms(percentile(timings, 99)),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def run(args, db_path):
+    os.environ["NLP_AUTH_ITERATIONS"] = str(args.iterations)
+    store = MemoryUserStore() if db_path == ":memory:" else SQLiteUserStore(db_path)
+    auth = Auth(store)
+    # Same store and key, verification cache off: every check reads the store
+    uncached = Auth(store, secret=store.secret(), cache_ttl=0)
+
+    emails = [f"user{n}@example.com" for n in range(args.users)]
+    results = {}
+    results["register"] = summarize(*timed_calls(
+        args.threads, lambda email: auth.register(email.split("@")[0], email, "benchmark-password"), emails))
+
+    tokens = [None] * args.sessions
+
+    def login(n):
+        tokens[n] = auth.login(emails[n % len(emails)], "benchmark-password")
+
+    results["login"] = summarize(*timed_calls(args.threads, login, range(args.sessions)))
+
+    checks = [tokens[n % args.sessions] for n in range(args.sessions * args.checks)]
+    for phase, checker in (("validate", auth), ("validate_store", uncached)):
+        def validate(token, checker=checker):
+            if checker.validate(token) is None:
+                raise RuntimeError("valid token rejected")
+
+        results[phase] = summarize(*timed_calls(args.threads, validate, checks))
+    return results, auth.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark login and session validation throughput.")
+    parser.add_argument("--users", type=int, default=50, help="Accounts to register")
+    parser.add_argument("--sessions", type=int, default=1000, help="Concurrent sessions (logins)")
+    parser.add_argument("--checks", type=int, default=20, help="Token validations per session (reruns)")
+    parser.add_argument("--threads", type=int, default=16, help="Worker threads")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="PBKDF2 iterations")
+    parser.add_argument("--db", help="SQLite file, or :memory: (default: a temporary file)")
+    parser.add_argument("--out", help="Result JSON path (default: auth-benchmark-<commit>.json)")
+    parser.add_argument("--compare", metavar="JSON", help="Earlier result file to compare against")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results, stats = run(args, args.db or os.path.join(tmp, "users.sqlite3"))
+
+    commit = git_commit()
+    report = {
+        "meta": {"commit": commit, "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                 "users": args.users, "sessions": args.sessions, "checks": args.checks,
+                 "threads": args.threads, "iterations": args.iterations, "db": args.db or "sqlite (temp)"},
+        "phases": results,
+        "auth": stats,
+    }
+    print(f"Auth benchmark @ {commit}: {args.users} users, {args.sessions} sessions x {args.checks} checks, "
+          f"{args.threads} threads")
+    for phase, numbers in results.items():
+        print(f"  {phase:<15} {numbers['calls']:>7} calls  {numbers['ops_per_sec']:>10}/s  "
+              f"p50 {numbers['p50_ms']} ms  p95 {numbers['p95_ms']} ms")
+    print(f"  verification cache hit rate {stats['cache_hit_rate']:.1%}")
+
+    out = args.out or f"auth-benchmark-{commit}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old = json.load(f)
+        print(f"\nComparison: {old['meta']['commit']} -> {commit}")
+        for phase, numbers in results.items():
+            a, b = old["phases"].get(phase, {}).get("ops_per_sec"), numbers["ops_per_sec"]
+            if a and b is not None:
+                print(f"  {phase:<15} ops/s {a:>10} -> {b:<10} ({(b - a) / a * 100:+.1f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
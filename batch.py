@@ -0,0 +1,364 @@
+"""
+AI NLP Toolkit - Batch Mode
+===========================
+Description: Non-interactive batch runner that streams JSONL/CSV records
+            through one NLP task and writes each result as it arrives.
+
+Records are read lazily (one at a time) and every result is flushed to
+the output straight away, so memory stays flat no matter how large the
+input file is. Progress (records/sec) is reported on stderr, which keeps
+stdout free for piping.
+
+Input records:
+    JSONL: {"text": "..."} per line (or a bare JSON string).
+           Paraphrase Detection uses {"text1": "...", "text2": "..."}.
+    CSV:   header row with the same column names.
+
+Usage:
+    python app.py run --task sentiment --in corpus.jsonl --out results.jsonl
+    cat corpus.jsonl | python app.py run --task spam > results.jsonl
+    python app.py run --task sentiment --in corpus.jsonl --concurrency 16
+    python app.py run --task spam --in corpus.jsonl --micro-batch 20
+"""
+
+import csv
+import json
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+from preprocess import Deduper, saved_line, snapshot, tokens_saved
+from tasks import get_task, run_task
+
+# Progress is printed every this many records
+REPORT_EVERY = 100
+
+
+# ============================
+# INPUT / OUTPUT HELPERS
+# ============================
+
+def detect_format(path, default="jsonl"):
+    """Guess "jsonl" or "csv" from a file name ("-" means stdin/stdout)."""
+    if path and path != "-" and path.lower().endswith(".csv"):
+        return "csv"
+    return default
+
+
+def open_input(path):
+    """Open an input file for reading, or return stdin for "-"."""
+    if path in (None, "-"):
+        return sys.stdin
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def open_output(path):
+    """Open an output file for writing, or return stdout for "-"."""
+    if path in (None, "-"):
+        return sys.stdout
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+class BadRecord(dict):
+    """
+    Stand-in for an input line that could not be parsed.
+
+    It is written to the output with its "line" number and "error" like
+    any failed record, so one bad line never stops a run.
+    """
+
+
+def read_records(stream, fmt="jsonl"):
+    """
+    Lazily yield input records as dicts.
+
+    Args:
+        stream: Open text stream
+        fmt (str): "jsonl" or "csv"
+
+    Yields:
+        dict: One record per input line/row (blank JSONL lines are
+            skipped); a line that is not a JSON object or string is
+            yielded as a BadRecord
+    """
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield row
+        return
+
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield BadRecord(line=number, error=f"Line {number}: invalid JSON ({e})")
+            continue
+        if isinstance(record, str):
+            record = {"text": record}
+        elif not isinstance(record, dict):
+            record = BadRecord(line=number, error=f"Line {number}: expected a JSON object or string, "
+                                                  f"got {type(record).__name__}")
+        yield record
+
+
+class RecordWriter:
+    """
+    Writes result records one at a time, flushing after each.
+
+    CSV columns are the task's input fields, any other fields of the first
+    record written (e.g. an id), then "line", "result" and "error". A bad
+    input line written first (a BadRecord) therefore does not drop the
+    input columns from every later row.
+    """
+
+    def __init__(self, stream, fmt="jsonl", fields=()):
+        """
+        Args:
+            stream: Open text stream
+            fmt (str): "jsonl" or "csv"
+            fields (tuple): The task's input field names (CSV columns)
+        """
+        self.stream = stream
+        self.fmt = fmt
+        self.fields = tuple(fields)
+        self.__csv_writer = None
+
+    def write(self, record):
+        if self.fmt == "csv":
+            if self.__csv_writer is None:
+                trailing = ("line", "result", "error")
+                extra = [key for key in record if key not in self.fields and key not in trailing]
+                fieldnames = list(self.fields) + extra + list(trailing)
+                self.__csv_writer = csv.DictWriter(self.stream, fieldnames=fieldnames, extrasaction="ignore")
+                self.__csv_writer.writeheader()
+            self.__csv_writer.writerow(record)
+        else:
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+
+# ============================
+# BATCH RUNNER
+# ============================
+
+def record_inputs(task, record):
+    """
+    Pull the task's input texts out of a record.
+
+    Raises:
+        ValueError: If the record is a BadRecord, or an input field is
+            missing or not a non-empty string
+    """
+    if isinstance(record, BadRecord):
+        raise ValueError(record["error"])
+    missing = [field for field in task.template.fields if field not in record]
+    if missing:
+        raise ValueError(f"Record is missing field(s): {', '.join(missing)}")
+    inputs = [record[field] for field in task.template.fields]
+    if not all(isinstance(text, str) and text.strip() for text in inputs):
+        raise ValueError("Input fields must be non-empty strings")
+    return inputs
+
+
+class _Progress:
+    """Counts records and errors and prints records/sec (and input tokens saved) to the report stream."""
+
+    def __init__(self, task_id, report):
+        self.task_id = task_id
+        self.report = report
+        self.count = 0
+        self.errors = 0
+        self.start = time.perf_counter()
+        self.preprocess = snapshot()
+
+    def add(self, failed):
+        self.count += 1
+        self.errors += failed
+        if self.report and self.count % REPORT_EVERY == 0:
+            elapsed = time.perf_counter() - self.start
+            print(f"[{self.task_id}] {self.count} records, {self.count / elapsed:.2f} records/sec", file=self.report)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start
+        summary = {
+            "task": self.task_id,
+            "records": self.count,
+            "errors": self.errors,
+            "seconds": round(elapsed, 3),
+            "records_per_sec": round(self.count / elapsed, 2) if elapsed > 0 else 0.0,
+            "tokens_saved": tokens_saved(self.preprocess)["tokens_saved"],
+        }
+        if self.report:
+            print(f"[{self.task_id}] done: {self.count} records ({self.errors} errors) in {elapsed:.2f}s, "
+                  f"{summary['records_per_sec']} records/sec, {saved_line(self.preprocess)}", file=self.report)
+        return summary
+
+
+def run_batch(task_id, records, writer, report=sys.stderr, concurrency=1, engine=None, micro_batch=0):
+    """
+    Run one task over a stream of records, writing each result immediately.
+
+    A failing record does not stop the run: it is written with an
+    "error" field instead of a "result".
+
+    Inputs are cleaned and length-limited, and identical inputs are sent
+    once (preprocess.py); the summary reports the input tokens saved.
+
+    With concurrency above 1 the records go through the async engine
+    (async_engine.py) and results are written in completion order, which
+    may differ from input order.
+
+    With micro_batch above 1 (batchable tasks only), that many records are
+    packed into each Gemini request (see microbatch.py); concurrency then
+    sets how many packed requests are in flight.
+
+    Args:
+        task_id (str): Task id (e.g. "sentiment")
+        records: Iterable of input dicts (usually from read_records)
+        writer (RecordWriter): Destination for result records
+        report: Stream for progress lines (None to disable)
+        concurrency (int): Requests in flight (1 = sequential)
+        engine (AsyncEngine): Engine for concurrent and micro-batch runs
+            (default: a new engine with this concurrency and the quota
+            from the environment)
+        micro_batch (int): Records per packed request (0 = off)
+
+    Returns:
+        dict: Summary with records, errors, seconds, records_per_sec and
+            tokens_saved
+    """
+    task = get_task(task_id)
+    progress = _Progress(task.id, report)
+
+    if micro_batch > 1:
+        if not task.batchable:
+            raise ValueError(f"Task '{task.id}' does not support micro-batching")
+        _run_batch_micro(task, records, writer, progress, micro_batch, concurrency, engine)
+        return progress.summary()
+
+    if concurrency > 1 or engine is not None:
+        from async_engine import AsyncEngine, run_sync
+        engine = engine or AsyncEngine(concurrency=concurrency)
+        run_sync(_run_batch_async(task, records, writer, progress, engine))
+        return progress.summary()
+
+    deduper = Deduper()
+    for record in records:
+        try:
+            inputs = record_inputs(task, record)
+            record["result"] = deduper.run(inputs, lambda: run_task(task.id, *inputs))
+        except Exception as e:
+            record["error"] = str(e)
+        writer.write(record)
+        progress.add("error" in record)
+
+    return progress.summary()
+
+
+def _run_batch_micro(task, records, writer, progress, size, concurrency, engine):
+    from async_engine import AsyncEngine
+    from microbatch import run_micro_batch
+
+    # Packed requests share the engine's slots and RPM/TPM quota
+    engine = engine or AsyncEngine(concurrency=max(1, concurrency))
+
+    def chunks():
+        it = iter(records)
+        while True:
+            chunk = list(islice(it, size))
+            if not chunk:
+                return
+            valid = []
+            for record in chunk:
+                try:
+                    record_inputs(task, record)
+                    valid.append(record)
+                except ValueError as e:
+                    record["error"] = str(e)
+                    writer.write(record)
+                    progress.add(True)
+            if valid:
+                yield valid
+
+    def process(chunk):
+        try:
+            results = run_micro_batch(task.id, [record["text"] for record in chunk], engine)
+        except Exception as e:
+            for record in chunk:
+                record["error"] = str(e)
+            return chunk
+        for record, result in zip(chunk, results):
+            record["result"] = result
+        return chunk
+
+    def finish(chunk):
+        for record in chunk:
+            writer.write(record)
+            progress.add("error" in record)
+
+    if concurrency <= 1:
+        for chunk in chunks():
+            finish(process(chunk))
+        return
+
+    # Keep a bounded window of packed requests in flight
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = set()
+        for chunk in chunks():
+            pending.add(pool.submit(process, chunk))
+            if len(pending) >= concurrency * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(future.result())
+        for future in pending:
+            finish(future.result())
+
+
+async def _run_batch_async(task, records, writer, progress, engine):
+    def items():
+        for record in records:
+            try:
+                inputs = record_inputs(task, record)
+            except ValueError as e:
+                record["error"] = str(e)
+                writer.write(record)
+                progress.add(True)
+                continue
+            yield record, inputs
+
+    async for record, result, error in engine.map_task(task.id, items()):
+        if error is None:
+            record["result"] = result
+        else:
+            record["error"] = str(error)
+        writer.write(record)
+        progress.add(error is not None)
+
+
+def run_file(task_id, in_path="-", out_path="-", in_format=None, out_format=None, concurrency=1,
+             micro_batch=0):
+    """
+    Run a batch job between two files (or stdin/stdout for "-").
+
+    Formats default to the file extension (.csv → CSV, anything else → JSONL).
+
+    Returns:
+        dict: Summary from run_batch
+    """
+    in_format = in_format or detect_format(in_path)
+    out_format = out_format or detect_format(out_path, default=in_format)
+
+    source = open_input(in_path)
+    target = open_output(out_path)
+    try:
+        writer = RecordWriter(target, out_format, get_task(task_id).template.fields)
+        return run_batch(task_id, read_records(source, in_format), writer,
+                         concurrency=concurrency, micro_batch=micro_batch)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
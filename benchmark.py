@@ -0,0 +1,322 @@
+"""
+AI NLP Toolkit - Offline Benchmark
+==================================
+Description: Repeatable performance benchmark over SAMPLE_INPUTS.md using
+            the deterministic fake Gemini backend (no API key, no network).
+
+Every sample text is run through its task in three modes:
+    sequential   one record at a time (batch mode, concurrency 1)
+    batch        batch mode with micro-batching for batchable tasks
+    concurrent   batch mode through the async engine (--concurrency)
+
+For each mode the benchmark reports p50/p95/p99 latency per record,
+records/sec, upstream calls and peak Python memory (tracemalloc), plus
+latency against target and estimated cost per generation profile
+(profiles.py) over the whole run, and writes everything as JSON tagged with the git commit, so runs from
+different commits can be compared with --compare.
+
+The response cache is off by default (NLP_CACHE=0) so every run measures
+the same work, and each --repeat copy of a sample is tagged ("... (2)") so
+batch deduplication (preprocess.py) does not collapse the copies into one
+call. --record saves the fake traffic to a cassette and --replay
+answers from one instead (see cassette.py), which takes upstream latency
+out of the numbers and leaves only the toolkit's own overhead.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --latency lognormal:0.4,0.5 --error-rate 0.02 --repeat 5
+    python benchmark.py --modes sequential,concurrent --concurrency 32
+    python benchmark.py --compare benchmark-1a2b3c4.json
+    python benchmark.py --record samples.cas && python benchmark.py --replay samples.cas
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "SAMPLE_INPUTS.md")
+MODES = ("sequential", "batch", "concurrent")
+
+_HEADING = re.compile(r"^##\s+(\d+)\.")
+_BULLET = re.compile(r'^-\s+"(.*)"(?:\s*\([^)]*\))?\s*$')
+_SENTENCE = re.compile(r'^-?\s*Sentence\s+([12]):\s+"(.*)"\s*$')
+
+
+# ============================
+# SAMPLE CORPUS
+# ============================
+
+def load_samples(path=SAMPLE_FILE):
+    """
+    Parse SAMPLE_INPUTS.md into batch records grouped by task.
+
+    "## N." headings select the task by menu number; quoted bullets are
+    single inputs and "Sentence 1/2" bullets are input pairs.
+
+    Returns:
+        dict: task id -> list of record dicts (e.g. {"text": "..."})
+    """
+    from tasks import TASKS_BY_NUMBER
+
+    samples = {}
+    task = None
+    pair = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            heading = _HEADING.match(line)
+            if heading:
+                task = TASKS_BY_NUMBER.get(heading.group(1))
+                continue
+            if task is None:
+                continue
+            sentence = _SENTENCE.match(line)
+            if sentence and task.arity == 2:
+                pair[task.template.fields[int(sentence.group(1)) - 1]] = sentence.group(2)
+                if len(pair) == 2:
+                    samples.setdefault(task.id, []).append(pair)
+                    pair = {}
+                continue
+            bullet = _BULLET.match(line)
+            if bullet and task.arity == 1:
+                samples.setdefault(task.id, []).append({task.template.fields[0]: bullet.group(1)})
+    return samples
+
+
+# ============================
+# TIMING HELPERS
+# ============================
+
+class _TimingWriter:
+    """RecordWriter stand-in that records each record's latency instead of writing it."""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+
+    def write(self, record):
+        self.latencies.append(time.perf_counter() - record.pop("_started"))
+        self.errors += "error" in record
+
+
+def _repeated(records, repeat):
+    # Copies after the first get a suffix, so every copy is a distinct input
+    copies = list(records)
+    for n in range(2, repeat + 1):
+        copies.extend({field: f"{value} ({n})" for field, value in record.items()} for record in records)
+    return copies
+
+
+def _stamped(records):
+    # Stamp each record when the runner pulls it, so latency includes queueing
+    for record in records:
+        record = dict(record)
+        record["_started"] = time.perf_counter()
+        yield record
+
+
+def percentile(values, q):
+    """Nearest-rank percentile (q in 0-100) of a list of numbers, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+# ============================
+# BENCHMARK RUNNER
+# ============================
+
+def run_mode(mode, samples, backend, repeat=1, concurrency=8, micro_batch=20):
+    """
+    Run every sample through its task in one mode.
+
+    Args:
+        mode (str): "sequential", "batch" or "concurrent"
+        samples (dict): Output of load_samples()
+        backend (FakeBackend): Backend installed in gemini_client
+        repeat (int): Times each task's samples are repeated
+        concurrency (int): Requests in flight for the concurrent and batch modes
+        micro_batch (int): Records per packed request in batch mode
+
+    Returns:
+        dict: records, errors, seconds, records_per_sec, p50/p95/p99 (ms),
+            upstream_calls and peak_memory_kb
+    """
+    from async_engine import AsyncEngine
+    from batch import run_batch
+    from tasks import get_task
+
+    writer = _TimingWriter()
+    calls_before = backend.calls
+    tracemalloc.start()
+    start = time.perf_counter()
+    for task_id, records in samples.items():
+        records = _repeated(records, repeat)
+        if mode == "sequential":
+            run_batch(task_id, _stamped(records), writer, report=None)
+        elif mode == "batch" and get_task(task_id).batchable:
+            run_batch(task_id, _stamped(records), writer, report=None, concurrency=concurrency,
+                      micro_batch=micro_batch)
+        elif mode == "batch":
+            run_batch(task_id, _stamped(records), writer, report=None)
+        else:
+            run_batch(task_id, _stamped(records), writer, report=None,
+                      engine=AsyncEngine(concurrency=concurrency))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    count = len(writer.latencies)
+    return {
+        "records": count,
+        "errors": writer.errors,
+        "seconds": round(elapsed, 3),
+        "records_per_sec": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": _ms(percentile(writer.latencies, 50)),
+        "p95_ms": _ms(percentile(writer.latencies, 95)),
+        "p99_ms": _ms(percentile(writer.latencies, 99)),
+        "upstream_calls": backend.calls - calls_before,
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def warm_up(samples):
+    """Run one sample per task untimed, so lazy imports and model loads are not measured."""
+    from batch import run_batch
+
+    for task_id, records in samples.items():
+        run_batch(task_id, _stamped(records[:1]), _TimingWriter(), report=None)
+
+
+def git_commit():
+    """Short hash of the current commit, or "unknown" outside a git checkout."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(old, new):
+    """Print a per-mode table of old vs new numbers with the relative change."""
+    print(f"\nComparison: {old['meta']['commit']} -> {new['meta']['commit']}")
+    for mode, result in new["modes"].items():
+        before = old["modes"].get(mode)
+        if before is None:
+            continue
+        print(f"  {mode}:")
+        for key in ("records_per_sec", "p50_ms", "p95_ms", "p99_ms", "upstream_calls", "peak_memory_kb"):
+            a, b = before.get(key), result.get(key)
+            if a is None or b is None:
+                continue
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            print(f"    {key:<16} {a:>10} -> {b:<10} ({change})")
+
+
+# ============================
+# COMMAND LINE
+# ============================
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Offline benchmark over SAMPLE_INPUTS.md with a fake Gemini backend.")
+    parser.add_argument("--latency", default="lognormal:0.3,0.4",
+                        help="Fake latency spec: fixed:S, uniform:A,B or lognormal:MEDIAN,SIGMA (default: %(default)s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake calls that fail with 503")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the fake backend")
+    parser.add_argument("--repeat", type=int, default=3, help="Times each sample set is repeated")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight (batch/concurrent modes)")
+    parser.add_argument("--micro-batch", type=int, default=20, help="Records per packed request in batch mode")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated modes to run")
+    parser.add_argument("--samples", default=SAMPLE_FILE, help="Sample inputs markdown file")
+    parser.add_argument("--record", metavar="CASSETTE", help="Record the fake backend's answers to a cassette")
+    parser.add_argument("--replay", metavar="CASSETTE", help="Answer from a recorded cassette (zero latency)")
+    parser.add_argument("--out", help="Result JSON path (default: benchmark-<commit>.json)")
+    parser.add_argument("--compare", metavar="JSON", help="Earlier result file to compare against")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        print(f"Unknown mode(s): {', '.join(sorted(unknown))}. Choose from: {', '.join(MODES)}", file=sys.stderr)
+        return 2
+
+    # Measure the same work every run: no response cache, no real API key needed
+    os.environ.setdefault("NLP_CACHE", "0")
+
+    from cassette import open_backend
+    from fake_backend import FakeBackend
+    from gemini_client import use_backend
+
+    if args.replay:
+        backend = open_backend(args.replay, "replay")
+    else:
+        backend = FakeBackend(latency=args.latency, error_rate=args.error_rate, seed=args.seed)
+        if args.record:
+            backend = open_backend(args.record, "record", upstream=backend)
+    use_backend(backend)
+    samples = load_samples(args.samples)
+    warm_up(samples)
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": backend.describe(),
+            "repeat": args.repeat,
+            "concurrency": args.concurrency,
+            "micro_batch": args.micro_batch,
+            "tasks": len(samples),
+            "samples": sum(len(records) for records in samples.values()),
+        },
+        "modes": {},
+    }
+
+    print(f"Benchmark @ {commit}: {report['meta']['samples']} samples x {args.repeat} over "
+          f"{len(samples)} tasks, backend {report['meta']['backend']}")
+    for mode in modes:
+        result = run_mode(mode, samples, backend, args.repeat, args.concurrency, args.micro_batch)
+        report["modes"][mode] = result
+        print(f"  {mode:<11} {result['records']:>5} records  {result['records_per_sec']:>8} rec/s  "
+              f"p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  "
+              f"{result['upstream_calls']} calls  {result['errors']} errors  peak {result['peak_memory_kb']} KB")
+
+    from metrics import metrics
+
+    report["profiles"] = metrics.snapshot()["profiles"]
+    for name, numbers in report["profiles"].items():
+        print(f"  profile {name:<9} {numbers['calls']:>5} calls  p95 {numbers['p95']} s "
+              f"(target {numbers['slo_seconds']} s)  ${numbers['cost_usd']:.6f}")
+
+    out = args.out or f"benchmark-{commit}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,435 @@
+"""
+AI NLP Toolkit - Response Cache
+===============================
+Description: Two-tier, content-addressed cache for Gemini responses.
+
+Tier 1 is an in-process LRU (fast, lost on exit). Tier 2 is a SQLite file
+with TTL and size-based eviction, so repeated texts survive restarts and
+are shared by every process on the machine (CLI, batch runs, Streamlit).
+
+Keys are a SHA-256 hash of (model, generation config, task id,
+normalized input), so the same text sent to the same task with the same
+settings is only paid for once. Concurrent identical requests are
+coalesced: the first caller goes upstream and the others wait for its
+result instead of sending duplicates. Calls sampled above
+MAX_CACHED_TEMPERATURE (Text Generation's "creative" profile) are never
+cached: a new answer each time is the point.
+
+Settings come from the environment:
+    NLP_CACHE            "0" disables caching (default enabled)
+    NLP_CACHE_PATH       SQLite file (default .nlp_cache.sqlite3)
+    NLP_CACHE_TTL        seconds an entry stays valid (default 7 days)
+    NLP_CACHE_MAX        max entries in the SQLite tier (default 100000)
+    NLP_CACHE_MEMORY     max entries in the LRU tier (default 1024)
+
+Usage:
+    from cache import get_cache, cache_key
+
+    cache = get_cache()
+    key = cache_key("gemini-2.5-flash", None, "sentiment", ["I love it"])
+    text = cache.get_or_compute(key, lambda: call_gemini(...))
+    print(cache.stats())
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import warnings
+from collections import OrderedDict
+from concurrent.futures import Future
+
+DEFAULT_PATH = ".nlp_cache.sqlite3"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 100_000
+DEFAULT_MEMORY_ENTRIES = 1024
+# Replies sampled above this temperature are meant to differ between calls
+MAX_CACHED_TEMPERATURE = 0.5
+# Inserts between two recounts of the SQLite table (other processes add rows too)
+RECOUNT_EVERY = 1000
+
+
+# ============================
+# KEY HELPERS
+# ============================
+
+def normalize_text(text):
+    """
+    Normalize an input text for cache keying.
+
+    Applies Unicode NFC and collapses runs of whitespace, so texts that
+    differ only in spacing share one cache entry.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cacheable(generation_config):
+    """False for settings whose replies should vary (temperature above MAX_CACHED_TEMPERATURE)."""
+    return (generation_config or {}).get("temperature", 0.0) <= MAX_CACHED_TEMPERATURE
+
+
+def cache_key(model_name, generation_config, task_id, inputs):
+    """
+    Build the content-addressed cache key for one task call.
+
+    Args:
+        model_name (str): Gemini model name
+        generation_config (dict): Generation settings (or None)
+        task_id (str): Task id
+        inputs (list): Input text(s)
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    payload = json.dumps(
+        [model_name, generation_config or {}, task_id, [normalize_text(text) for text in inputs]],
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ============================
+# TIER 1: IN-MEMORY LRU
+# ============================
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache.
+
+    Attributes:
+        maxsize (int): Maximum number of entries
+        evictions (int): Entries dropped to make room
+    """
+
+    def __init__(self, maxsize=DEFAULT_MEMORY_ENTRIES):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self.__data = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value or None, marking the entry as recently used."""
+        with self.__lock:
+            value = self.__data.get(key)
+            if value is not None:
+                self.__data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.__lock:
+            self.__data[key] = value
+            self.__data.move_to_end(key)
+            while len(self.__data) > self.maxsize:
+                self.__data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        """Remove an entry if present."""
+        with self.__lock:
+            self.__data.pop(key, None)
+
+    def clear(self):
+        with self.__lock:
+            self.__data.clear()
+
+    def __len__(self):
+        return len(self.__data)
+
+
+# ============================
+# TIER 2: SQLITE
+# ============================
+
+class SQLiteCache:
+    """
+    Persistent cache table in a SQLite file.
+
+    Entries older than `ttl` seconds are treated as missing and removed
+    when read. When the table grows past `max_entries`, the least
+    recently used entries are deleted.
+
+    Several processes may share the file, so the row count kept here is
+    only an estimate (this process's inserts since the last recount). The
+    real count is read from the table every RECOUNT_EVERY inserts, and
+    again before evicting, which then deletes exactly the excess.
+
+    Attributes:
+        path (str): SQLite file path
+        ttl (float): Entry lifetime in seconds (None = never expire)
+        max_entries (int): Maximum rows kept
+        evictions (int): Rows removed by size limit or TTL
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = 0
+        self.__lock = threading.Lock()
+        self.__conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__conn.execute("PRAGMA journal_mode=WAL")
+        self.__conn.execute("PRAGMA synchronous=NORMAL")
+        self.__conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.__conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.__count = self.__recount()
+
+    def get(self, key):
+        """Return the cached value or None (expired entries are deleted)."""
+        now = time.time()
+        with self.__lock:
+            row = self.__conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl is not None and now - created > self.ttl:
+                self.__conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.__count -= 1
+                self.evictions += 1
+                return None
+            self.__conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key, value):
+        now = time.time()
+        with self.__lock:
+            cursor = self.__conn.execute(
+                "INSERT OR IGNORE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            if cursor.rowcount:
+                self.__count += 1
+                self.__inserts += 1
+                if self.__inserts >= RECOUNT_EVERY:
+                    self.__count = self.__recount()
+            else:
+                self.__conn.execute(
+                    "UPDATE responses SET value = ?, created = ?, accessed = ? WHERE key = ?",
+                    (value, now, now, key),
+                )
+            if self.__count > self.max_entries:
+                self.__evict()
+
+    def __recount(self):
+        # Called with the lock held (or from __init__)
+        self.__inserts = 0
+        return self.__conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def __evict(self):
+        # Called with the lock held. Trim to 90% of the limit so eviction
+        # runs once per batch of inserts instead of on every insert. The
+        # count is read in the same transaction as the delete, so processes
+        # evicting at once never delete each other's share twice.
+        self.__conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.__count = self.__recount()
+            excess = self.__count - int(self.max_entries * 0.9)
+            if excess > 0:
+                deleted = self.__conn.execute(
+                    "DELETE FROM responses WHERE key IN"
+                    " (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    (excess,),
+                ).rowcount
+                self.__count -= deleted
+                self.evictions += deleted
+        finally:
+            self.__conn.execute("COMMIT")
+
+    def purge_expired(self):
+        """Delete every expired entry. Returns the number removed."""
+        if self.ttl is None:
+            return 0
+        with self.__lock:
+            cursor = self.__conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            self.__count -= cursor.rowcount
+            self.evictions += cursor.rowcount
+            return cursor.rowcount
+
+    def clear(self):
+        with self.__lock:
+            self.__conn.execute("DELETE FROM responses")
+            self.__count = 0
+
+    def close(self):
+        self.__conn.close()
+
+    def __len__(self):
+        with self.__lock:
+            self.__count = self.__recount()
+            return self.__count
+
+
+# ============================
+# TWO-TIER CACHE
+# ============================
+
+class ResponseCache:
+    """
+    LRU front tier plus optional SQLite tier, with request coalescing.
+
+    Attributes:
+        memory (LRUCache): Tier 1
+        disk (SQLiteCache): Tier 2 (None for memory-only)
+        hits_memory, hits_disk, misses, coalesced (int): Counters
+    """
+
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory or LRUCache()
+        self.disk = disk
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.__lock = threading.Lock()
+        self.__inflight = {}        # key -> concurrent.futures.Future (threads)
+        self.__inflight_async = {}  # key -> asyncio.Future (event loop)
+
+    def get(self, key):
+        """Look a key up in both tiers (a disk hit is copied to memory)."""
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits_memory += 1
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.hits_disk += 1
+                self.memory.set(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value, or call `compute()` once and cache it.
+
+        If another thread is already computing the same key, wait for its
+        result instead of calling `compute()` again.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self.__lock:
+            future = self.__inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.__inflight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.__lock:
+                self.__inflight.pop(key, None)
+
+    async def aget_or_compute(self, key, compute):
+        """
+        Async version of get_or_compute(); `compute` returns an awaitable.
+
+        Concurrent coroutines asking for the same key share one call.
+        """
+        # Imported here so sync-only users (the CLI) never load asyncio
+        import asyncio
+
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        future = self.__inflight_async.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = self.__inflight_async[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await compute()
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; mark the exception as retrieved
+            future.exception()
+            raise
+        finally:
+            self.__inflight_async.pop(key, None)
+
+    def stats(self):
+        """Return hit/miss/eviction counters as a dict."""
+        hits = self.hits_memory + self.hits_disk
+        lookups = hits + self.misses
+        return {
+            "hits": hits,
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_evictions": self.memory.evictions,
+            "disk_entries": len(self.disk) if self.disk is not None else 0,
+            "disk_evictions": self.disk.evictions if self.disk is not None else 0,
+        }
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+# ============================
+# PROCESS-WIDE DEFAULT CACHE
+# ============================
+# Created on first use so importing this module never touches the disk
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache(generation_config=None):
+    """
+    Return the process-wide response cache, or None when NLP_CACHE=0 or
+    calls with `generation_config` must not be cached (see cacheable()).
+
+    Falls back to a memory-only cache if the SQLite file cannot be opened.
+    """
+    global _cache
+    if os.getenv("NLP_CACHE", "1") == "0" or not cacheable(generation_config):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                memory = LRUCache(int(os.getenv("NLP_CACHE_MEMORY", DEFAULT_MEMORY_ENTRIES)))
+                try:
+                    disk = SQLiteCache(
+                        os.getenv("NLP_CACHE_PATH", DEFAULT_PATH),
+                        ttl=float(os.getenv("NLP_CACHE_TTL", DEFAULT_TTL)),
+                        max_entries=int(os.getenv("NLP_CACHE_MAX", DEFAULT_MAX_ENTRIES)),
+                    )
+                except sqlite3.Error as e:
+                    warnings.warn(f"Disk cache unavailable, using memory only: {e}", RuntimeWarning)
+                    disk = None
+                _cache = ResponseCache(memory, disk)
+    return _cache
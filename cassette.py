@@ -0,0 +1,311 @@
+"""
+AI NLP Toolkit - Record/Replay Cassettes
+========================================
+Description: Records real Gemini prompt/response pairs into a compact
+            cassette file and replays them later with no network.
+
+A cassette is an append-only binary file:
+
+    b"NLPCAS01"                                  magic header
+    [32-byte key][4-byte length][zlib payload]   one record per call
+    ...
+
+The key is the SHA-256 of (model, generation config, prompt) and the
+payload is compressed JSON with the response text and token counts.
+Replay memory-maps the file and indexes every key in one pass over the
+record headers (payloads are only decompressed when asked for), so
+thousands of recorded calls replay in well under a second and a run
+measures only the toolkit's own overhead.
+
+Both front ends pick a cassette up from the environment:
+    NLP_CASSETTE         cassette file path (unset = normal Gemini calls)
+    NLP_CASSETTE_MODE    "record" (call Gemini and save every answer) or
+                         "replay" (answer from the cassette only; default)
+
+Usage:
+    NLP_CASSETTE=traffic.cas NLP_CASSETTE_MODE=record python app.py
+    NLP_CASSETTE=traffic.cas python app.py
+    python benchmark.py --replay traffic.cas
+    python cassette.py info traffic.cas
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+
+from fake_backend import FakeResponse, FakeUsage
+
+MAGIC = b"NLPCAS01"
+_HEADER = struct.Struct("<32sI")  # key digest, payload length
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode when a prompt was never recorded."""
+
+
+def prompt_key(model_name, generation_config, prompt):
+    """
+    Cassette key for one call.
+
+    Returns:
+        bytes: 32-byte SHA-256 digest
+    """
+    config = json.dumps(generation_config or {}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{model_name}\0{config}\0{prompt}".encode("utf-8")).digest()
+
+
+# ============================
+# CASSETTE FILE CLASS
+# ============================
+
+class Cassette:
+    """
+    One cassette file: memory-mapped index for lookups, appends for recording.
+
+    Attributes:
+        path (str): Cassette file path
+        hits, misses, recorded (int): Counters for this process
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self.__index = {}   # key -> (payload offset, payload length)
+        self.__map = None
+        self.__writer = None
+        self.__lock = threading.Lock()
+        self.__load()
+
+    def __load(self):
+        # Map the file and index every record; a torn last record is ignored
+        if not os.path.exists(self.path) or os.path.getsize(self.path) <= len(MAGIC):
+            self.__end = len(MAGIC)
+            return
+        with open(self.path, "rb") as f:
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.__map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a cassette file")
+        offset = len(MAGIC)
+        size = len(self.__map)
+        while offset + _HEADER.size <= size:
+            key, length = _HEADER.unpack_from(self.__map, offset)
+            start = offset + _HEADER.size
+            if start + length > size:
+                break
+            self.__index[key] = (start, length)
+            offset = start + length
+        self.__end = offset
+
+    def get(self, key):
+        """
+        Return the recorded payload for a key, or None.
+
+        Returns:
+            dict: {"text": ..., "input_tokens": ..., "output_tokens": ...}
+        """
+        entry = self.__index.get(key)
+        if entry is None or entry[0] is None:
+            self.misses += 1
+            return None
+        start, length = entry
+        self.hits += 1
+        return json.loads(zlib.decompress(self.__map[start:start + length]))
+
+    def append(self, key, payload):
+        """Record one response (keys already in the cassette are skipped)."""
+        data = zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        with self.__lock:
+            if key in self.__index:
+                return
+            if self.__writer is None:
+                self.__writer = open(self.path, "ab")
+                if self.__writer.tell() == 0:
+                    self.__writer.write(MAGIC)
+                elif self.__writer.tell() > self.__end:
+                    # Drop a record torn by an earlier crash before appending
+                    self.__writer.truncate(self.__end)
+                    self.__writer.seek(self.__end)
+            self.__writer.write(_HEADER.pack(key, len(data)) + data)
+            self.__writer.flush()
+            # Recorded keys are remembered but only readable after a reload
+            self.__index[key] = (None, None)
+            self.recorded += 1
+
+    def stats(self):
+        return {"path": self.path, "entries": len(self.__index), "hits": self.hits,
+                "misses": self.misses, "recorded": self.recorded}
+
+    def close(self):
+        with self.__lock:
+            if self.__writer is not None:
+                self.__writer.close()
+                self.__writer = None
+            if self.__map is not None:
+                self.__map.close()
+                self.__map = None
+
+    def __len__(self):
+        return len(self.__index)
+
+    def __contains__(self, key):
+        return key in self.__index
+
+
+def _payload(response):
+    usage = getattr(response, "usage_metadata", None)
+    return {
+        "text": response.text,
+        "input_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+        "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+    }
+
+
+def _response(payload):
+    return FakeResponse(payload["text"], FakeUsage(payload["input_tokens"], payload["output_tokens"]))
+
+
+# ============================
+# RECORD / REPLAY BACKENDS
+# ============================
+# Client factories for gemini_client.use_backend()
+
+class ReplayBackend:
+    """Answers every call from a cassette; unrecorded prompts raise CassetteMissError."""
+
+    def __init__(self, cassette):
+        self.cassette = cassette
+        self.calls = 0
+
+    def __call__(self, model_name, generation_config=None):
+        return _ReplayModel(self, model_name, generation_config)
+
+    def describe(self):
+        return {"replay": self.cassette.path, "entries": len(self.cassette)}
+
+    def lookup(self, model_name, generation_config, prompt):
+        self.calls += 1
+        payload = self.cassette.get(prompt_key(model_name, generation_config, prompt))
+        if payload is None:
+            raise CassetteMissError(f"No recorded response for this {model_name} prompt in {self.cassette.path}")
+        return _response(payload)
+
+
+class _ReplayModel:
+    def __init__(self, backend, model_name, generation_config):
+        self.backend = backend
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        response = self.backend.lookup(self.model_name, self.generation_config, prompt)
+        return iter([response]) if stream else response
+
+    async def generate_content_async(self, prompt, **kwargs):
+        return self.backend.lookup(self.model_name, self.generation_config, prompt)
+
+    def count_tokens(self, contents):
+        return FakeUsage(max(1, len(str(contents)) // 4), 0)
+
+
+class RecordingBackend:
+    """Passes every call to an upstream backend and records successful answers."""
+
+    def __init__(self, cassette, upstream):
+        """
+        Args:
+            cassette (Cassette): Destination cassette
+            upstream: Client factory `upstream(model_name, generation_config)`
+                (e.g. ClientPool.sdk_client or a FakeBackend)
+        """
+        self.cassette = cassette
+        self.upstream = upstream
+        self.calls = 0
+
+    def __call__(self, model_name, generation_config=None):
+        return _RecordingModel(self, self.upstream(model_name, generation_config), model_name, generation_config)
+
+    def describe(self):
+        upstream = getattr(self.upstream, "describe", None)
+        return {"record": self.cassette.path, "upstream": upstream() if upstream else "gemini"}
+
+    def record(self, model_name, generation_config, prompt, response):
+        try:
+            payload = _payload(response)
+        except ValueError:
+            # Blocked or empty answer: nothing worth replaying
+            return
+        self.cassette.append(prompt_key(model_name, generation_config, prompt), payload)
+
+
+class _RecordingModel:
+    def __init__(self, backend, model, model_name, generation_config):
+        self.backend = backend
+        self.model = model
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.backend.calls += 1
+        response = self.model.generate_content(prompt, stream=stream, **kwargs)
+        if stream:
+            return self.__record_stream(prompt, response)
+        self.backend.record(self.model_name, self.generation_config, prompt, response)
+        return response
+
+    def __record_stream(self, prompt, chunks):
+        parts = []
+        usage = None
+        for chunk in chunks:
+            try:
+                parts.append(chunk.text)
+            except ValueError:
+                pass
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            yield chunk
+        self.backend.record(self.model_name, self.generation_config, prompt, FakeResponse("".join(parts), usage))
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.backend.calls += 1
+        response = await self.model.generate_content_async(prompt, **kwargs)
+        self.backend.record(self.model_name, self.generation_config, prompt, response)
+        return response
+
+    def count_tokens(self, contents):
+        return self.model.count_tokens(contents)
+
+
+def open_backend(path, mode="replay", upstream=None):
+    """
+    Open a cassette and wrap it in a record or replay backend.
+
+    Args:
+        path (str): Cassette file
+        mode (str): "record" or "replay"
+        upstream: Client factory used when recording
+
+    Raises:
+        ValueError: For an unknown mode or a missing upstream when recording
+    """
+    if mode == "replay":
+        return ReplayBackend(Cassette(path))
+    if mode == "record":
+        if upstream is None:
+            raise ValueError("Recording needs an upstream backend")
+        return RecordingBackend(Cassette(path), upstream)
+    raise ValueError(f"Unknown cassette mode '{mode}' (use 'record' or 'replay')")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "info":
+        sys.exit("usage: python cassette.py info CASSETTE")
+    if not os.path.exists(sys.argv[2]):
+        sys.exit(f"No such cassette: {sys.argv[2]}")
+    cassette = Cassette(sys.argv[2])
+    print(f"{cassette.path}: {len(cassette)} recorded calls, {os.path.getsize(cassette.path)} bytes")
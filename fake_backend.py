@@ -0,0 +1,252 @@
+"""
+AI NLP Toolkit - Fake Gemini Backend
+====================================
+Description: Deterministic, offline stand-in for the Gemini SDK used by
+            benchmarks, load tests and local development.
+
+The fake model has the same methods the toolkit uses on a real
+`genai.GenerativeModel` (generate_content with/without streaming,
+generate_content_async, count_tokens). Each call sleeps for a latency
+drawn from a configurable distribution, fails with a retryable 503 at a
+configurable rate and returns a deterministic answer derived from the
+prompt. Micro-batch prompts get a JSON array of the right length and
+multi-task prompts a JSON object with one key per task, and calls with a
+response schema get JSON matching it, so every code path can be
+exercised without an API key.
+
+Randomness is seeded per (seed, prompt, n-th time this prompt was sent),
+so results do not depend on thread scheduling.
+
+Latency specs:
+    "fixed:0.2"              always 0.2 s
+    "uniform:0.1,0.5"        uniform between 0.1 and 0.5 s
+    "lognormal:0.4,0.5"      median 0.4 s, sigma 0.5 (long right tail)
+
+Usage:
+    from fake_backend import FakeBackend
+    from gemini_client import use_backend
+
+    use_backend(FakeBackend(latency="lognormal:0.4,0.5", error_rate=0.02))
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+
+_BATCH_COUNT = re.compile(r"JSON array of (\d+) strings")
+_MULTI_KEYS = re.compile(r'^- "(\w+)": ', re.MULTILINE)
+_WORD = re.compile(r"\b[A-Z][a-z]+\b")
+
+LABELS = ("Positive", "Negative", "Neutral", "Spam", "Not Spam", "Safe", "Joy", "Inquiry", "English")
+
+
+class FakeServiceError(Exception):
+    """Simulated transient upstream failure (HTTP 503, retryable)."""
+
+    code = 503
+
+
+class FakeTimeoutError(TimeoutError):
+    """Simulated request timeout (the latency exceeded request_options timeout)."""
+
+
+# ============================
+# RESPONSE OBJECTS
+# ============================
+
+class FakeUsage:
+    """Mirror of the SDK's usage_metadata."""
+
+    __slots__ = ("prompt_token_count", "candidates_token_count", "total_token_count")
+
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class FakeResponse:
+    """Mirror of GenerateContentResponse (text + usage_metadata)."""
+
+    __slots__ = ("text", "usage_metadata")
+
+    def __init__(self, text, usage=None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+def parse_latency(spec):
+    """
+    Turn a latency spec string into a function rng -> seconds.
+
+    Raises:
+        ValueError: If the spec is not recognized
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency spec '{spec}' (use fixed:S, uniform:A,B or lognormal:MEDIAN,SIGMA)")
+
+
+# ============================
+# FAKE BACKEND CLASS
+# ============================
+
+class FakeBackend:
+    """
+    Client factory for gemini_client.use_backend().
+
+    Attributes:
+        calls (int): Requests received by all fake models
+        failures (int): Requests answered with a simulated error
+    """
+
+    def __init__(self, latency="fixed:0.05", error_rate=0.0, seed=0, output_tokens=48, stream_chunks=4):
+        """
+        Args:
+            latency (str): Latency spec (see module docstring)
+            error_rate (float): Probability (0-1) that a call fails with FakeServiceError
+            seed (int): Base seed for all randomness
+            output_tokens (int): Approximate tokens in each free-text answer
+            stream_chunks (int): Chunks per streamed answer
+        """
+        self.latency = parse_latency(latency)
+        self.latency_spec = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.output_tokens = output_tokens
+        self.stream_chunks = stream_chunks
+        self.calls = 0
+        self.failures = 0
+        self.__seen = {}
+        self.__lock = threading.Lock()
+
+    def __call__(self, model_name, generation_config=None):
+        return FakeModel(self, model_name, generation_config or {})
+
+    def describe(self):
+        """Settings as a dict (stored with benchmark results)."""
+        return {"latency": self.latency_spec, "error_rate": self.error_rate, "seed": self.seed,
+                "output_tokens": self.output_tokens}
+
+    def plan(self, model_name, prompt, timeout=None, schema=None):
+        """
+        Decide latency, failure and answer for one call.
+
+        Returns:
+            tuple: (seconds to wait, exception to raise or None, FakeResponse)
+        """
+        digest = hashlib.sha256(f"{model_name}\0{prompt}".encode("utf-8")).hexdigest()
+        with self.__lock:
+            occurrence = self.__seen.get(digest, 0)
+            self.__seen[digest] = occurrence + 1
+            self.calls += 1
+        rng = random.Random(f"{self.seed}:{digest}:{occurrence}")
+
+        delay = self.latency(rng)
+        if timeout is not None and delay > timeout:
+            with self.__lock:
+                self.failures += 1
+            return timeout, FakeTimeoutError(f"fake request timed out after {timeout:.2f}s"), None
+        if rng.random() < self.error_rate:
+            with self.__lock:
+                self.failures += 1
+            return delay, FakeServiceError("fake 503: service unavailable"), None
+        return delay, None, self.answer(prompt, digest, schema)
+
+    def answer(self, prompt, digest, schema=None):
+        """Deterministic answer for a prompt (JSON for micro-batch and multi-task prompts)."""
+        prompt_tokens = max(1, len(prompt) // 4)
+        batch = _BATCH_COUNT.search(prompt)
+        if schema is not None:
+            text = json.dumps(_fake_value(schema, digest, prompt))
+        elif batch:
+            count = int(batch.group(1))
+            labels = [LABELS[int(digest[i % 60:i % 60 + 2], 16) % len(LABELS)] for i in range(count)]
+            text = json.dumps(labels)
+        elif "JSON object with exactly these keys" in prompt:
+            keys = _MULTI_KEYS.findall(prompt)
+            text = json.dumps({key: f"**{LABELS[int(digest[i % 60:i % 60 + 2], 16) % len(LABELS)]}**"
+                               for i, key in enumerate(keys)})
+        else:
+            label = LABELS[int(digest[:2], 16) % len(LABELS)]
+            filler = " ".join(digest[i:i + 4] for i in range(0, min(len(digest), self.output_tokens * 4), 4))
+            text = f"**{label}** (fake answer {digest[:8]}) {filler}"
+        return FakeResponse(text, FakeUsage(prompt_tokens, max(1, len(text) // 4)))
+
+
+def _fake_value(schema, digest, prompt, depth=0):
+    # Deterministic JSON value of the schema's shape; strings are words from the prompt
+    pick = int(digest[(depth * 2) % 60:(depth * 2) % 60 + 2], 16)
+    kind = schema.get("type", "STRING").upper()
+    if kind == "OBJECT":
+        return {name: _fake_value(sub, digest, prompt, depth + i + 1)
+                for i, (name, sub) in enumerate(schema.get("properties", {}).items())}
+    if kind == "ARRAY":
+        return [_fake_value(schema["items"], digest, prompt, depth + 3 * i + 1) for i in range(1 + pick % 3)]
+    if kind == "NUMBER":
+        return round(pick / 255, 2)
+    if kind == "BOOLEAN":
+        return pick % 2 == 0
+    if schema.get("enum"):
+        return schema["enum"][pick % len(schema["enum"])]
+    words = _WORD.findall(prompt.rpartition(":")[2]) or ["fake"]
+    return words[pick % len(words)]
+
+
+class FakeModel:
+    """Stand-in for genai.GenerativeModel backed by a FakeBackend."""
+
+    def __init__(self, backend, model_name, generation_config):
+        self.backend = backend
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def generate_content(self, prompt, stream=False, request_options=None, **kwargs):
+        timeout = (request_options or {}).get("timeout")
+        delay, error, response = self.backend.plan(self.model_name, prompt, timeout, self.__schema())
+        if not stream:
+            time.sleep(delay)
+            if error is not None:
+                raise error
+            return response
+        # Streaming: the first chunk arrives after a third of the latency
+        time.sleep(delay / 3)
+        if error is not None:
+            raise error
+        return self.__chunks(response, delay * 2 / 3)
+
+    def __schema(self):
+        return (self.generation_config or {}).get("response_schema")
+
+    def __chunks(self, response, remaining):
+        text = response.text
+        n = max(1, self.backend.stream_chunks)
+        size = math.ceil(len(text) / n)
+        for i in range(0, len(text), size):
+            if i:
+                time.sleep(remaining / n)
+            last = i + size >= len(text)
+            yield FakeResponse(text[i:i + size], response.usage_metadata if last else None)
+
+    async def generate_content_async(self, prompt, request_options=None, **kwargs):
+        timeout = (request_options or {}).get("timeout")
+        delay, error, response = self.backend.plan(self.model_name, prompt, timeout, self.__schema())
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return response
+
+    def count_tokens(self, contents):
+        return FakeUsage(max(1, len(str(contents)) // 4), 0)
@@ -0,0 +1,332 @@
+"""
+AI NLP Toolkit - Shared Gemini Client Pool
+==========================================
+Description: Process-wide registry of Gemini model clients shared by
+            app.py (CLI) and UI_streamlit.py (web UI).
+
+Building a `genai.GenerativeModel` and calling `genai.configure(...)` on
+every task call makes each request pay client setup and open a new
+transport channel. The pool below builds one client per
+(model name, generation config) pair, keeps it for the life of the
+process and hands the same instance to every caller.
+
+The SDK itself (google.generativeai) is imported when the first client
+is built, not when this module is imported.
+
+Every request goes through generate_content() / generate_content_async()
+below, which wrap the SDK call in the resilience policy (retries,
+circuit breaker, deadline, hedging; see resilience.py).
+
+Usage:
+    from gemini_client import generate_content, get_model
+
+    response = generate_content("Hello")    # default gemini-2.5-flash
+    model = get_model()                     # raw shared client
+"""
+
+import math
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from metrics import metrics
+from resilience import policy
+
+# Load environment variables from .env file
+# This file should contain: GOOGLE_API_KEY or GEMINI_API_KEY
+load_dotenv()
+
+# Default model used by every task (fast and cost-effective)
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+# Embedding model for the semantic cache (semantic_cache.py)
+EMBEDDING_MODEL = "models/text-embedding-004"
+
+
+def estimate_tokens(text):
+    """
+    Cheap local token estimate (about 4 characters per token).
+
+    Used for rate limiting and for deciding when a document is long
+    enough to split; no request is sent.
+    """
+    return max(1, math.ceil(len(text) / 4))
+
+
+def _freeze(value):
+    """
+    Turn a generation config into a hashable value usable as a dict key.
+
+    Dicts become sorted tuples of (key, value) pairs and lists become
+    tuples, recursively, so two equal configs always map to the same key.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+# ============================
+# CLIENT POOL CLASS
+# ============================
+
+class ClientPool:
+    """
+    Thread-safe registry of Gemini model clients.
+
+    Each client is built once per (model name, generation config) and
+    reused afterwards. `genai.configure(...)` runs only once per pool.
+
+    Clients come from a backend: by default the real Gemini SDK, but any
+    callable `backend(model_name, generation_config)` returning an object
+    with the same generate_content / generate_content_async / count_tokens
+    methods can be plugged in with `use_backend()` (e.g. the offline fake
+    in fake_backend.py).
+
+    Attributes:
+        construction_count (int): Number of clients built so far. Under
+            load this should stay at one per distinct config.
+    """
+
+    def __init__(self, api_key=None):
+        """
+        Create an empty pool.
+
+        Args:
+            api_key (str): Gemini API key. Defaults to GOOGLE_API_KEY,
+                falling back to GEMINI_API_KEY from the environment.
+        """
+        self.__api_key = api_key
+        self.__clients = {}
+        self.__lock = threading.Lock()
+        self.__configured = False
+        self.__backend = None
+        self.construction_count = 0
+
+    def use_backend(self, backend):
+        """
+        Switch to another client backend (None restores the Gemini SDK).
+
+        Existing clients are dropped so the next call builds from the new backend.
+        """
+        with self.__lock:
+            self.__backend = backend
+            self.__clients.clear()
+
+    @property
+    def backend(self):
+        """The plugged-in backend, or None when the real Gemini SDK is used."""
+        return self.__backend
+
+    def __configure(self):
+        # Called from get_model() with the lock held; configures the SDK once
+        if not self.__configured:
+            import google.generativeai as genai
+
+            api_key = self.__api_key or os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+            genai.configure(api_key=api_key)
+            self.__configured = True
+
+    def get_model(self, model_name=DEFAULT_MODEL, generation_config=None):
+        """
+        Return the shared client for a model name and generation config.
+
+        Args:
+            model_name (str): Gemini model name (e.g. "gemini-2.5-flash")
+            generation_config (dict): Optional generation settings
+                (temperature, max_output_tokens, ...)
+
+        Returns:
+            GenerativeModel: Shared, ready-to-use Gemini model instance
+        """
+        key = (model_name, _freeze(generation_config or {}))
+
+        # Fast path: no locking once the client exists
+        model = self.__clients.get(key)
+        if model is not None:
+            return model
+
+        with self.__lock:
+            # Re-check: another thread may have built it while we waited
+            model = self.__clients.get(key)
+            if model is None:
+                if self.__backend is not None:
+                    model = self.__backend(model_name, generation_config)
+                else:
+                    model = self.sdk_client(model_name, generation_config)
+                self.__clients[key] = model
+                self.construction_count += 1
+            return model
+
+    def sdk_client(self, model_name=DEFAULT_MODEL, generation_config=None):
+        """
+        Build a new (unshared) Gemini SDK client, configuring the SDK first.
+
+        This is the default backend; wrappers such as the cassette recorder
+        use it as their upstream.
+        """
+        # The SDK takes about a second to import, so it is only loaded here,
+        # on the first real client; `app.py --version` never pays for it
+        import google.generativeai as genai
+
+        self.__configure()
+        return genai.GenerativeModel(model_name, generation_config=generation_config or None)
+
+    def sdk(self):
+        """Return the configured google.generativeai module (for calls that are not per-model, e.g. embeddings)."""
+        import google.generativeai as genai
+
+        with self.__lock:
+            self.__configure()
+        return genai
+
+    def warm_up(self, model_name=DEFAULT_MODEL, generation_config=None):
+        """
+        Build a client and send a cheap request so the connection is open
+        before the first real task call.
+
+        A `count_tokens` call is used as the ping: it opens the transport
+        channel without paying for generation.
+
+        Returns:
+            bool: True if the ping succeeded, False otherwise
+        """
+        model = self.get_model(model_name, generation_config)
+        try:
+            model.count_tokens("ping")
+            return True
+        except Exception as e:
+            print(f"Warm-up failed: {e}")
+            return False
+
+    def clear(self):
+        """Drop every cached client (the next call rebuilds them)."""
+        with self.__lock:
+            self.__clients.clear()
+
+    def __len__(self):
+        return len(self.__clients)
+
+
+# ============================
+# PROCESS-WIDE DEFAULT POOL
+# ============================
+# Both front ends share this single pool instance
+
+pool = ClientPool()
+
+
+def get_model(model_name=DEFAULT_MODEL, generation_config=None):
+    """Shortcut for `pool.get_model(...)` on the process-wide pool."""
+    return pool.get_model(model_name, generation_config)
+
+
+def warm_up(model_name=DEFAULT_MODEL, generation_config=None):
+    """Shortcut for `pool.warm_up(...)` on the process-wide pool."""
+    return pool.warm_up(model_name, generation_config)
+
+
+def use_backend(backend):
+    """Shortcut for `pool.use_backend(...)` on the process-wide pool."""
+    pool.use_backend(backend)
+
+
+# Record/replay traffic when NLP_CASSETTE is set (see cassette.py)
+if os.getenv("NLP_CASSETTE"):
+    from cassette import open_backend
+
+    use_backend(open_backend(os.environ["NLP_CASSETTE"], os.getenv("NLP_CASSETTE_MODE", "replay"), pool.sdk_client))
+
+
+# ============================
+# GEMINI CALLS
+# ============================
+
+def generate_content(prompt, model_name=DEFAULT_MODEL, generation_config=None, stream=False, task_id=None,
+                     profile=None):
+    """
+    Send a prompt to Gemini through the shared client and resilience policy.
+
+    Streaming calls are retried only until the response starts; hedging
+    is never used for them. Latency and token usage of non-streaming
+    calls are recorded in metrics.py (streams are recorded by the caller
+    once the last chunk has arrived).
+
+    Args:
+        prompt (str): Prompt text
+        model_name (str): Gemini model name
+        generation_config (dict): Optional generation settings
+        stream (bool): Return an iterator of chunks instead of one response
+        task_id (str): Task id used to label metrics
+        profile (str): Generation profile used to label metrics (profiles.py)
+
+    Returns:
+        GenerateContentResponse: Gemini response (iterable when stream=True)
+
+    Raises:
+        CircuitOpenError: Gemini has been failing and the breaker is open
+        DeadlineError: The call did not finish within NLP_DEADLINE seconds
+    """
+    model = get_model(model_name, generation_config)
+
+    def attempt(timeout):
+        return model.generate_content(prompt, stream=stream, request_options={"timeout": timeout})
+
+    if stream:
+        return policy.call(attempt, name=model_name, hedge=False)
+
+    metrics.adjust_in_flight("gemini", 1)
+    start = time.perf_counter()
+    try:
+        response = policy.call(attempt, name=model_name)
+    finally:
+        metrics.adjust_in_flight("gemini", -1)
+    metrics.observe_gemini(task_id, model_name, time.perf_counter() - start, getattr(response, "usage_metadata", None),
+                           profile)
+    return response
+
+
+async def generate_content_async(prompt, model_name=DEFAULT_MODEL, generation_config=None, task_id=None,
+                                 profile=None):
+    """Async version of generate_content() (no streaming)."""
+    model = get_model(model_name, generation_config)
+
+    def attempt(timeout):
+        return model.generate_content_async(prompt, request_options={"timeout": timeout})
+
+    metrics.adjust_in_flight("gemini", 1)
+    start = time.perf_counter()
+    try:
+        response = await policy.acall(attempt, name=model_name)
+    finally:
+        metrics.adjust_in_flight("gemini", -1)
+    metrics.observe_gemini(task_id, model_name, time.perf_counter() - start, getattr(response, "usage_metadata", None),
+                           profile)
+    return response
+
+
+def embed_content(texts, model_name=EMBEDDING_MODEL, dimensions=None):
+    """
+    Embed texts for semantic similarity through the resilience policy.
+
+    Args:
+        texts (list): Texts to embed (one request for all of them)
+        model_name (str): Embedding model
+        dimensions (int): Optional reduced vector size
+
+    Returns:
+        list: One list of floats per text
+    """
+    genai = pool.sdk()
+
+    def attempt(timeout):
+        return genai.embed_content(model=model_name, content=list(texts), task_type="semantic_similarity",
+                                   output_dimensionality=dimensions, request_options={"timeout": timeout})
+
+    start = time.perf_counter()
+    result = policy.call(attempt, name=model_name, hedge=False)
+    metrics.observe_stage("embedding", time.perf_counter() - start)
+    return result["embedding"]
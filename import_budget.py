@@ -0,0 +1,105 @@
+"""
+AI NLP Toolkit - Import-Time Budget
+===================================
+Description: Checks CLI cold start against a time budget using Python's
+            `-X importtime` output.
+
+The CLI is launched from cron and shell scripts many times an hour, so
+`import app` must stay cheap: the Gemini SDK (about a second to import),
+asyncio, NumPy and Streamlit are only loaded when they are actually used. This
+script imports the module in fresh interpreters several times, takes the
+median cumulative import time, lists the slowest imports, and exits with
+status 1 if the budget is exceeded or a deferred module was imported.
+
+Usage:
+    python import_budget.py                      # app.py, 150 ms budget
+    python import_budget.py --budget-ms 100 --runs 10
+    python import_budget.py --module batch
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_BUDGET_MS = 150
+
+# Modules that must not be imported just to start the CLI
+DEFERRED = ("asyncio", "google.generativeai", "numpy", "streamlit")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output.
+
+    Returns:
+        dict: module name -> (self microseconds, cumulative microseconds)
+    """
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def measure(module, runs=5):
+    """
+    Import `module` in `runs` fresh interpreters.
+
+    Returns:
+        tuple: (list of cumulative import ms per run, list of wall-clock ms
+            per run, importtime dict of the median run)
+    """
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                cwd=HERE, capture_output=True, text=True)
+        wall = (time.perf_counter() - start) * 1000
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+        times = parse_importtime(result.stderr)
+        samples.append((times[module][1] / 1000, wall, times))
+    samples.sort(key=lambda sample: sample[0])
+    return [s[0] for s in samples], [s[1] for s in samples], samples[len(samples) // 2][2]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if importing the CLI takes longer than a budget.")
+    parser.add_argument("--module", default="app", help="Module to import (default: app)")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", DEFAULT_BUDGET_MS)),
+                        help="Median cumulative import time allowed (default: %(default)s, env IMPORT_BUDGET_MS)")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to measure")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    args = parser.parse_args(argv)
+
+    import_ms, wall_ms, times = measure(args.module, args.runs)
+    median = statistics.median(import_ms)
+    print(f"import {args.module}: median {median:.1f} ms (min {import_ms[0]:.1f}, max {import_ms[-1]:.1f}) "
+          f"over {args.runs} runs; interpreter wall time median {statistics.median(wall_ms):.0f} ms")
+
+    print("Slowest imports (self time):")
+    for name, (self_us, cumulative_us) in sorted(times.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms self  {cumulative_us / 1000:8.1f} ms cumulative  {name}")
+
+    failed = False
+    loaded = [name for name in DEFERRED if name in times]
+    if loaded:
+        print(f"FAIL: {args.module} imports {', '.join(loaded)} at start-up (should be deferred)")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: {median:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print(f"OK: within the {args.budget_ms:.0f} ms budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,717 @@
+"""
+AI NLP Toolkit - Durable Batch Jobs
+===================================
+Description: Checkpointed, resumable batch jobs for large corpora, kept
+            in a SQLite file so a crash or an exhausted quota never means
+            starting over.
+
+`python app.py run` streams a file through a task in one go; if it stops
+halfway, every record is paid for again on the next run. A job instead:
+
+1. copies the corpus into the job database as numbered work items
+   (pending / done / failed),
+2. runs the pending items through the async engine (concurrency and
+   quota limits from async_engine.py),
+3. checkpoints finished items in small transactions, together with the
+   job's offset (the first item still pending),
+4. stops cleanly when Gemini's quota or circuit breaker refuses calls,
+   leaving those items pending, and
+5. resumes from the checkpoint on the next `job resume`, skipping
+   everything already done.
+
+A runner first claims the job's lease (an owner and an expiry in the
+jobs table, taken with a conditional UPDATE), renews it while it runs
+and gives it back when it stops. A second `job resume`, or a UI replica
+sharing the database, gets JobBusy instead of running the same items
+twice; the lease of a crashed runner expires after LEASE_SECONDS.
+
+A crash loses at most the results since the last checkpoint, and those
+are usually still in the response cache (cache.py), so they are not paid
+for twice either. Progress lines show items/sec and an ETA.
+
+Jobs work for every task in the CLI menu, including `all` ("Analyze
+everything", multitask.py), whose result is a JSON object per record.
+The Streamlit bulk upload runs the same jobs in background threads
+(run_in_background) and pages through their results.
+
+Settings come from the environment:
+    NLP_JOBS_DB      SQLite file (default .nlp_jobs.sqlite3)
+
+Usage:
+    python app.py job start --task sentiment --in corpus.jsonl --out results.jsonl --concurrency 16
+    python app.py job status
+    python app.py job resume 3
+    python app.py job export 3 --out results.csv
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+from batch import RecordWriter, detect_format, open_input, open_output, read_records, record_inputs
+from preprocess import Deduper, saved_line, snapshot
+from resilience import is_quota_error
+from tasks import get_task
+
+DEFAULT_PATH = ".nlp_jobs.sqlite3"
+# Same name as the pipe mode's "Analyze everything" (app.MULTI_NAME)
+MULTI_TASK = "all"
+INGEST_BATCH = 1000
+PAGE_SIZE = 500
+CHECKPOINT_EVERY = 50
+CHECKPOINT_SECONDS = 2.0
+REPORT_SECONDS = 5.0
+# A runner's claim on a job expires this long after its last renewal
+LEASE_SECONDS = 60.0
+
+PENDING, DONE, FAILED = "pending", "done", "failed"
+
+
+class QuotaStop(Exception):
+    """Raised inside a job run when Gemini refuses calls for quota reasons."""
+
+
+class JobBusy(Exception):
+    """Raised when another runner (process or thread) holds the job's lease."""
+
+
+class JobInvalid(Exception):
+    """Raised when a job's input could not be read in full, so it must not run."""
+
+
+def job_fields(task_id):
+    """Input field names for a task id (or `all`)."""
+    return get_task("sentiment" if task_id == MULTI_TASK else task_id).template.fields
+
+
+def job_inputs(task_id, record):
+    """Input texts of one record for a task id (or `all`)."""
+    return record_inputs(get_task("sentiment" if task_id == MULTI_TASK else task_id), record)
+
+
+# ============================
+# JOB STORE
+# ============================
+
+class JobStore:
+    """
+    Jobs and their work items in a SQLite file.
+
+    Items are keyed by (job id, index); an index on (job id, state,
+    index) makes "next pending items" and the checkpoint offset cheap
+    however large the job is.
+
+    Attributes:
+        path (str): SQLite file path
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("NLP_JOBS_DB", DEFAULT_PATH)
+        self.__lock = threading.Lock()
+        self.__conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.__conn.execute("PRAGMA journal_mode=WAL")
+        self.__conn.execute("PRAGMA synchronous=NORMAL")
+        self.__conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, task TEXT NOT NULL, status TEXT NOT NULL,"
+            " total INTEGER NOT NULL DEFAULT 0, done INTEGER NOT NULL DEFAULT 0,"
+            " failed INTEGER NOT NULL DEFAULT 0, checkpoint INTEGER NOT NULL DEFAULT 0,"
+            " options TEXT NOT NULL, created REAL NOT NULL, updated REAL NOT NULL,"
+            " owner TEXT, lease_until REAL NOT NULL DEFAULT 0)"
+        )
+        self.__add_lease_columns()
+        self.__conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " job INTEGER NOT NULL, idx INTEGER NOT NULL, state TEXT NOT NULL,"
+            " record TEXT NOT NULL, result TEXT, error TEXT,"
+            " PRIMARY KEY (job, idx)) WITHOUT ROWID"
+        )
+        self.__conn.execute("CREATE INDEX IF NOT EXISTS items_state ON items (job, state, idx)")
+
+    def __add_lease_columns(self):
+        # Job databases from before leases
+        self.__conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = {row[1] for row in self.__conn.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:
+                self.__conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+                self.__conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL NOT NULL DEFAULT 0")
+        finally:
+            self.__conn.execute("COMMIT")
+
+    def create(self, task_id, records, options=None):
+        """
+        Create a job and copy its records in as pending items.
+
+        Records whose input fields are missing are stored as failed
+        straight away.
+
+        Returns:
+            int: Job id
+        """
+        now = time.time()
+        with self.__lock:
+            job_id = self.__conn.execute(
+                "INSERT INTO jobs (task, status, options, created, updated) VALUES (?, 'created', ?, ?, ?)",
+                (task_id, json.dumps(options or {}), now, now),
+            ).lastrowid
+        total = failed = 0
+        rows = []
+        try:
+            for record in records:
+                try:
+                    job_inputs(task_id, record)
+                    rows.append((job_id, total, PENDING, json.dumps(record, ensure_ascii=False), None))
+                except ValueError as e:
+                    rows.append((job_id, total, FAILED, json.dumps(record, ensure_ascii=False), str(e)))
+                    failed += 1
+                total += 1
+                if len(rows) >= INGEST_BATCH:
+                    self.__insert(rows)
+                    rows = []
+            self.__insert(rows)
+        except Exception:
+            # Unreadable input (bad JSON line, not UTF-8, ...): never run a partial copy
+            with self.__lock:
+                self.__conn.execute("BEGIN")
+                self.__conn.execute("DELETE FROM items WHERE job = ?", (job_id,))
+                self.__conn.execute("UPDATE jobs SET status = 'invalid', updated = ? WHERE id = ?",
+                                    (time.time(), job_id))
+                self.__conn.execute("COMMIT")
+            raise
+        with self.__lock:
+            self.__conn.execute("UPDATE jobs SET status = 'pending', total = ?, failed = ?, updated = ? WHERE id = ?",
+                                (total, failed, time.time(), job_id))
+        return job_id
+
+    def __insert(self, rows):
+        if not rows:
+            return
+        with self.__lock:
+            self.__conn.execute("BEGIN")
+            self.__conn.executemany("INSERT INTO items (job, idx, state, record, error) VALUES (?, ?, ?, ?, ?)", rows)
+            self.__conn.execute("COMMIT")
+
+    def job(self, job_id):
+        """
+        Returns:
+            dict: id, task, status, total, done, failed, checkpoint, options
+
+        Raises:
+            KeyError: If there is no such job
+        """
+        with self.__lock:
+            row = self.__conn.execute(
+                "SELECT id, task, status, total, done, failed, checkpoint, options, created, updated, owner"
+                " FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"No job {job_id} in {self.path}")
+        return _job_dict(row)
+
+    def jobs(self):
+        with self.__lock:
+            rows = self.__conn.execute(
+                "SELECT id, task, status, total, done, failed, checkpoint, options, created, updated, owner"
+                " FROM jobs ORDER BY id").fetchall()
+        return [_job_dict(row) for row in rows]
+
+    def pending(self, job_id, after, limit=PAGE_SIZE):
+        """Next pending items with an index above `after`: [(index, record dict)]."""
+        with self.__lock:
+            rows = self.__conn.execute(
+                "SELECT idx, record FROM items WHERE job = ? AND state = 'pending' AND idx > ? ORDER BY idx LIMIT ?",
+                (job_id, after, limit)).fetchall()
+        return [(idx, json.loads(record)) for idx, record in rows]
+
+    def claim(self, job_id, owner, lease=LEASE_SECONDS):
+        """
+        Take the job's lease for `owner` and mark it running, unless another
+        runner holds a lease that has not expired or the job never finished
+        loading its input ("created" or "invalid").
+
+        Returns:
+            bool: True if `owner` now holds the lease
+        """
+        now = time.time()
+        with self.__lock:
+            self.__conn.execute("BEGIN IMMEDIATE")
+            try:
+                claimed = self.__conn.execute(
+                    "UPDATE jobs SET owner = ?, lease_until = ?, status = 'running', updated = ?"
+                    " WHERE id = ? AND status NOT IN ('invalid', 'created')"
+                    " AND (owner IS NULL OR owner = ? OR lease_until < ?)",
+                    (owner, now + lease, now, job_id, owner, now)).rowcount == 1
+            finally:
+                self.__conn.execute("COMMIT")
+        return claimed
+
+    def renew(self, job_id, owner, lease=LEASE_SECONDS):
+        """Extend `owner`'s lease. Returns False if it was lost to another runner."""
+        with self.__lock:
+            return self.__renew(job_id, owner, lease)
+
+    def __renew(self, job_id, owner, lease):
+        # Lock held
+        return self.__conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ?",
+                                   (time.time() + lease, job_id, owner)).rowcount == 1
+
+    def release(self, job_id, owner, status):
+        """Give the lease back and set the job's status (no-op if `owner` lost it)."""
+        with self.__lock:
+            self.__conn.execute(
+                "UPDATE jobs SET owner = NULL, lease_until = 0, status = ?, updated = ? WHERE id = ? AND owner = ?",
+                (status, time.time(), job_id, owner))
+
+    def checkpoint(self, job_id, outcomes, owner=None):
+        """
+        Save finished items in one transaction and move the job's offset.
+
+        Args:
+            outcomes (list): (index, result, error) tuples; exactly one of
+                result / error is set
+            owner (str): Runner that must hold the job's lease (renewed
+                in the same transaction)
+
+        Raises:
+            JobBusy: If `owner` lost the lease; nothing is saved
+        """
+        if not outcomes:
+            return
+        done = sum(1 for _, _, error in outcomes if error is None)
+        with self.__lock:
+            self.__conn.execute("BEGIN")
+            if owner is not None and not self.__renew(job_id, owner, LEASE_SECONDS):
+                self.__conn.execute("ROLLBACK")
+                raise JobBusy(f"Job {job_id} was taken over by another runner")
+            self.__conn.executemany(
+                "UPDATE items SET state = ?, result = ?, error = ? WHERE job = ? AND idx = ?",
+                [(DONE if error is None else FAILED, result, error, job_id, idx) for idx, result, error in outcomes])
+            offset = self.__offset(job_id)
+            self.__conn.execute(
+                "UPDATE jobs SET done = done + ?, failed = failed + ?, checkpoint = ?, updated = ? WHERE id = ?",
+                (done, len(outcomes) - done, offset, time.time(), job_id))
+            self.__conn.execute("COMMIT")
+
+    def __offset(self, job_id):
+        # First index still pending (= every item before it is finished); lock held
+        row = self.__conn.execute("SELECT MIN(idx) FROM items WHERE job = ? AND state = 'pending'",
+                                  (job_id,)).fetchone()
+        if row[0] is not None:
+            return row[0]
+        return self.__conn.execute("SELECT total FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+
+    def retry_failed(self, job_id):
+        """Mark failed items pending again. Returns how many."""
+        with self.__lock:
+            self.__conn.execute("BEGIN")
+            count = self.__conn.execute("UPDATE items SET state = 'pending', error = NULL"
+                                        " WHERE job = ? AND state = 'failed'", (job_id,)).rowcount
+            self.__conn.execute("UPDATE jobs SET failed = failed - ?, checkpoint = ? WHERE id = ?",
+                                (count, self.__offset(job_id), job_id))
+            self.__conn.execute("COMMIT")
+        return count
+
+    def set_status(self, job_id, status):
+        with self.__lock:
+            self.__conn.execute("UPDATE jobs SET status = ?, updated = ? WHERE id = ?", (status, time.time(), job_id))
+
+    def page(self, job_id, start, count):
+        """
+        Records `start` to `start + count - 1` in input order, with
+        "result" or "error" added (index range, so any page is cheap).
+        """
+        with self.__lock:
+            rows = self.__conn.execute(
+                "SELECT record, result, error FROM items WHERE job = ? AND idx >= ? AND idx < ? ORDER BY idx",
+                (job_id, start, start + count)).fetchall()
+        records = []
+        for record, result, error in rows:
+            record = json.loads(record)
+            if result is not None:
+                record["result"] = result
+            if error is not None:
+                record["error"] = error
+            records.append(record)
+        return records
+
+    def results(self, job_id):
+        """Yield every record in input order, with "result" or "error" added."""
+        start = 0
+        while True:
+            records = self.page(job_id, start, PAGE_SIZE)
+            if not records:
+                return
+            yield from records
+            start += len(records)
+
+    def close(self):
+        self.__conn.close()
+
+
+def _job_dict(row):
+    keys = ("id", "task", "status", "total", "done", "failed", "checkpoint", "options", "created", "updated",
+            "owner")
+    job = dict(zip(keys, row))
+    job["options"] = json.loads(job["options"])
+    return job
+
+
+# ============================
+# PROGRESS
+# ============================
+
+class JobProgress:
+    """Prints done/total, items/sec (this run) and an ETA every few seconds."""
+
+    def __init__(self, job, report):
+        self.job = job
+        self.report = report
+        self.finished = job["done"] + job["failed"]
+        self.this_run = 0
+        self.start = time.perf_counter()
+        self.__last_report = self.start
+
+    def add(self, count):
+        self.finished += count
+        self.this_run += count
+        now = time.perf_counter()
+        if self.report and now - self.__last_report >= REPORT_SECONDS:
+            self.__last_report = now
+            print(self.line(), file=self.report)
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self.start
+        return self.this_run / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta_seconds(self):
+        remaining = self.job["total"] - self.finished
+        return remaining / self.rate if self.rate else None
+
+    def line(self):
+        total = self.job["total"]
+        percent = self.finished / total * 100 if total else 100.0
+        eta = self.eta_seconds
+        return (f"[job {self.job['id']} {self.job['task']}] {self.finished:,}/{total:,} ({percent:.1f}%), "
+                f"{self.rate:.1f} items/sec, ETA {format_duration(eta) if eta is not None else '?'}")
+
+
+def format_duration(seconds):
+    """1h02m, 4m05s, 12s."""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+# ============================
+# RUNNER
+# ============================
+
+def run_job(job_id, store=None, concurrency=None, report=sys.stderr, retry_failed=False, engine=None,
+            progress=None):
+    """
+    Run (or resume) a job until every item is finished or the quota runs out.
+
+    Args:
+        job_id (int): Job id
+        store (JobStore): Job database (default: NLP_JOBS_DB)
+        concurrency (int): Requests in flight (default: the job's own setting)
+        report: Stream for progress lines (None to disable)
+        retry_failed (bool): Run failed items again as well
+        engine (AsyncEngine): Engine to use (default: a new one)
+        progress (JobProgress): Progress to update (default: a new one)
+
+    Returns:
+        dict: The job after the run (status "done" or "paused")
+
+    Raises:
+        JobBusy: If another runner holds the job's lease
+        JobInvalid: If the job's input could not be read in full
+    """
+    from async_engine import AsyncEngine, run_sync
+
+    store = store or JobStore()
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    if not store.claim(job_id, owner):
+        status = store.job(job_id)["status"]
+        if status in ("invalid", "created"):
+            raise JobInvalid(f"Job {job_id} has no complete copy of its input ({status}); start it again")
+        raise JobBusy(f"Job {job_id} is already running ({store.job(job_id)['owner']})")
+
+    status = "paused"
+    try:
+        job = store.job(job_id)
+        if retry_failed:
+            # With the lease held, no other runner is moving items meanwhile
+            store.retry_failed(job_id)
+            job = store.job(job_id)
+        concurrency = concurrency or job["options"].get("concurrency") or 1
+        engine = engine or AsyncEngine(concurrency=concurrency)
+        progress = progress or JobProgress(job, report)
+        if report:
+            print(f"[job {job_id} {job['task']}] starting at item {job['checkpoint']:,} of {job['total']:,}",
+                  file=report)
+
+        before = snapshot()
+        stopped = run_sync(_run_items(job, store, engine, concurrency, progress, owner))
+        status = "paused" if stopped else "done"
+        if stopped and report:
+            print(f"[job {job_id}] paused: {stopped}. Resume with: python app.py job resume {job_id}", file=report)
+    finally:
+        # Also reached on Ctrl-C or a crash in the runner: everything checkpointed stays done
+        store.release(job_id, owner, status)
+    job = store.job(job_id)
+    if report:
+        print(f"{progress.line()} - {status}, {job['failed']} failed, {saved_line(before)}", file=report)
+    return job
+
+
+async def _run_items(job, store, engine, concurrency, progress, owner):
+    # Returns None when the job ran out of pending items, or the reason it stopped
+    import asyncio
+
+    if job["task"] == MULTI_TASK:
+        from multitask import run_multi_task
+
+        async def call(record):
+            results, errors = await asyncio.to_thread(run_multi_task, job_inputs(MULTI_TASK, record)[0])
+            if errors and not results:
+                # Nothing answered: fail the item so --retry-failed picks it up
+                raise RuntimeError("; ".join(f"{task_id}: {error}" for task_id, error in errors.items()))
+            return json.dumps({"results": results, "errors": errors}, ensure_ascii=False)
+    else:
+        async def call(record):
+            return await engine.run_task(job["task"], *job_inputs(job["task"], record))
+
+    # Identical inputs in the job are sent once (preprocess.py)
+    deduper = Deduper()
+
+    async def one(idx, record):
+        try:
+            return idx, await deduper.arun(job_inputs(job["task"], record), lambda: call(record)), None
+        except Exception as e:
+            return idx, None, e
+
+    outcomes = []
+    last_checkpoint = time.perf_counter()
+    stopped = None
+    window = max(1, concurrency) * 2
+    pending = set()
+    after = -1
+
+    def finish(done):
+        nonlocal stopped
+        for future in done:
+            idx, result, error = future.result()
+            if error is not None and is_quota_error(error):
+                # Left pending for the next resume
+                stopped = stopped or f"{type(error).__name__}: {error}"
+                continue
+            outcomes.append((idx, result, None if error is None else str(error)))
+
+    async def heartbeat():
+        # Keeps the lease while calls are slow (e.g. waiting for quota) and no checkpoint is due
+        nonlocal stopped
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 4)
+            if not store.renew(job["id"], owner):
+                stopped = stopped or "another runner took over the job"
+                return
+
+    keeper = asyncio.ensure_future(heartbeat())
+    try:
+        while stopped is None:
+            page = store.pending(job["id"], after)
+            if not page:
+                break
+            for idx, record in page:
+                after = idx
+                if stopped is not None:
+                    break
+                pending.add(asyncio.ensure_future(one(idx, record)))
+                if len(pending) >= window:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    finish(done)
+                if len(outcomes) >= CHECKPOINT_EVERY or (
+                        outcomes and time.perf_counter() - last_checkpoint >= CHECKPOINT_SECONDS):
+                    store.checkpoint(job["id"], outcomes, owner)
+                    progress.add(len(outcomes))
+                    outcomes = []
+                    last_checkpoint = time.perf_counter()
+        if pending:
+            done, pending = await asyncio.wait(pending)
+            finish(done)
+    finally:
+        for future in pending:
+            future.cancel()
+        keeper.cancel()
+        store.checkpoint(job["id"], outcomes, owner)
+        progress.add(len(outcomes))
+    return stopped
+
+
+# ============================
+# ENTRY POINTS
+# ============================
+
+def start_job(task_id, in_path="-", in_format=None, out_path=None, out_format=None, concurrency=1, store=None,
+              report=sys.stderr):
+    """
+    Create a job from an input file and run it; export the results when
+    it finishes and `out_path` is given.
+
+    Returns:
+        dict: The job after the run
+    """
+    if task_id != MULTI_TASK:
+        get_task(task_id)
+    store = store or JobStore()
+    in_format = in_format or detect_format(in_path)
+    options = {"in": in_path, "out": out_path, "out_format": out_format or detect_format(out_path, in_format),
+               "concurrency": concurrency}
+    source = open_input(in_path)
+    try:
+        job_id = store.create(task_id, read_records(source, in_format), options)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    if report:
+        print(f"[job {job_id} {task_id}] created with {store.job(job_id)['total']:,} items in {store.path}",
+              file=report)
+    return resume_job(job_id, store=store, report=report)
+
+
+def resume_job(job_id, concurrency=None, retry_failed=False, out_path=None, store=None, report=sys.stderr):
+    """
+    Continue a job from its checkpoint; export the results when it
+    finishes (to `out_path`, or the path given when it was started).
+
+    Returns:
+        dict: The job after the run
+    """
+    store = store or JobStore()
+    job = run_job(job_id, store, concurrency, report, retry_failed)
+    out_path = out_path or job["options"].get("out")
+    if job["status"] == "done" and out_path:
+        export_job(job_id, out_path, job["options"].get("out_format"), store)
+        if report:
+            print(f"[job {job_id}] results written to {out_path}", file=report)
+    return job
+
+
+def export_job(job_id, out_path="-", out_format=None, store=None):
+    """
+    Write a job's records with their results (or errors) in input order.
+    Unfinished items are written without either.
+
+    Returns:
+        int: Records written
+    """
+    target = open_output(out_path)
+    try:
+        return write_results(job_id, target, out_format or detect_format(out_path), store)
+    finally:
+        if target is not sys.stdout:
+            target.close()
+
+
+def write_results(job_id, stream, fmt="jsonl", store=None):
+    """
+    Stream a job's records with their results into an open text stream,
+    one page at a time.
+
+    Returns:
+        int: Records written
+    """
+    store = store or JobStore()
+    writer = RecordWriter(stream, fmt, job_fields(store.job(job_id)["task"]))
+    count = 0
+    for record in store.results(job_id):
+        writer.write(record)
+        count += 1
+    return count
+
+
+# ============================
+# BACKGROUND JOBS
+# ============================
+# The Streamlit bulk upload starts a job and keeps serving the page while
+# it runs; the worker threads live as long as the server process
+
+class BackgroundJob:
+    """
+    A job running in a daemon thread with its own store connection.
+
+    Attributes:
+        job_id (int): Job id
+        progress (JobProgress): Live counts, items/sec and ETA of this run
+        error (Exception): What stopped the runner, if it crashed
+    """
+
+    def __init__(self, job_id, concurrency=None, store_path=None):
+        self.job_id = job_id
+        self.error = None
+        self.__concurrency = concurrency
+        self.__store_path = store_path
+        store = JobStore(store_path)
+        try:
+            self.progress = JobProgress(store.job(job_id), None)
+        finally:
+            store.close()
+        self.__thread = threading.Thread(target=self.__run, name=f"job-{job_id}", daemon=True)
+        self.__thread.start()
+
+    @property
+    def running(self):
+        return self.__thread.is_alive()
+
+    def __run(self):
+        store = JobStore(self.__store_path)
+        try:
+            run_job(self.job_id, store, self.__concurrency, report=None, progress=self.progress)
+        except Exception as e:
+            self.error = e
+        finally:
+            store.close()
+
+
+_background = {}
+_background_lock = threading.Lock()
+
+
+def run_in_background(job_id, concurrency=None, store_path=None):
+    """
+    Start (or resume) a job in a background thread, unless this process
+    is already running it.
+
+    Returns:
+        BackgroundJob: The job's worker
+    """
+    with _background_lock:
+        worker = _background.get(job_id)
+        if worker is None or not worker.running:
+            worker = _background[job_id] = BackgroundJob(job_id, concurrency, store_path)
+        return worker
+
+
+def background_job(job_id):
+    """The job's worker in this process, or None."""
+    return _background.get(job_id)
+
+
+def job_summary(job):
+    """One status line for `app.py job status`."""
+    total = job["total"]
+    finished = job["done"] + job["failed"]
+    percent = finished / total * 100 if total else 100.0
+    return (f"{job['id']:>4}  {job['task']:<20} {job['status']:<8} {finished:>9,}/{total:<9,} ({percent:5.1f}%)  "
+            f"{job['failed']:,} failed, offset {job['checkpoint']:,}")
@@ -0,0 +1,318 @@
+"""
+AI NLP Toolkit - Offline Language Identifier
+============================================
+Description: Local character n-gram language identifier used in front of
+            Gemini for the Language Detection task.
+
+Most inputs can be identified without a network call:
+- Scripts used by one language (Bengali, Japanese kana, Hangul, Thai,
+  Greek, ...) are recognized from their Unicode ranges.
+- Latin and Cyrillic text is scored against per-language character
+  1-3 gram profiles (hashed into a fixed number of buckets).
+
+The profile matrix is built once from the seed texts in language_id_corpus/,
+saved as a .npy file next to this module and memory-mapped on later
+runs. Everything is NumPy-vectorized: one text costs a handful of array
+operations.
+
+When the best guess is below the confidence threshold, or the text mixes
+several scripts, `detect()` returns None and the caller escalates to
+Gemini (see tasks.run_task).
+
+Settings come from the environment:
+    LANGID_THRESHOLD     minimum confidence to answer locally (default 0.9)
+    LANGID_MODEL         model file path (default language_id_model.npy here)
+
+Usage:
+    python language_id.py build          # rebuild the model from language_id_corpus/
+    python language_id.py "Hola, ¿cómo estás?"
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(HERE, "language_id_corpus")
+DEFAULT_MODEL_PATH = os.path.join(HERE, "language_id_model.npy")
+DEFAULT_THRESHOLD = 0.9
+
+# Number of hash buckets for n-gram features (2**16 → ~3 MB model)
+BUCKETS = 1 << 16
+NGRAM_SIZES = (1, 2, 3)
+# Shorter texts are too ambiguous for the n-gram path
+MIN_LETTERS = 3
+# Converts mean per-n-gram log-likelihood gaps into a softmax confidence
+SHARPNESS = 12.0
+
+# Unicode ranges → script name (sorted by start code point)
+SCRIPT_RANGES = (
+    (0x0041, 0x024F, "Latin"),
+    (0x0370, 0x03FF, "Greek"),
+    (0x0400, 0x04FF, "Cyrillic"),
+    (0x0530, 0x058F, "Armenian"),
+    (0x0590, 0x05FF, "Hebrew"),
+    (0x0600, 0x06FF, "Arabic"),
+    (0x0900, 0x097F, "Devanagari"),
+    (0x0980, 0x09FF, "Bengali"),
+    (0x0A00, 0x0A7F, "Gurmukhi"),
+    (0x0A80, 0x0AFF, "Gujarati"),
+    (0x0B80, 0x0BFF, "Tamil"),
+    (0x0C00, 0x0C7F, "Telugu"),
+    (0x0C80, 0x0CFF, "Kannada"),
+    (0x0D00, 0x0D7F, "Malayalam"),
+    (0x0E00, 0x0E7F, "Thai"),
+    (0x10A0, 0x10FF, "Georgian"),
+    (0x1100, 0x11FF, "Hangul"),
+    (0x3040, 0x309F, "Kana"),
+    (0x30A0, 0x30FF, "Kana"),
+    (0x4E00, 0x9FFF, "Han"),
+    (0xAC00, 0xD7AF, "Hangul"),
+)
+
+# Scripts that identify a language on their own, with the confidence used
+SCRIPT_LANGUAGES = {
+    "Greek": ("Greek", 0.99),
+    "Armenian": ("Armenian", 0.99),
+    "Hebrew": ("Hebrew", 0.95),
+    "Arabic": ("Arabic", 0.85),        # also Persian, Urdu
+    "Devanagari": ("Hindi", 0.9),      # also Marathi, Nepali
+    "Bengali": ("Bengali", 0.95),      # also Assamese
+    "Gurmukhi": ("Punjabi", 0.99),
+    "Gujarati": ("Gujarati", 0.99),
+    "Tamil": ("Tamil", 0.99),
+    "Telugu": ("Telugu", 0.99),
+    "Kannada": ("Kannada", 0.99),
+    "Malayalam": ("Malayalam", 0.99),
+    "Thai": ("Thai", 0.99),
+    "Georgian": ("Georgian", 0.99),
+    "Hangul": ("Korean", 0.99),
+    "Kana": ("Japanese", 0.99),
+    "Han": ("Chinese", 0.9),           # Japanese text without kana looks the same
+}
+
+# Scripts resolved by the n-gram profiles
+NGRAM_SCRIPTS = ("Latin", "Cyrillic")
+
+_RANGE_STARTS = np.array([r[0] for r in SCRIPT_RANGES], dtype=np.int64)
+_RANGE_ENDS = np.array([r[1] for r in SCRIPT_RANGES], dtype=np.int64)
+_RANGE_SCRIPTS = np.array([r[2] for r in SCRIPT_RANGES])
+
+
+# ============================
+# FEATURE EXTRACTION
+# ============================
+
+def _codepoints(text):
+    return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+
+
+def script_counts(text):
+    """
+    Count letters per script in a text.
+
+    Returns:
+        dict: {script name: letter count}
+    """
+    cps = _codepoints(text)
+    if cps.size == 0:
+        return {}
+    slot = np.searchsorted(_RANGE_STARTS, cps, side="right") - 1
+    inside = (slot >= 0) & (cps <= _RANGE_ENDS[np.maximum(slot, 0)])
+    # Latin range also covers ASCII punctuation and digits; keep letters only
+    letters = np.fromiter((ch.isalpha() for ch in text), dtype=bool, count=len(text))
+    names, counts = np.unique(_RANGE_SCRIPTS[slot[inside & letters]], return_counts=True)
+    return dict(zip(names.tolist(), counts.tolist()))
+
+
+def ngram_buckets(text):
+    """
+    Hash the character 1-3 grams of a text into bucket indices.
+
+    Text is lowercased, non-letters become spaces and each word is padded
+    with a space, so "Hi there" gives " hi there " before n-gramming.
+
+    Returns:
+        ndarray: int64 bucket index per n-gram occurrence
+    """
+    cleaned = "".join(ch if ch.isalpha() else " " for ch in text.lower())
+    cleaned = " " + " ".join(cleaned.split()) + " "
+    cps = _codepoints(cleaned)
+
+    hashes = []
+    for n in NGRAM_SIZES:
+        if cps.size < n:
+            continue
+        # Polynomial rolling hash over a sliding window, fully vectorized
+        h = np.full(cps.size - n + 1, n, dtype=np.int64)
+        for offset in range(n):
+            h = (h * 1_000_003 + cps[offset:cps.size - n + 1 + offset]) & 0x7FFFFFFF
+        # Skip the lone-space unigram; it carries no language signal
+        if n == 1:
+            h = h[cps != 32]
+        hashes.append(h % BUCKETS)
+    return np.concatenate(hashes) if hashes else np.empty(0, dtype=np.int64)
+
+
+# ============================
+# MODEL BUILDING
+# ============================
+
+def build_model(corpus_dir=CORPUS_DIR, out_path=DEFAULT_MODEL_PATH):
+    """
+    Build the n-gram profile matrix from seed texts.
+
+    Every `<language>.txt` file in corpus_dir becomes one profile row of
+    add-one smoothed log probabilities over the hash buckets. The matrix
+    is saved as float32 .npy (memory-mappable) and the language names
+    as a JSON sidecar.
+
+    Returns:
+        list: Language names in row order
+    """
+    languages = []
+    rows = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if not name.endswith(".txt"):
+            continue
+        with open(os.path.join(corpus_dir, name), encoding="utf-8") as f:
+            text = f.read()
+        counts = np.bincount(ngram_buckets(text), minlength=BUCKETS).astype(np.float64)
+        rows.append(np.log((counts + 1.0) / (counts.sum() + BUCKETS)))
+        languages.append(name[:-4].capitalize())
+
+    np.save(out_path, np.vstack(rows).astype(np.float32))
+    with open(out_path + ".json", "w", encoding="utf-8") as f:
+        json.dump({"languages": languages, "buckets": BUCKETS, "ngrams": list(NGRAM_SIZES)}, f)
+    return languages
+
+
+# ============================
+# LANGUAGE IDENTIFIER CLASS
+# ============================
+
+class LanguageIdentifier:
+    """
+    Script + n-gram language identifier with a confidence score.
+
+    The model is loaded (memory-mapped) on first use and shared by every
+    caller; it is built from language_id_corpus/ if the file does not exist.
+
+    Attributes:
+        threshold (float): Minimum confidence for a local answer
+        local (int): Texts answered locally
+        escalated (int): Texts left for Gemini
+    """
+
+    def __init__(self, model_path=None, threshold=None):
+        self.model_path = model_path or os.getenv("LANGID_MODEL", DEFAULT_MODEL_PATH)
+        self.threshold = float(threshold if threshold is not None else os.getenv("LANGID_THRESHOLD", DEFAULT_THRESHOLD))
+        self.local = 0
+        self.escalated = 0
+        self.__profiles = None
+        self.__languages = None
+        self.__lock = threading.Lock()
+
+    def __load(self):
+        with self.__lock:
+            if self.__profiles is None:
+                if not os.path.exists(self.model_path):
+                    build_model(out_path=self.model_path)
+                with open(self.model_path + ".json", encoding="utf-8") as f:
+                    self.__languages = json.load(f)["languages"]
+                self.__profiles = np.load(self.model_path, mmap_mode="r")
+        return self.__profiles, self.__languages
+
+    def identify(self, text):
+        """
+        Best local guess for a text, whatever its confidence.
+
+        Returns:
+            tuple: (language or None, confidence 0-1, method) where method
+                is "script", "ngram", "mixed" or "empty"
+        """
+        scripts = script_counts(text)
+        total = sum(scripts.values())
+        if total == 0:
+            return None, 0.0, "empty"
+
+        script, count = max(scripts.items(), key=lambda item: item[1])
+        # Japanese mixes kana with Han characters; treat them as one script
+        if script == "Han" and "Kana" in scripts:
+            script, count = "Kana", scripts["Kana"] + count
+        elif script == "Kana":
+            count += scripts.get("Han", 0)
+        share = count / total
+        if share < 0.8:
+            return None, share, "mixed"
+
+        if script in SCRIPT_LANGUAGES:
+            language, confidence = SCRIPT_LANGUAGES[script]
+            return language, confidence * share, "script"
+        if script not in NGRAM_SCRIPTS or count < MIN_LETTERS:
+            return None, 0.0, "ngram"
+
+        profiles, languages = self.__load()
+        buckets = ngram_buckets(text)
+        # Mean log-likelihood per n-gram for every language at once
+        scores = np.asarray(profiles[:, buckets], dtype=np.float64).mean(axis=1)
+        probs = np.exp((scores - scores.max()) * SHARPNESS)
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        return languages[best], float(probs[best]) * share, "ngram"
+
+    def detect(self, text):
+        """
+        Local answer if confident enough, otherwise None (escalate).
+
+        Returns:
+            tuple: (language, confidence) or None
+        """
+        language, confidence, _method = self.identify(text)
+        if language is not None and confidence >= self.threshold:
+            self.local += 1
+            return language, confidence
+        self.escalated += 1
+        return None
+
+    def stats(self):
+        """Return local/escalated counts and the escalation rate."""
+        total = self.local + self.escalated
+        return {
+            "local": self.local,
+            "escalated": self.escalated,
+            "escalation_rate": round(self.escalated / total, 4) if total else 0.0,
+            "threshold": self.threshold,
+        }
+
+
+# Process-wide identifier (model loaded on first use)
+identifier = LanguageIdentifier()
+
+
+def local_answer(text):
+    """
+    Local handler for the Language Detection task (see tasks.py).
+
+    Returns:
+        str: Answer text, or None to escalate to Gemini
+    """
+    result = identifier.detect(text)
+    if result is None:
+        return None
+    language, confidence = result
+    return f"**Language:** {language}\n\nDetected locally (confidence {confidence:.0%})."
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["build"]:
+        print("Built profiles for:", ", ".join(build_model()))
+    else:
+        for arg in sys.argv[1:]:
+            start = time.perf_counter()
+            language, confidence, method = identifier.identify(arg)
+            print(f"{arg!r}: {language} ({confidence:.2f}, {method}) in {(time.perf_counter() - start) * 1000:.2f} ms")
@@ -0,0 +1,277 @@
+"""
+AI NLP Toolkit - Long-Document Pipeline
+=======================================
+Description: Map-reduce processing of long inputs for Text Summarization,
+            Language Translation and Keyword Extraction.
+
+Sending a whole book chapter in one prompt means one long serial call
+(and, for translation, an answer that can run past the output limit).
+Inputs whose estimated token count is above a threshold are instead:
+
+1. split into chunks at paragraph, then sentence, then word boundaries,
+2. sent to Gemini in parallel (one request per chunk, cached per chunk),
+3. merged: summaries are summarized again, translations are joined in
+   the original order, keywords are ranked by how many chunks they
+   appear in.
+
+Streaming callers receive each chunk's result as soon as it and every
+chunk before it are done, followed by the merged result.
+
+Settings come from the environment:
+    LONGDOC_THRESHOLD    estimated tokens above which an input is split (default 3000)
+    LONGDOC_CHUNK        target tokens per chunk (default 1200)
+    LONGDOC_WORKERS      chunks processed in parallel (default 4)
+
+Usage:
+    from longdoc import needs_chunking, run_long_task
+
+    if needs_chunking(task, [text]):
+        summary = run_long_task(task, text)
+"""
+
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import cache_key, get_cache
+from gemini_client import estimate_tokens, generate_content
+from profiles import route
+
+DEFAULT_THRESHOLD = 3000
+DEFAULT_CHUNK_TOKENS = 1200
+DEFAULT_WORKERS = 4
+TOP_KEYWORDS = 20
+
+REDUCE_SUMMARY_PROMPT = (
+    "These are summaries of consecutive parts of one long document, in order. "
+    "Combine them into one concise summary of the whole document:\n\n{parts}"
+)
+KEYWORDS_PROMPT = (
+    "Extract the most important keywords and key phrases from this text. "
+    "Reply with one keyword or phrase per line, most important first, without numbering: {text}"
+)
+
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_SENTENCE = re.compile(r"(?<=[.!?।])\s+")
+_LIST_MARKER = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+
+def _setting(name, default):
+    return int(os.getenv(name, default))
+
+
+def needs_chunking(task, inputs):
+    """Return True if this task splits long inputs and the input is over the threshold."""
+    return (task.chunking is not None and len(inputs) == 1
+            and estimate_tokens(inputs[0]) > _setting("LONGDOC_THRESHOLD", DEFAULT_THRESHOLD))
+
+
+# ============================
+# SPLITTING
+# ============================
+
+def split_text(text, max_tokens=None):
+    """
+    Split a text into chunks of at most `max_tokens` estimated tokens.
+
+    Paragraphs are kept whole when they fit, otherwise split into
+    sentences (., !, ? and the Bangla danda), and sentences that are
+    still too long are split between words. Pieces are then packed
+    greedily into chunks, keeping their original order.
+
+    Returns:
+        list: Chunk strings
+    """
+    max_tokens = max_tokens or _setting("LONGDOC_CHUNK", DEFAULT_CHUNK_TOKENS)
+    pieces = []  # (text, separator that followed it in the original)
+    for paragraph in _PARAGRAPH.split(text.strip()):
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append((paragraph, "\n\n"))
+            continue
+        for sentence in _SENTENCE.split(paragraph):
+            if estimate_tokens(sentence) <= max_tokens:
+                pieces.append((sentence, " "))
+            else:
+                pieces.extend((part, " ") for part in _split_words(sentence, max_tokens))
+        pieces[-1] = (pieces[-1][0], "\n\n")
+
+    chunks, current, size = [], [], 0
+    for piece, separator in pieces:
+        tokens = estimate_tokens(piece)
+        if current and size + tokens > max_tokens:
+            chunks.append("".join(current).strip())
+            current, size = [], 0
+        current.append(piece + separator)
+        size += tokens
+    if current:
+        chunks.append("".join(current).strip())
+    return chunks
+
+
+def _split_words(sentence, max_tokens):
+    max_chars = max_tokens * 4
+    part, length = [], 0
+    for word in sentence.split():
+        if part and length + len(word) + 1 > max_chars:
+            yield " ".join(part)
+            part, length = [], 0
+        part.append(word)
+        length += len(word) + 1
+    if part:
+        yield " ".join(part)
+
+
+# ============================
+# MAP
+# ============================
+
+def _generate(task, stage, prompt):
+    # One cached Gemini call; `stage` keeps chunk/reduce prompts apart from whole-task entries
+    choice = route(task, [prompt])
+
+    def generate():
+        return generate_content(prompt, choice.model, choice.generation_config, task_id=task.id,
+                                profile=choice.profile).text
+
+    cache = get_cache(choice.generation_config)
+    if cache is None:
+        return generate()
+    return cache.get_or_compute(cache_key(choice.model, choice.generation_config, f"{task.id}:{stage}", [prompt]),
+                                generate)
+
+
+def _map_chunk(task, chunk):
+    if task.chunking == "keywords":
+        return _parse_keywords(_generate(task, "chunk", KEYWORDS_PROMPT.format(text=chunk)))
+    return _generate(task, "chunk", task.render(chunk))
+
+
+def _parse_keywords(text):
+    keywords = []
+    for line in text.splitlines():
+        keyword = _LIST_MARKER.sub("", line).strip().strip("*").strip()
+        if keyword:
+            keywords.append(keyword)
+    return keywords
+
+
+def _map_chunks(task, chunks):
+    # Yields (index, result) in input order while later chunks keep running
+    workers = max(1, _setting("LONGDOC_WORKERS", DEFAULT_WORKERS))
+    with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        futures = [pool.submit(_map_chunk, task, chunk) for chunk in chunks]
+        try:
+            for index, future in enumerate(futures):
+                yield index, future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+# ============================
+# REDUCE
+# ============================
+
+def _reduce(task, results):
+    if task.chunking == "concat":
+        return "\n\n".join(results)
+    if task.chunking == "keywords":
+        return merge_keywords(results)
+    return _reduce_summaries(task, results)
+
+
+def _reduce_summaries(task, summaries):
+    # Summaries that together are still too long are reduced in groups first
+    max_tokens = _setting("LONGDOC_CHUNK", DEFAULT_CHUNK_TOKENS) * 2
+    while len(summaries) > 1 and estimate_tokens("\n\n".join(summaries)) > max_tokens:
+        groups, group, size = [], [], 0
+        for summary in summaries:
+            tokens = estimate_tokens(summary)
+            if group and size + tokens > max_tokens:
+                groups.append(group)
+                group, size = [], 0
+            group.append(summary)
+            size += tokens
+        groups.append(group)
+        if len(groups) == len(summaries):
+            break
+        workers = max(1, _setting("LONGDOC_WORKERS", DEFAULT_WORKERS))
+        with ThreadPoolExecutor(max_workers=min(workers, len(groups))) as pool:
+            summaries = list(pool.map(lambda g: _generate(task, "reduce", _summary_prompt(g)), groups))
+    if len(summaries) == 1:
+        return summaries[0]
+    return _generate(task, "reduce", _summary_prompt(summaries))
+
+
+def _summary_prompt(summaries):
+    parts = "\n\n".join(f"Part {i}:\n{summary}" for i, summary in enumerate(summaries, 1))
+    return REDUCE_SUMMARY_PROMPT.format(parts=parts)
+
+
+def merge_keywords(keyword_lists, top=TOP_KEYWORDS):
+    """
+    Rank keywords from several chunks.
+
+    A keyword scores one point per chunk it appears in (case-insensitive),
+    ties are broken by its best position within a chunk.
+
+    Returns:
+        str: Markdown list of the top keywords
+    """
+    counts = Counter()
+    best_rank = {}
+    spelling = {}
+    for keywords in keyword_lists:
+        for rank, keyword in enumerate(dict.fromkeys(keywords)):
+            key = keyword.lower()
+            counts[key] += 1
+            best_rank[key] = min(rank, best_rank.get(key, rank))
+            spelling.setdefault(key, keyword)
+    ranked = sorted(counts, key=lambda key: (-counts[key], best_rank[key]))[:top]
+    lines = [f"- {spelling[key]}" + (f" (×{counts[key]})" if counts[key] > 1 else "") for key in ranked]
+    return f"**Keywords** (from {len(keyword_lists)} parts):\n" + "\n".join(lines)
+
+
+# ============================
+# ENTRY POINTS
+# ============================
+
+def run_long_task(task, text):
+    """
+    Map-reduce one long input through a chunking task.
+
+    Args:
+        task (Task): Task with `chunking` set ("summary", "concat" or "keywords")
+        text (str): Long input text
+
+    Returns:
+        str: Merged result
+    """
+    chunks = split_text(text)
+    return _reduce(task, [result for _, result in _map_chunks(task, chunks)])
+
+
+def stream_long_task(task, text):
+    """
+    Streaming version of run_long_task().
+
+    Yields each chunk's result (in document order) as soon as it is ready,
+    then the merged result for summaries and keywords. Translations are
+    complete once the last chunk has been yielded.
+
+    Yields:
+        str: Markdown text pieces
+    """
+    chunks = split_text(text)
+    results = []
+    for index, result in _map_chunks(task, chunks):
+        results.append(result)
+        if task.chunking == "concat":
+            yield ("\n\n" if index else "") + result
+        elif task.chunking == "keywords":
+            yield f"_Part {index + 1}/{len(chunks)}:_ {', '.join(result[:8])}\n\n"
+        else:
+            yield f"_Part {index + 1}/{len(chunks)}:_ {result}\n\n"
+    if task.chunking != "concat":
+        yield "---\n\n" + _reduce(task, results)
@@ -0,0 +1,356 @@
+"""
+AI NLP Toolkit - Metrics
+========================
+Description: Process-wide instrumentation for task latency, Gemini token
+            usage, errors and queue depth, exported as Prometheus text
+            or JSON.
+
+Recorded series:
+    nlp_task_latency_seconds{task}            end-to-end latency histogram
+    nlp_gemini_latency_seconds{task,model}    upstream call latency histogram
+    nlp_gemini_input_tokens_total{task,model} prompt tokens (usage_metadata)
+    nlp_gemini_output_tokens_total{task,model} response tokens (usage_metadata)
+    nlp_task_errors_total{task,error}         failed task calls by error type
+    nlp_in_flight{stage}                      calls currently running (queue depth)
+    nlp_stage_latency_seconds{stage}          other timed stages (e.g. UI reruns)
+    nlp_profile_latency_seconds{profile}      upstream latency per generation profile
+    nlp_profile_cost_usd_total{profile}       estimated spend per generation profile
+
+The JSON snapshot also includes the counters kept by the cache,
+resilience, micro-batching, semantic cache and language-ID cascade
+modules.
+
+Usage:
+    from metrics import metrics
+
+    with metrics.track_task("sentiment"):
+        ...
+    print(metrics.to_prometheus())
+    print(metrics.to_json())
+"""
+
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+
+# ============================
+# HISTOGRAM CLASS
+# ============================
+
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus style, not thread-safe on its own)."""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimate the q-th quantile (0-1) by linear interpolation inside buckets.
+
+        Returns:
+            float: Estimated value, or None if nothing was observed
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, n in zip(self.buckets, self.counts):
+            if seen + n >= rank and n:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / n
+            seen += n
+            if bound != float("inf"):
+                lower = bound
+        return lower
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else None,
+            "p50": _round(self.quantile(0.5)),
+            "p95": _round(self.quantile(0.95)),
+            "p99": _round(self.quantile(0.99)),
+        }
+
+
+def _round(value):
+    return None if value is None else round(value, 6)
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+# ============================
+# METRICS REGISTRY CLASS
+# ============================
+
+class Metrics:
+    """
+    Thread-safe registry of the toolkit's metrics.
+
+    Attributes:
+        started (float): Process start time (epoch seconds)
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.__lock = threading.Lock()
+        self.__task_latency = {}     # task -> Histogram
+        self.__gemini_latency = {}   # (task, model) -> Histogram
+        self.__tokens = {}           # (task, model) -> [input, output]
+        self.__errors = {}           # (task, error type) -> count
+        self.__in_flight = {}        # stage -> current count
+        self.__stages = {}           # stage -> Histogram
+        self.__profiles = {}         # profile -> Histogram
+        self.__profile_tokens = {}   # profile -> {model: [input, output]}
+
+    # ---------- recording ----------
+
+    def observe_task(self, task_id, seconds):
+        with self.__lock:
+            self.__task_latency.setdefault(task_id, Histogram()).observe(seconds)
+
+    def observe_gemini(self, task_id, model, seconds, usage=None, profile=None):
+        """
+        Record one upstream call.
+
+        Args:
+            usage: Response usage_metadata (prompt_token_count /
+                candidates_token_count), or None
+            profile (str): Generation profile the call was routed to, if any
+        """
+        key = (task_id or "none", model)
+        input_tokens = getattr(usage, "prompt_token_count", 0) or 0
+        output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+        with self.__lock:
+            self.__gemini_latency.setdefault(key, Histogram()).observe(seconds)
+            if usage is not None:
+                tokens = self.__tokens.setdefault(key, [0, 0])
+                tokens[0] += input_tokens
+                tokens[1] += output_tokens
+            if profile is not None:
+                self.__profiles.setdefault(profile, Histogram()).observe(seconds)
+                tokens = self.__profile_tokens.setdefault(profile, {}).setdefault(model, [0, 0])
+                tokens[0] += input_tokens
+                tokens[1] += output_tokens
+
+    def observe_stage(self, stage, seconds):
+        """Record the duration of a non-task stage (e.g. "ui_rerun")."""
+        with self.__lock:
+            self.__stages.setdefault(stage, Histogram()).observe(seconds)
+
+    def count_error(self, task_id, error):
+        key = (task_id or "none", type(error).__name__)
+        with self.__lock:
+            self.__errors[key] = self.__errors.get(key, 0) + 1
+
+    def adjust_in_flight(self, stage, delta):
+        with self.__lock:
+            self.__in_flight[stage] = self.__in_flight.get(stage, 0) + delta
+
+    @contextmanager
+    def track_task(self, task_id):
+        """Time a task call, counting it as in flight and recording any error."""
+        self.adjust_in_flight("task", 1)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.count_error(task_id, e)
+            raise
+        finally:
+            self.adjust_in_flight("task", -1)
+            self.observe_task(task_id, time.perf_counter() - start)
+
+    # ---------- summaries ----------
+
+    def totals(self):
+        """
+        Headline numbers for dashboards (e.g. the Streamlit Quick Stats panel).
+
+        Returns:
+            dict: requests, errors, p50/p95 latency (seconds), input/output
+                tokens, in-flight calls and uptime
+        """
+        with self.__lock:
+            overall = Histogram()
+            for hist in self.__task_latency.values():
+                overall.count += hist.count
+                overall.sum += hist.sum
+                overall.counts = [a + b for a, b in zip(overall.counts, hist.counts)]
+            input_tokens = sum(t[0] for t in self.__tokens.values())
+            output_tokens = sum(t[1] for t in self.__tokens.values())
+            errors = sum(self.__errors.values())
+            in_flight = self.__in_flight.get("task", 0)
+        return {
+            "requests": overall.count,
+            "errors": errors,
+            "p50_seconds": _round(overall.quantile(0.5)),
+            "p95_seconds": _round(overall.quantile(0.95)),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "in_flight": in_flight,
+            "uptime_seconds": round(time.time() - self.started, 1),
+        }
+
+    def snapshot(self):
+        """Return every metric (plus the other modules' counters) as a dict."""
+        with self.__lock:
+            data = {
+                "tasks": {task: hist.to_dict() for task, hist in self.__task_latency.items()},
+                "gemini": {
+                    f"{task}/{model}": dict(hist.to_dict(),
+                                            input_tokens=self.__tokens.get((task, model), [0, 0])[0],
+                                            output_tokens=self.__tokens.get((task, model), [0, 0])[1])
+                    for (task, model), hist in self.__gemini_latency.items()
+                },
+                "errors": {f"{task}/{error}": n for (task, error), n in self.__errors.items()},
+                "in_flight": dict(self.__in_flight),
+                "stages": {stage: hist.to_dict() for stage, hist in self.__stages.items()},
+            }
+            observed = self.__observed_profiles()
+        data["profiles"] = _profile_summary(observed)
+        data["totals"] = self.totals()
+        data.update(_external_counters())
+        return data
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.__lock:
+            self.__histograms(lines, "nlp_task_latency_seconds", "End-to-end task latency",
+                              {(task,): hist for task, hist in self.__task_latency.items()}, ("task",))
+            self.__histograms(lines, "nlp_gemini_latency_seconds", "Gemini call latency",
+                              self.__gemini_latency, ("task", "model"))
+            self.__histograms(lines, "nlp_stage_latency_seconds", "Duration of other timed stages",
+                              {(stage,): hist for stage, hist in self.__stages.items()}, ("stage",))
+            self.__histograms(lines, "nlp_profile_latency_seconds", "Gemini call latency per generation profile",
+                              {(profile,): hist for profile, hist in self.__profiles.items()}, ("profile",))
+            observed = self.__observed_profiles()
+
+            for index, name, help_text in ((0, "nlp_gemini_input_tokens_total", "Prompt tokens sent to Gemini"),
+                                           (1, "nlp_gemini_output_tokens_total", "Tokens generated by Gemini")):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for (task, model), tokens in self.__tokens.items():
+                    lines.append(f"{name}{{{_labels(task=task, model=model)}}} {tokens[index]}")
+
+            lines += ["# HELP nlp_task_errors_total Failed task calls", "# TYPE nlp_task_errors_total counter"]
+            for (task, error), n in self.__errors.items():
+                lines.append(f"nlp_task_errors_total{{{_labels(task=task, error=error)}}} {n}")
+
+            lines += ["# HELP nlp_in_flight Calls currently running", "# TYPE nlp_in_flight gauge"]
+            for stage, n in self.__in_flight.items():
+                lines.append(f"nlp_in_flight{{{_labels(stage=stage)}}} {n}")
+
+        lines += ["# HELP nlp_profile_cost_usd_total Estimated spend per generation profile",
+                  "# TYPE nlp_profile_cost_usd_total counter"]
+        for profile, summary in _profile_summary(observed).items():
+            lines.append(f"nlp_profile_cost_usd_total{{{_labels(profile=profile)}}} {summary['cost_usd']}")
+
+        for group, values in _external_counters().items():
+            name = f"nlp_{group}"
+            lines += [f"# TYPE {name} gauge"]
+            for key, value in _flatten(values):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"{name}{{{_labels(key=key)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def __observed_profiles(self):
+        # Called with the lock held
+        return {profile: {"latency": hist.to_dict(),
+                          "tokens": {model: list(tokens) for model, tokens in self.__profile_tokens.get(profile, {}).items()}}
+                for profile, hist in self.__profiles.items()}
+
+    @staticmethod
+    def __histograms(lines, name, help_text, histograms, label_names):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for label_values, hist in histograms.items():
+            labels = dict(zip(label_names, label_values))
+            cumulative = 0
+            for bound, n in zip(hist.buckets, hist.counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{{{_labels(**labels, le=le)}}} {cumulative}")
+            lines.append(f"{name}_sum{{{_labels(**labels)}}} {hist.sum}")
+            lines.append(f"{name}_count{{{_labels(**labels)}}} {hist.count}")
+
+    def reset(self):
+        with self.__lock:
+            self.__task_latency.clear()
+            self.__gemini_latency.clear()
+            self.__tokens.clear()
+            self.__errors.clear()
+            self.__in_flight.clear()
+            self.__stages.clear()
+            self.__profiles.clear()
+            self.__profile_tokens.clear()
+        self.started = time.time()
+
+
+def _flatten(values, prefix=""):
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}.")
+        else:
+            yield f"{prefix}{key}", value
+
+
+def _profile_summary(observed):
+    # Imported lazily: profiles.py imports gemini_client, which imports this module
+    import profiles
+
+    return profiles.profile_summary(observed)
+
+
+def _external_counters():
+    # Counters owned by other modules, imported lazily to avoid cycles
+    import cache
+    import microbatch
+    import multitask
+    import preprocess
+    import resilience
+    import tasks
+
+    shared = cache.get_cache()
+    # Not imported here: it loads NumPy, and is only present once enabled and used
+    semantic = sys.modules.get("semantic_cache")
+    return {
+        "cache": shared.stats() if shared is not None else {},
+        "resilience": dict(resilience.counters),
+        "microbatch": dict(microbatch.stats),
+        "multitask": dict(multitask.stats),
+        "semantic": semantic.semantic_stats() if semantic is not None else {},
+        "preprocess": preprocess.tokens_saved(),
+        "cascade": tasks.cascade_summary(),
+        "ttft": tasks.ttft_summary(),
+    }
+
+
+# Process-wide registry
+metrics = Metrics()
@@ -0,0 +1,261 @@
+"""
+AI NLP Toolkit - Micro-Batching
+===============================
+Description: Packs many short inputs for a classification task into one
+            Gemini request and splits the reply back per input.
+
+Tasks such as Sentiment Analysis or Spam Detection send one tweet-sized
+text per request, so nearly all latency is per-call overhead. A
+micro-batch sends up to N inputs as a JSON array and asks for a JSON
+array of answers in the same order. If the reply cannot be parsed (or has
+the wrong length), every input in that batch falls back to a normal
+single call, so callers always get an answer.
+
+Packed answers are cached under their own key (the task's settings plus
+a "microbatch" marker), so a single call never gets an answer that was
+produced in a packed request. Packed runs do reuse cached single-call
+answers.
+
+Only tasks marked `batchable=True` in tasks.py are packed.
+
+Usage:
+    from microbatch import MicroBatcher, run_micro_batch
+
+    # explicit batch (e.g. batch mode)
+    results = run_micro_batch("sentiment", ["I love it", "Terrible", "Meh"])
+
+    # collector for concurrent callers: up to 20 inputs or 50 ms per request
+    batcher = MicroBatcher("spam", max_batch=20, max_wait_ms=50)
+    result = batcher.run("WIN A FREE PHONE!!!")
+"""
+
+import json
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from cache import cache_key, get_cache
+from preprocess import dedupe, prepare
+from profiles import scale_cap
+from tasks import get_task
+
+DEFAULT_MAX_BATCH = 20
+DEFAULT_MAX_WAIT_MS = 50
+
+BATCH_PROMPT = (
+    "{instruction}.\n"
+    "Apply this to EACH of the {count} texts in the JSON array below separately.\n"
+    "Reply with ONLY a JSON array of {count} strings, one short answer per text, in the same order.\n"
+    "Texts: {texts}"
+)
+
+# Counters shared by every micro-batch in the process
+stats = {"requests": 0, "items": 0, "local": 0, "cache_hits": 0, "fallback_items": 0}
+_stats_lock = threading.Lock()
+
+_FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+
+
+def _count(**amounts):
+    with _stats_lock:
+        for name, amount in amounts.items():
+            stats[name] += amount
+
+
+def parse_json_reply(text):
+    """
+    Parse a JSON value from a model reply, tolerating ```json fences.
+
+    Raises:
+        ValueError: If the reply is not valid JSON
+    """
+    return json.loads(_FENCE.sub("", text.strip()))
+
+
+def _split_reply(text, count):
+    # Returns a list of `count` strings, or None if the reply is unusable
+    try:
+        answers = parse_json_reply(text)
+    except ValueError:
+        return None
+    if not isinstance(answers, list) or len(answers) != count:
+        return None
+    return [a if isinstance(a, str) else json.dumps(a, ensure_ascii=False) for a in answers]
+
+
+def run_micro_batch(task_id, texts, engine=None):
+    """
+    Run a batchable task over several texts with as few requests as possible.
+
+    Texts are cleaned first (preprocess.py). Texts the task can answer
+    offline (see Task.local) and cached texts are answered without a
+    request, duplicates are sent once, and the rest go out in a single
+    request. Packed requests and single-call fallbacks wait for the
+    engine's concurrency slots and RPM/TPM quota (async_engine.py).
+    Packed answers are cached under packed_cache_key().
+
+    Args:
+        task_id (str): Id of a task with batchable=True
+        texts (list): Input texts
+        engine (AsyncEngine): Engine whose limits apply (default: the process-wide one)
+
+    Returns:
+        list: One result string per input, in order
+
+    Raises:
+        ValueError: If the task cannot be micro-batched
+    """
+    task = get_task(task_id)
+    if not task.batchable:
+        raise ValueError(f"Task '{task.id}' does not support micro-batching")
+
+    _count(items=len(texts))
+    unique, positions = dedupe([prepare(task, [text]) for text in texts])
+    answers = _run_unique(task, [inputs[0] for inputs in unique], engine)
+    return [answers[i] for i in positions]
+
+
+def packed_cache_key(task, text):
+    """Cache key for an answer from a packed request (never read by single calls)."""
+    return cache_key(task.model, dict(task.generation_config or {}, microbatch=True), task.id, [text])
+
+
+def _cached(cache, task, text):
+    # A single-call answer is as good as a packed one
+    if cache is None:
+        return None
+    answer = cache.get(cache_key(task.model, task.generation_config, task.id, [text]))
+    return answer if answer is not None else cache.get(packed_cache_key(task, text))
+
+
+def _run_unique(task, texts, engine=None):
+    cache = get_cache()
+    results = [None] * len(texts)
+    pending = {}  # text -> list of positions waiting for it
+    local = 0
+    for i, text in enumerate(texts):
+        answer = task.local_answer(text)
+        if answer is not None:
+            results[i] = answer
+            local += 1
+            continue
+        cached = _cached(cache, task, text)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.setdefault(text, []).append(i)
+    _count(local=local, cache_hits=len(texts) - local - sum(map(len, pending.values())))
+    if not pending:
+        return results
+    if engine is None:
+        # Imported on first use, so importing this module never loads asyncio
+        from async_engine import engine
+
+    unique = list(pending)
+    answers = None
+    if len(unique) > 1:
+        prompt = BATCH_PROMPT.format(instruction=task.instruction, count=len(unique),
+                                     texts=json.dumps(unique, ensure_ascii=False))
+        _count(requests=1)
+        try:
+            # The output cap grows with the number of answers packed in
+            config = scale_cap(task.generation_config, len(unique))
+            reply = engine.generate_blocking(prompt, task.model, config, task_id=task.id, profile=task.profile)
+            answers = _split_reply(reply.text, len(unique))
+        except Exception:
+            answers = None
+
+    if answers is None:
+        # Parse failure (or a single input): one normal call per text
+        _count(fallback_items=len(unique) if len(unique) > 1 else 0, requests=len(unique))
+        answers = [engine.run_task_sync(task.id, text) for text in unique]
+    elif cache:
+        for text, answer in zip(unique, answers):
+            cache.set(packed_cache_key(task, text), answer)
+
+    for text, answer in zip(unique, answers):
+        for i in pending[text]:
+            results[i] = answer
+    return results
+
+
+# ============================
+# MICRO-BATCHER CLASS
+# ============================
+
+class MicroBatcher:
+    """
+    Collects single inputs from many callers and sends them in batches.
+
+    A batch is sent when `max_batch` inputs are waiting or `max_wait_ms`
+    has passed since the first one arrived, whichever comes first.
+    Batches are dispatched on a small thread pool so the next batch can
+    fill up while the previous one is in flight. The API server uses one
+    per batchable task when micro-batching is on (api_server.py).
+    """
+
+    def __init__(self, task_id, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS, workers=4,
+                 engine=None):
+        self.task = get_task(task_id)
+        if not self.task.batchable:
+            raise ValueError(f"Task '{self.task.id}' does not support micro-batching")
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.engine = engine
+        self.__queue = queue.Queue()
+        self.__pool = ThreadPoolExecutor(max_workers=workers)
+        self.__closed = False
+        self.__thread = threading.Thread(target=self.__collect, daemon=True)
+        self.__thread.start()
+
+    def submit(self, text):
+        """Queue one input. Returns a Future resolving to its result string."""
+        if self.__closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self.__queue.put((text, future))
+        return future
+
+    def run(self, text):
+        """Blocking helper: submit one input and wait for its result."""
+        return self.submit(text).result()
+
+    def close(self):
+        """Flush what is queued and stop the collector thread."""
+        self.__closed = True
+        self.__queue.put(None)
+        self.__thread.join()
+        self.__pool.shutdown(wait=True)
+
+    def __collect(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.__queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.__pool.submit(self.__dispatch, batch)
+                    return
+                batch.append(item)
+            self.__pool.submit(self.__dispatch, batch)
+
+    def __dispatch(self, batch):
+        try:
+            results = run_micro_batch(self.task.id, [text for text, _ in batch], self.engine)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
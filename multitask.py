@@ -0,0 +1,189 @@
+"""
+AI NLP Toolkit - Analyze Everything (Multi-Task Requests)
+=========================================================
+Description: Runs several single-text tasks on the same text with one
+            combined Gemini request and splits the reply back per task.
+
+Operators often run Sentiment, Emotion, Intent, NER, Keywords and Spam on
+the same message. Done one task at a time that is six requests, each
+paying for the same input tokens. A multi-task request lists every task's
+instruction once, sends the text once, and asks for a JSON object with
+one section per task id. Sections that are missing or cannot be parsed
+fall back to a normal single call for that task only. A failing single
+call is reported for its task alone, except an open circuit breaker or
+quota error, which is raised like an error of the combined request.
+
+Tasks answered offline (Task.local) or already in the response cache are
+not included in the request, and long documents for chunking tasks go
+through longdoc.py as usual. Each task sees the text cut to its own
+`max_input`, as in a single call: for a long text, tasks whose limits
+differ go out in separate requests. Parsed sections are cached under their own
+key (the combined request's model and settings, see section_cache_key()),
+so a single call never gets an answer written for a combined request;
+combined requests do reuse cached single-call answers.
+
+Usage:
+    from multitask import run_multi_task
+
+    results, errors = run_multi_task("Your parcel is held, pay $2 now: bit.ly/x")
+    for task_id, answer in results.items():
+        print(task_id, answer)
+"""
+
+import json
+import threading
+
+from cache import cache_key, get_cache
+from gemini_client import DEFAULT_MODEL, generate_content
+from longdoc import needs_chunking
+from microbatch import parse_json_reply
+from preprocess import HTML_TASKS, SIGNATURE_TASKS, prepare_text, truncate
+from resilience import is_quota_error
+from tasks import get_task, run_task
+
+# Tasks run together by "Analyze everything" unless the caller picks others
+DEFAULT_TASKS = ("sentiment", "emotion", "intent", "ner", "keywords", "spam")
+
+# Settings of the combined request
+MULTI_CONFIG = {"response_mime_type": "application/json"}
+
+MULTI_PROMPT = (
+    "Analyze the text below in {count} separate ways.\n"
+    "Reply with ONLY a JSON object with exactly these keys; each value is a short markdown answer "
+    "to that key's instruction:\n{instructions}\n"
+    "Text: {text}"
+)
+
+# Counters shared by every multi-task request in the process
+stats = {"requests": 0, "tasks": 0, "local": 0, "cache_hits": 0, "fallback_tasks": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(**amounts):
+    with _stats_lock:
+        for name, amount in amounts.items():
+            stats[name] += amount
+
+
+def _split_reply(text, task_ids):
+    # Returns {task_id: answer} for every section that parsed (possibly empty)
+    try:
+        sections = parse_json_reply(text)
+    except ValueError:
+        return {}
+    if not isinstance(sections, dict):
+        return {}
+    answers = {}
+    for task_id in task_ids:
+        answer = sections.get(task_id)
+        if isinstance(answer, (dict, list)):
+            answer = json.dumps(answer, ensure_ascii=False)
+        if isinstance(answer, str) and answer.strip():
+            answers[task_id] = answer.strip()
+    return answers
+
+
+def section_cache_key(task, text, model=DEFAULT_MODEL):
+    """Cache key for one task's section of a combined request (never read by single calls)."""
+    return cache_key(model, dict(MULTI_CONFIG, multitask=True), task.id, [text])
+
+
+def _cached(cache, task, text, model):
+    # A single-call answer is as good as a section of a combined request
+    if cache is None:
+        return None
+    answer = cache.get(cache_key(task.model, task.generation_config, task.id, [text]))
+    return answer if answer is not None else cache.get(section_cache_key(task, text, model))
+
+
+def run_multi_task(text, task_ids=DEFAULT_TASKS, model=DEFAULT_MODEL):
+    """
+    Run several tasks on one text with as few requests as possible.
+
+    Args:
+        text (str): Input text shared by every task
+        task_ids (iterable): Ids of single-input tasks, in display order
+        model (str): Gemini model for the combined request
+
+    Returns:
+        tuple: (dict task id -> answer, dict task id -> error message),
+            both in `task_ids` order; a task appears in exactly one of them
+
+    Raises:
+        KeyError: For an unknown task id
+        ValueError: For a task that needs more than one input
+        Exception: If the combined request fails, or a single call fails
+            with an open circuit breaker or quota error (see
+            resilience.is_quota_error), so jobs pause instead of failing
+    """
+    tasks = [get_task(task_id) for task_id in dict.fromkeys(task_ids)]
+    for task in tasks:
+        if task.arity != 1:
+            raise ValueError(f"Task '{task.id}' needs {task.arity} inputs and cannot be combined")
+    # Cleaned once per HTML / signature rule; each task then sees the text cut to
+    # its own limit, as in a single call
+    cleaned = {}
+    texts = {}
+    for task in tasks:
+        rule = (task.id in HTML_TASKS, task.id in SIGNATURE_TASKS)
+        if rule not in cleaned:
+            cleaned[rule] = prepare_text(text, None, task.id)
+        texts[task.id] = truncate(cleaned[rule], task.max_input)
+
+    cache = get_cache()
+    answers = {}
+    groups = {}    # task text -> tasks for one combined request
+    separate = []  # tasks that get their own call
+    local = cached = 0
+    for task in tasks:
+        task_text = texts[task.id]
+        answer = task.local_answer(task_text)
+        if answer is not None:
+            answers[task.id] = answer
+            local += 1
+            continue
+        answer = _cached(cache, task, task_text, model)
+        if answer is not None:
+            answers[task.id] = answer
+            cached += 1
+        elif needs_chunking(task, [task_text]):
+            separate.append(task)
+        else:
+            groups.setdefault(task_text, []).append(task)
+    _count(tasks=len(tasks), local=local, cache_hits=cached)
+
+    # Tasks with the same limit (or short texts: all of them) share a request
+    for task_text, pending in groups.items():
+        if len(pending) < 2:
+            separate += pending
+            continue
+        instructions = "\n".join(f'- "{task.id}": {task.instruction}' for task in pending)
+        prompt = MULTI_PROMPT.format(count=len(pending), instructions=instructions, text=task_text)
+        _count(requests=1)
+        # Upstream errors propagate (an open breaker or quota must stop the
+        # caller); only a reply that does not parse falls back
+        reply = generate_content(prompt, model, MULTI_CONFIG, task_id="multitask")
+        parsed = _split_reply(reply.text, [task.id for task in pending])
+        for task in pending:
+            if task.id in parsed:
+                answers[task.id] = parsed[task.id]
+                if cache:
+                    cache.set(section_cache_key(task, task_text, model), parsed[task.id])
+            else:
+                separate.append(task)
+        _count(fallback_tasks=len(pending) - len(parsed))
+
+    # Unparsed sections (or a single remaining task): one normal call each
+    errors = {}
+    _count(requests=len(separate))
+    for task in separate:
+        try:
+            answers[task.id] = run_task(task.id, text)
+        except Exception as e:
+            if is_quota_error(e):
+                raise
+            errors[task.id] = str(e)
+
+    order = [task.id for task in tasks]
+    return ({task_id: answers[task_id] for task_id in order if task_id in answers},
+            {task_id: errors[task_id] for task_id in order if task_id in errors})
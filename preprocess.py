@@ -0,0 +1,369 @@
+"""
+AI NLP Toolkit - Input Preprocessing
+====================================
+Description: Normalizes, trims and deduplicates input texts before they
+            are put into a prompt, so Gemini is not paid for noise.
+
+Raw text used to go straight into the prompt templates. Pasted e-mails,
+scraped pages and exported tickets carry a lot that costs input tokens
+and changes no answer. Every task call now goes through prepare(), which:
+
+1. applies Unicode NFC and drops zero-width characters,
+2. strips HTML tags and entities for classifiers, summaries and keywords
+   (HTML_TASKS), e-mail signatures (RFC 3676 "-- " blocks, "Sent from my
+   iPhone") for message tasks (SIGNATURE_TASKS) and, if enabled, quoted
+   reply lines,
+3. collapses runs of spaces and blank lines (paragraph breaks are kept,
+   longdoc.py splits on them), and
+4. truncates inputs longer than the task's `max_input` tokens (see
+   tasks.py), keeping the beginning and the end at sentence boundaries.
+   Tasks whose long inputs are chunked (longdoc.py), rewritten or
+   generated from are never truncated.
+
+Batch runs (batch.py, jobs.py, the API's batch endpoint and
+micro-batches) also send identical inputs (after normalization) once and
+fan the single result back out to every copy.
+
+Counters (inputs changed, truncated, duplicates, estimated tokens before
+and after) are kept per process, reported as "tokens saved" at the end of
+each batch run, and exported under "preprocess" in the metrics snapshot.
+
+Settings come from the environment:
+    NLP_PREPROCESS   "0" sends inputs exactly as given (no cleanup, no
+                     truncation, no deduplication)
+    NLP_STRIP        what to strip besides whitespace, comma-separated:
+                     html, signatures, quotes (default html,signatures;
+                     "none" for nothing)
+    NLP_DEDUP_WINDOW finished results remembered per batch run for
+                     duplicates (default 10000)
+
+Usage:
+    from preprocess import prepare, saved_line, snapshot
+
+    inputs = prepare(task, ["<p>Great   product!</p>\\n-- \\nJohn"])   # ("Great product!",)
+
+    before = snapshot()
+    ...                                                               # run a batch
+    print(saved_line(before))   # input tokens saved: 1,204 (18.2%), 37 duplicates, 3 truncated
+"""
+
+import os
+import re
+import threading
+import unicodedata
+
+from cache import LRUCache, normalize_text
+from gemini_client import estimate_tokens
+
+DEFAULT_STRIP = "html,signatures"
+DEFAULT_DEDUP_WINDOW = 10000
+TRUNCATION_MARKER = "\n[...]\n"
+# Signature blocks longer than this many lines are probably not signatures
+MAX_SIGNATURE_LINES = 10
+# Tasks that read messages whose signature says nothing about the answer;
+# every other task (NER, QA, summaries, ...) keeps the signature
+SIGNATURE_TASKS = frozenset({"spam", "intent", "sentiment", "emotion"})
+# Tasks whose answer does not depend on markup; QA, grammar, rewriting,
+# translation and generation see tags and entities exactly as given
+HTML_TASKS = frozenset({"sentiment", "language_detection", "topic", "classification", "emotion", "intent",
+                        "hate_speech", "spam", "fake_news", "opinion", "summarization", "keywords"})
+
+# Counters shared by every call in the process
+stats = {"inputs": 0, "changed": 0, "truncated": 0, "duplicates": 0,
+         "tokens_before": 0, "tokens_after": 0, "duplicate_tokens": 0}
+_stats_lock = threading.Lock()
+
+_ZERO_WIDTH = re.compile("[\u200b\u200c\u200d\u2060\ufeff]")
+_HTML_HIDDEN = re.compile(r"<(script|style)\b.*?</\1\s*>|<!--.*?-->", re.S | re.I)
+_HTML_BREAK = re.compile(r"<br\s*/?>|</(?:p|div|li|tr|h[1-6]|blockquote)\s*>", re.I)
+# Only real HTML tag names, so "if a <b and c> d" or "x <y z>" in plain text survive
+_HTML_TAG_NAMES = (
+    "a|abbr|address|article|aside|b|blockquote|body|br|button|caption|center|cite|code|col|colgroup|dd|del|"
+    "details|dfn|div|dl|dt|em|figcaption|figure|font|footer|form|h[1-6]|head|header|hr|html|i|img|input|ins|"
+    "kbd|label|li|link|main|mark|meta|nav|ol|option|p|pre|q|s|samp|section|select|small|span|strike|strong|"
+    "sub|summary|sup|table|tbody|td|textarea|tfoot|th|thead|title|tr|tt|u|ul|var|wbr"
+)
+_HTML_TAG = re.compile(rf"</?(?:{_HTML_TAG_NAMES})(?:\s[^<>]*)?/?>", re.I)
+# Evidence that a text is markup at all: a closing or void tag, a comment or a doctype
+_HTML_EVIDENCE = re.compile(rf"</(?:{_HTML_TAG_NAMES})\s*>|<(?:br|hr|img|meta|link|input|wbr)\b[^<>]*>|<!--|<!doctype",
+                            re.I)
+_HTML_ENTITY = re.compile(r"&(?:#\d+|#x[0-9a-fA-F]+|[A-Za-z]+);")
+# RFC 3676: dash, dash, space on a line of its own ("--" alone is often a separator)
+_SIGNATURE_DELIMITER = re.compile(r"^-- $", re.M)
+_MOBILE_FOOTER = re.compile(
+    r"^[ \t]*(?:Sent from my [\w ]+|Sent from (?:Mail|Outlook|Yahoo Mail) for [\w ]+|Get Outlook for [\w ]+)[ \t]*$",
+    re.M | re.I)
+_QUOTED = re.compile(r"^[ \t]*>.*$\n?|^On .{5,200} wrote:[ \t]*$\n?", re.M)
+_SPACES = re.compile(r"[^\S\n]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_SENTENCE_END = re.compile(r"[.!?।]\s")
+
+
+def _count(**amounts):
+    with _stats_lock:
+        for name, amount in amounts.items():
+            stats[name] += amount
+
+
+def enabled():
+    return os.getenv("NLP_PREPROCESS", "1") != "0"
+
+
+def _strip_options(task_id=None):
+    value = os.getenv("NLP_STRIP", DEFAULT_STRIP).lower()
+    options = set() if value == "none" else {option.strip() for option in value.split(",")}
+    if task_id not in SIGNATURE_TASKS:
+        options.discard("signatures")
+    if task_id not in HTML_TASKS:
+        options.discard("html")
+    return options
+
+
+# ============================
+# CLEANUP
+# ============================
+
+def strip_html(text):
+    """
+    Remove tags, scripts and comments and decode entities; block tags
+    become line breaks. Tags are only touched in text that looks like
+    HTML (a closing or void tag, a comment or a doctype), and only real
+    tag names are removed, so comparisons such as "a <b and c> d" stay.
+    """
+    if "<" in text and _HTML_EVIDENCE.search(text):
+        text = _HTML_HIDDEN.sub(" ", text)
+        text = _HTML_BREAK.sub("\n", text)
+        text = _HTML_TAG.sub("", text)
+    if "&" in text and _HTML_ENTITY.search(text):
+        # Imported on first use: its entity table costs start-up time
+        import html
+
+        text = html.unescape(text)
+    return text
+
+
+def strip_signature(text):
+    """Drop a trailing "-- " signature block and mobile mail footers."""
+    delimiters = list(_SIGNATURE_DELIMITER.finditer(text))
+    if delimiters:
+        start = delimiters[-1].start()
+        if text.count("\n", start) <= MAX_SIGNATURE_LINES:
+            text = text[:start]
+    return _MOBILE_FOOTER.sub("", text)
+
+
+def clean_text(text, strip=None):
+    """
+    Normalize one input text.
+
+    Args:
+        text (str): Raw input
+        strip (set): Cleanups besides whitespace: "html", "signatures",
+            "quotes" (default: from NLP_STRIP)
+
+    Returns:
+        str: Cleaned text (the original text if cleaning would leave nothing)
+    """
+    strip = _strip_options() if strip is None else strip
+    cleaned = _ZERO_WIDTH.sub("", unicodedata.normalize("NFC", text)).replace("\r\n", "\n").replace("\r", "\n")
+    if "html" in strip:
+        cleaned = strip_html(cleaned)
+    if "signatures" in strip:
+        cleaned = strip_signature(cleaned)
+    if "quotes" in strip:
+        cleaned = _QUOTED.sub("", cleaned)
+    cleaned = "\n".join(line.strip() for line in _SPACES.sub(" ", cleaned).split("\n"))
+    cleaned = _BLANK_LINES.sub("\n\n", cleaned).strip()
+    return cleaned or text.strip() or text
+
+
+def truncate(text, max_tokens):
+    """
+    Shorten a text to about `max_tokens` estimated tokens.
+
+    Keeps the first two thirds of the budget and the last third (openings
+    and conclusions carry most of a text's label), cut at sentence
+    boundaries where one is near, and marks the gap with "[...]".
+
+    Returns:
+        str: The text, shortened if it was over the limit
+    """
+    if max_tokens is None or estimate_tokens(text) <= max_tokens:
+        return text
+    # estimate_tokens() counts about 4 characters per token
+    budget = max(0, max_tokens * 4 - len(TRUNCATION_MARKER))
+    head_size = budget * 2 // 3
+    head = text[:head_size]
+    tail = text[len(text) - (budget - head_size):] if budget > head_size else ""
+
+    ends = list(_SENTENCE_END.finditer(head))
+    if ends and ends[-1].end() >= head_size * 0.7:
+        head = head[:ends[-1].end()]
+    elif " " in head[int(head_size * 0.7):]:
+        head = head[:head.rindex(" ")]
+    start = _SENTENCE_END.search(tail)
+    if start and start.end() <= len(tail) * 0.3:
+        tail = tail[start.end():]
+    elif " " in tail[:int(len(tail) * 0.3) + 1]:
+        tail = tail[tail.index(" ") + 1:]
+    return head.rstrip() + TRUNCATION_MARKER + tail.lstrip()
+
+
+def prepare(task, inputs):
+    """
+    Clean and, if needed, truncate a task's inputs before prompting.
+
+    Prepared inputs are also what the response cache is keyed on, so
+    copies that differ only in markup or spacing share one answer.
+
+    Args:
+        task (Task): Task being run
+        inputs (list): Raw input texts
+
+    Returns:
+        tuple: Prepared input texts
+    """
+    return tuple(prepare_text(text, task.max_input, task.id) for text in inputs)
+
+
+def prepare_text(text, max_tokens=None, task_id=None):
+    """
+    Clean one text for a task (HTML is only stripped for HTML_TASKS,
+    signatures only for SIGNATURE_TASKS) and truncate it to `max_tokens` (None: no limit),
+    counting what was saved. Returns the text unchanged when
+    preprocessing is off.
+    """
+    if not enabled() or not isinstance(text, str):
+        return text
+    cleaned = clean_text(text, _strip_options(task_id))
+    shortened = truncate(cleaned, max_tokens)
+    _count(inputs=1, changed=shortened != text, truncated=shortened is not cleaned,
+           tokens_before=estimate_tokens(text), tokens_after=estimate_tokens(shortened))
+    return shortened
+
+
+# ============================
+# DEDUPLICATION
+# ============================
+
+def dedupe_key(inputs):
+    """Inputs that only differ in spacing or Unicode form share a key."""
+    return "\x1f".join(normalize_text(text) if isinstance(text, str) else repr(text) for text in inputs)
+
+
+def dedupe(items):
+    """
+    Collapse identical inputs in a batch.
+
+    Args:
+        items (list): Input tuples/lists, one per batch item
+
+    Returns:
+        tuple: (list of unique inputs, list giving each item's position in it)
+    """
+    if not enabled():
+        return list(items), list(range(len(items)))
+    unique, positions, seen = [], [], {}
+    duplicates = duplicate_tokens = 0
+    for inputs in items:
+        key = dedupe_key(inputs)
+        if key in seen:
+            duplicates += 1
+            duplicate_tokens += sum(estimate_tokens(text) for text in inputs)
+        else:
+            seen[key] = len(unique)
+            unique.append(inputs)
+        positions.append(seen[key])
+    _count(duplicates=duplicates, duplicate_tokens=duplicate_tokens)
+    return unique, positions
+
+
+class Deduper:
+    """
+    Fans one result out to identical inputs within a streamed batch run.
+
+    Finished results are remembered in an LRU of `window` entries, so a
+    run over millions of records stays in bounded memory. In async runs
+    a duplicate of an input still in flight waits for the same call.
+    Errors are not remembered: a failed input is tried again when it
+    repeats.
+    """
+
+    def __init__(self, window=None):
+        self.__results = LRUCache(window or int(os.getenv("NLP_DEDUP_WINDOW", DEFAULT_DEDUP_WINDOW)))
+        self.__inflight = {}
+        self.enabled = enabled()
+
+    def __duplicate(self, inputs):
+        _count(duplicates=1, duplicate_tokens=sum(estimate_tokens(text) for text in inputs))
+
+    def run(self, inputs, compute):
+        """Return the result for these inputs, calling `compute()` only for the first copy."""
+        if not self.enabled:
+            return compute()
+        key = dedupe_key(inputs)
+        result = self.__results.get(key)
+        if result is not None:
+            self.__duplicate(inputs)
+            return result
+        result = compute()
+        self.__results.set(key, result)
+        return result
+
+    async def arun(self, inputs, compute):
+        """Async version of run(); `compute` returns an awaitable."""
+        # Imported here so sync-only users (the CLI) never load asyncio
+        import asyncio
+
+        if not self.enabled:
+            return await compute()
+        key = dedupe_key(inputs)
+        result = self.__results.get(key)
+        if result is not None:
+            self.__duplicate(inputs)
+            return result
+        future = self.__inflight.get(key)
+        if future is not None:
+            self.__duplicate(inputs)
+            return await asyncio.shield(future)
+        future = self.__inflight[key] = asyncio.ensure_future(compute())
+        try:
+            result = await future
+        finally:
+            self.__inflight.pop(key, None)
+        self.__results.set(key, result)
+        return result
+
+
+# ============================
+# REPORTING
+# ============================
+
+def snapshot():
+    """Copy of the counters, to pass to tokens_saved() at the end of a run."""
+    with _stats_lock:
+        return dict(stats)
+
+
+def tokens_saved(before=None):
+    """
+    Estimated input tokens not sent, since `before` (a snapshot()) or
+    since the process started: removed by cleanup and truncation, plus
+    every duplicate that was answered from its first copy.
+
+    Returns:
+        dict: Counter deltas plus "tokens_saved" and "saved_rate"
+    """
+    now = snapshot()
+    delta = {name: value - (before or {}).get(name, 0) for name, value in now.items()}
+    delta["tokens_saved"] = delta["tokens_before"] - delta["tokens_after"] + delta["duplicate_tokens"]
+    raw = delta["tokens_before"] + delta["duplicate_tokens"]
+    delta["saved_rate"] = round(delta["tokens_saved"] / raw, 4) if raw else 0.0
+    return delta
+
+
+def saved_line(before=None):
+    """One report line, e.g. "input tokens saved: 1,204 (18.2%), 37 duplicates, 3 truncated"."""
+    saved = tokens_saved(before)
+    return (f"input tokens saved: {saved['tokens_saved']:,} ({saved['saved_rate']:.1%}), "
+            f"{saved['duplicates']:,} duplicates, {saved['truncated']:,} truncated")
@@ -0,0 +1,261 @@
+"""
+AI NLP Toolkit - Generation Profiles and Model Routing
+======================================================
+Description: Per-task generation profiles (model tier, output cap,
+            temperature, latency target) and the router that picks one
+            for each call.
+
+Every task used to run on gemini-2.5-flash with default settings, so a
+one-word Language Detection answer paid the same model, thinking and
+output allowance as open-ended Text Generation. Tasks now name a
+profile in tasks.py:
+
+    classify   short labels (sentiment, spam, ...)    fast tier, 256 tokens
+    extract    lists and tags (NER, keywords, ...)    fast tier, 1024 tokens
+    standard   free-form answers (QA, summaries)      gemini-2.5-flash
+    rewrite    text in, similar-length text out       flash, cap grows with input
+    creative   open-ended generation                  flash, temperature 0.9
+
+The router starts from the task's profile and escalates a call to the
+profile's `escalate_to` when the input is longer than `escalate_tokens`
+(a long review is sent to the stronger model even for sentiment).
+
+Thinking: gemini-2.5 models count thinking tokens against
+max_output_tokens, and google-generativeai 0.8 has no way to set a
+thinking budget. The fast tier therefore uses gemini-2.5-flash-lite,
+which does not think unless asked, and caps on gemini-2.5-flash are
+left generous enough for its thinking.
+
+Latency, tokens and estimated cost are reported per profile in the
+metrics snapshot ("profiles") next to each profile's p95 latency target,
+so caps and tiers can be tuned against the SLOs.
+
+Settings come from the environment:
+    NLP_FAST_MODEL    model for the fast tier (default gemini-2.5-flash-lite;
+                      set it to gemini-2.5-flash to turn tiering off)
+    NLP_ESCALATION    "0" disables length-based escalation
+
+Usage:
+    from profiles import route
+
+    choice = route(task, [text])
+    generate_content(prompt, choice.model, choice.generation_config, profile=choice.profile)
+"""
+
+import os
+import threading
+
+from gemini_client import DEFAULT_MODEL, estimate_tokens
+
+FAST_MODEL = os.getenv("NLP_FAST_MODEL", "gemini-2.5-flash-lite")
+
+# USD per million (input, output) tokens, list prices for text;
+# edit to match your billing. Unknown models are costed as gemini-2.5-flash.
+PRICES = {
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+# Output caps are rounded up to one of these, so scaled caps reuse a few
+# pooled clients and cache keys instead of one per input length
+_CAP_STEPS = (256, 512, 1024, 2048, 4096, 8192)
+
+
+def model_cost(model, input_tokens, output_tokens):
+    """Estimated USD cost of some tokens on a model (see PRICES)."""
+    price_in, price_out = PRICES.get(model, PRICES[DEFAULT_MODEL])
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+
+# ============================
+# PROFILE CLASS
+# ============================
+
+class Profile:
+    """
+    Generation settings shared by a group of tasks.
+
+    Attributes:
+        name (str): Profile name (e.g. "classify")
+        model (str): Gemini model
+        max_output_tokens (int): Output cap (None = model default)
+        temperature (float): Sampling temperature (None = model default)
+        slo_seconds (float): p95 latency target, reported next to the
+            measured latency
+        escalate_tokens (int): Inputs with more estimated tokens than this
+            go to `escalate_to` instead
+        escalate_to (str): Name of the stronger profile, or None
+        output_ratio (float): For rewrite-style tasks, the cap is raised to
+            this many output tokens per input token
+    """
+
+    __slots__ = ("name", "model", "max_output_tokens", "temperature", "slo_seconds",
+                 "escalate_tokens", "escalate_to", "output_ratio")
+
+    def __init__(self, name, model, max_output_tokens=None, temperature=None, slo_seconds=None,
+                 escalate_tokens=None, escalate_to=None, output_ratio=None):
+        self.name = name
+        self.model = model
+        self.max_output_tokens = max_output_tokens
+        self.temperature = temperature
+        self.slo_seconds = slo_seconds
+        self.escalate_tokens = escalate_tokens
+        self.escalate_to = escalate_to
+        self.output_ratio = output_ratio
+
+    def generation_config(self, input_tokens=0):
+        """
+        Generation settings for a call with this many input tokens.
+
+        Returns:
+            dict: Only the settings this profile sets
+        """
+        config = {}
+        cap = self.max_output_tokens
+        if cap is not None and self.output_ratio:
+            wanted = int(input_tokens * self.output_ratio)
+            cap = next((step for step in _CAP_STEPS if step >= max(cap, wanted)), _CAP_STEPS[-1])
+        if cap is not None:
+            config["max_output_tokens"] = cap
+        if self.temperature is not None:
+            config["temperature"] = self.temperature
+        return config
+
+    def __repr__(self):
+        return f"Profile({self.name!r}, {self.model!r})"
+
+
+PROFILES = {profile.name: profile for profile in (
+    Profile("classify", FAST_MODEL, max_output_tokens=256, temperature=0.0, slo_seconds=1.5,
+            escalate_tokens=500, escalate_to="standard"),
+    Profile("extract", FAST_MODEL, max_output_tokens=1024, temperature=0.2, slo_seconds=3.0,
+            escalate_tokens=1500, escalate_to="standard"),
+    Profile("standard", DEFAULT_MODEL, max_output_tokens=4096, slo_seconds=6.0),
+    Profile("rewrite", DEFAULT_MODEL, max_output_tokens=2048, temperature=0.3, slo_seconds=8.0,
+            output_ratio=2.0),
+    Profile("creative", DEFAULT_MODEL, max_output_tokens=4096, temperature=0.9, slo_seconds=10.0),
+)}
+
+
+def get_profile(name):
+    """
+    Look a profile up by name.
+
+    Raises:
+        KeyError: If no profile has this name
+    """
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise KeyError(f"Unknown profile '{name}'. Available profiles: {', '.join(PROFILES)}") from None
+
+
+# ============================
+# ROUTER
+# ============================
+
+# Calls routed per profile name: {"routed": n, "escalated": n}
+routing_stats = {}
+_routing_lock = threading.Lock()
+
+
+class Route:
+    """Model, generation config and profile name chosen for one call."""
+
+    __slots__ = ("profile", "model", "generation_config", "escalated")
+
+    def __init__(self, profile, model, generation_config, escalated=False):
+        self.profile = profile
+        self.model = model
+        self.generation_config = generation_config
+        self.escalated = escalated
+
+    def __repr__(self):
+        return f"Route({self.profile!r}, {self.model!r}, escalated={self.escalated})"
+
+
+def route(task, inputs):
+    """
+    Pick the model and generation settings for one task call.
+
+    Short inputs use the task's own model and config (task.model /
+    task.generation_config). Inputs over the profile's escalation
+    threshold move to the stronger profile; rewrite-style profiles raise
+    the output cap for long inputs.
+
+    Args:
+        task (Task): Task being run
+        inputs (list): Input texts
+
+    Returns:
+        Route: The chosen model, config and profile name
+    """
+    profile = PROFILES[task.profile]
+    tokens = sum(estimate_tokens(text) for text in inputs)
+    escalated = (profile.escalate_to is not None and tokens > profile.escalate_tokens
+                 and os.getenv("NLP_ESCALATION", "1") != "0")
+    if escalated:
+        profile = PROFILES[profile.escalate_to]
+        choice = Route(profile.name, profile.model, task.settings(profile, tokens), escalated=True)
+    elif profile.output_ratio:
+        choice = Route(profile.name, task.model, task.settings(profile, tokens))
+    else:
+        choice = Route(profile.name, task.model, task.generation_config)
+    with _routing_lock:
+        counts = routing_stats.setdefault(task.profile, {"routed": 0, "escalated": 0})
+        counts["routed"] += 1
+        counts["escalated"] += escalated
+    return choice
+
+
+def profile_summary(observed):
+    """
+    Combine per-profile metrics with each profile's latency target and cost.
+
+    Args:
+        observed (dict): {profile: {"latency": Histogram dict,
+            "tokens": {model: [input, output]}}} from metrics.py
+
+    Returns:
+        dict: {profile: {"model", "calls", "p50", "p95", "slo_seconds",
+            "within_slo", "input_tokens", "output_tokens", "cost_usd",
+            "routed", "escalated"}}
+    """
+    with _routing_lock:
+        routing = {name: dict(counts) for name, counts in routing_stats.items()}
+    summary = {}
+    for name in list(observed) + [name for name in routing if name not in observed]:
+        profile = PROFILES.get(name)
+        data = observed.get(name, {"latency": {"count": 0, "p50": None, "p95": None}, "tokens": {}})
+        latency = data["latency"]
+        slo = profile.slo_seconds if profile else None
+        summary[name] = {
+            "model": profile.model if profile else None,
+            "calls": latency["count"],
+            "p50": latency["p50"],
+            "p95": latency["p95"],
+            "slo_seconds": slo,
+            "within_slo": None if slo is None or latency["p95"] is None else latency["p95"] <= slo,
+            "input_tokens": sum(tokens[0] for tokens in data["tokens"].values()),
+            "output_tokens": sum(tokens[1] for tokens in data["tokens"].values()),
+            "cost_usd": round(sum(model_cost(model, *tokens) for model, tokens in data["tokens"].items()), 6),
+        }
+        # Routing counts are kept under the task's own profile, before escalation
+        summary[name].update(routing.get(name, {}))
+    return summary
+
+
+def scale_cap(generation_config, factor):
+    """
+    Copy of a generation config with its output cap multiplied (e.g. for
+    a micro-batch of `factor` answers), rounded up to a fixed step.
+
+    Returns:
+        dict: New config (unchanged if it has no cap)
+    """
+    config = dict(generation_config or {})
+    cap = config.get("max_output_tokens")
+    if cap is not None:
+        config["max_output_tokens"] = next((step for step in _CAP_STEPS if step >= cap * factor), _CAP_STEPS[-1])
+    return config
@@ -0,0 +1,392 @@
+"""
+AI NLP Toolkit - Resilience Layer
+=================================
+Description: Retry, backoff, circuit breaker, deadlines and hedged
+            requests around every Gemini call.
+
+- Retries: retryable errors (429, 5xx, timeouts, connection errors) are
+  retried with full-jitter exponential backoff.
+- Circuit breaker: after several failures in a row the breaker opens and
+  calls fail fast with CircuitOpenError until a cool-down has passed;
+  then one trial call is let through.
+- Deadlines: every call has an overall deadline. Each attempt gets the
+  remaining time as its request timeout, and no retry starts after the
+  deadline.
+- Hedging (optional): if a call has not answered after the recent p95
+  latency, a duplicate is sent and whichever answers first wins.
+
+Every decision is counted in `counters`.
+
+Settings come from the environment:
+    NLP_RETRIES              max attempts per call (default 4)
+    NLP_DEADLINE             overall seconds per call (default 60)
+    NLP_BREAKER_THRESHOLD    consecutive failures that open the breaker (default 5)
+    NLP_BREAKER_RESET        seconds before a trial call (default 30)
+    NLP_HEDGE                "1" enables hedged requests (default off)
+
+Usage:
+    from resilience import policy
+
+    response = policy.call(lambda timeout: model.generate_content(prompt, request_options={"timeout": timeout}))
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# HTTP status codes worth retrying
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+# Hedging only starts once this many latencies have been seen
+HEDGE_MIN_SAMPLES = 20
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+class DeadlineError(TimeoutError):
+    """Raised when a call runs out of time, including retries."""
+
+
+def is_retryable(error):
+    """
+    Decide whether an error is transient and worth retrying.
+
+    google.api_core exceptions carry the HTTP status in `code`; plain
+    timeouts and connection errors are retryable as well.
+    """
+    if isinstance(error, (CircuitOpenError, DeadlineError)):
+        return False
+    # asyncio is imported lazily (it is slow to import and the CLI never
+    # needs it); if nothing imported it, no asyncio.TimeoutError can exist
+    asyncio = sys.modules.get("asyncio")
+    if isinstance(error, (TimeoutError, ConnectionError) + ((asyncio.TimeoutError,) if asyncio else ())):
+        return True
+    return getattr(error, "code", None) in RETRYABLE_CODES
+
+
+def is_quota_error(error):
+    """
+    True for errors that will not go away by retrying soon: an open
+    circuit breaker or HTTP 429 (quota / rate limit) after the retries
+    were used up.
+    """
+    return isinstance(error, CircuitOpenError) or getattr(error, "code", None) == 429 \
+        or type(error).__name__ == "ResourceExhausted"
+
+
+# ============================
+# COUNTERS
+# ============================
+
+counters = {
+    "calls": 0,
+    "attempts": 0,
+    "successes": 0,
+    "failures": 0,
+    "retries": 0,
+    "retries_exhausted": 0,
+    "non_retryable": 0,
+    "deadline_exceeded": 0,
+    "breaker_opened": 0,
+    "breaker_rejected": 0,
+    "breaker_trials": 0,
+    "hedges_fired": 0,
+    "hedges_won": 0,
+}
+_counters_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _counters_lock:
+        counters[name] += amount
+
+
+# ============================
+# CIRCUIT BREAKER CLASS
+# ============================
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    States: "closed" (normal), "open" (fail fast) and "half_open" (one
+    trial call allowed after `reset_timeout` seconds).
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.__failures = 0
+        self.__opened_at = 0.0
+        self.__lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may go upstream now."""
+        with self.__lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.__opened_at >= self.reset_timeout:
+                # Let exactly one trial call through
+                self.state = "half_open"
+                _count("breaker_trials")
+                return True
+            return False
+
+    def record_success(self):
+        with self.__lock:
+            self.__failures = 0
+            self.state = "closed"
+
+    def record_failure(self):
+        with self.__lock:
+            self.__failures += 1
+            if self.state == "half_open" or self.__failures >= self.failure_threshold:
+                if self.state != "open":
+                    _count("breaker_opened")
+                self.state = "open"
+                self.__opened_at = time.monotonic()
+
+
+# ============================
+# LATENCY TRACKER
+# ============================
+
+class LatencyTracker:
+    """Keeps recent successful call latencies to derive the hedging delay."""
+
+    def __init__(self, size=500):
+        self.__samples = deque(maxlen=size)
+        self.__lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.__lock:
+            self.__samples.append(seconds)
+
+    def percentile(self, q):
+        """Return the q-th percentile (0-100) of recent latencies, or None if too few."""
+        with self.__lock:
+            if len(self.__samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.__samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+# ============================
+# RESILIENCE POLICY CLASS
+# ============================
+
+class ResiliencePolicy:
+    """
+    Retry + breaker + deadline + hedging wrapper for upstream calls.
+
+    The wrapped function receives the remaining time in seconds (to pass
+    on as a request timeout) and returns the upstream result.
+    """
+
+    def __init__(self, max_attempts=None, deadline=None, base_delay=0.5, max_delay=20.0,
+                 breaker_threshold=None, breaker_reset=None, hedge=None):
+        self.max_attempts = max_attempts or int(os.getenv("NLP_RETRIES", 4))
+        self.deadline = deadline or float(os.getenv("NLP_DEADLINE", 60))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge if hedge is not None else os.getenv("NLP_HEDGE") == "1"
+        self.__breaker_threshold = breaker_threshold or int(os.getenv("NLP_BREAKER_THRESHOLD", 5))
+        self.__breaker_reset = breaker_reset or float(os.getenv("NLP_BREAKER_RESET", 30))
+        self.__breakers = {}
+        self.__lock = threading.Lock()
+        self.latency = LatencyTracker()
+        self.__hedge_pool = None
+
+    def breaker(self, name="default"):
+        """Return the circuit breaker for one upstream (e.g. a model name)."""
+        with self.__lock:
+            breaker = self.__breakers.get(name)
+            if breaker is None:
+                breaker = self.__breakers[name] = CircuitBreaker(self.__breaker_threshold, self.__breaker_reset)
+            return breaker
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff delay before retry number `attempt` (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def __check(self, breaker, started):
+        remaining = self.deadline - (time.monotonic() - started)
+        if remaining <= 0:
+            _count("deadline_exceeded")
+            raise DeadlineError(f"Gemini call exceeded its {self.deadline:.0f}s deadline")
+        if not breaker.allow():
+            _count("breaker_rejected")
+            raise CircuitOpenError("Gemini is unavailable (circuit open); try again shortly")
+        return remaining
+
+    def __after_failure(self, breaker, error, attempt, started):
+        # Returns the delay before the next attempt, or re-raises
+        if not is_retryable(error):
+            # A client error (bad request, blocked prompt) means upstream is up
+            breaker.record_success()
+            _count("non_retryable")
+            _count("failures")
+            raise error
+        breaker.record_failure()
+        if attempt >= self.max_attempts:
+            _count("retries_exhausted")
+            _count("failures")
+            raise error
+        delay = self.backoff(attempt)
+        if time.monotonic() - started + delay >= self.deadline:
+            _count("deadline_exceeded")
+            _count("failures")
+            raise DeadlineError(f"Gemini call exceeded its {self.deadline:.0f}s deadline") from error
+        _count("retries")
+        return delay
+
+    def call(self, fn, name="default", hedge=None):
+        """
+        Run `fn(timeout)` with retries, breaker, deadline and optional hedging.
+
+        Args:
+            fn: Callable taking the remaining seconds and returning the result
+            name (str): Upstream name selecting the circuit breaker
+            hedge (bool): Override the policy's hedging setting for this call
+
+        Returns:
+            Whatever `fn` returns
+        """
+        _count("calls")
+        breaker = self.breaker(name)
+        hedge = self.hedge if hedge is None else hedge
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = self.__check(breaker, started)
+            _count("attempts")
+            try:
+                t0 = time.monotonic()
+                result = self.__hedged(fn, remaining) if hedge else fn(remaining)
+                self.latency.add(time.monotonic() - t0)
+                breaker.record_success()
+                _count("successes")
+                return result
+            except Exception as e:
+                time.sleep(self.__after_failure(breaker, e, attempt, started))
+
+    def __hedged(self, fn, remaining):
+        delay = self.latency.percentile(95)
+        if delay is None or delay >= remaining:
+            return fn(remaining)
+        with self.__lock:
+            if self.__hedge_pool is None:
+                self.__hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+        started = time.monotonic()
+        primary = self.__hedge_pool.submit(fn, remaining)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        _count("hedges_fired")
+        backup = self.__hedge_pool.submit(fn, remaining - (time.monotonic() - started))
+        # Both waits end at the call's deadline, not whenever the slower request gives up
+        done, pending = wait([primary, backup], timeout=remaining - (time.monotonic() - started),
+                             return_when=FIRST_COMPLETED)
+        if not done:
+            _abandon(primary, backup)
+            raise TimeoutError(f"Hedged call got no answer within {remaining:.1f}s")
+        winner = done.pop()
+        if winner.exception() is not None and pending:
+            # First finisher failed: wait for the other request instead
+            winner = pending.pop()
+            wait([winner], timeout=max(0.0, remaining - (time.monotonic() - started)))
+            if not winner.done():
+                _abandon(winner)
+                raise TimeoutError(f"Hedged call got no answer within {remaining:.1f}s")
+        _abandon(*(future for future in (primary, backup) if future is not winner))
+        if winner is backup:
+            _count("hedges_won")
+        return winner.result()
+
+    async def acall(self, fn, name="default", hedge=None):
+        """
+        Async version of call(): `fn(timeout)` returns an awaitable.
+        """
+        import asyncio
+
+        _count("calls")
+        breaker = self.breaker(name)
+        hedge = self.hedge if hedge is None else hedge
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = self.__check(breaker, started)
+            _count("attempts")
+            try:
+                t0 = time.monotonic()
+                if hedge:
+                    result = await self.__ahedged(fn, remaining)
+                else:
+                    result = await asyncio.wait_for(fn(remaining), remaining)
+                self.latency.add(time.monotonic() - t0)
+                breaker.record_success()
+                _count("successes")
+                return result
+            except Exception as e:
+                await asyncio.sleep(self.__after_failure(breaker, e, attempt, started))
+
+    async def __ahedged(self, fn, remaining):
+        import asyncio
+
+        delay = self.latency.percentile(95)
+        primary = asyncio.ensure_future(fn(remaining))
+        if delay is None or delay >= remaining:
+            return await asyncio.wait_for(primary, remaining)
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        _count("hedges_fired")
+        backup = asyncio.ensure_future(fn(remaining - delay))
+        done, pending = await asyncio.wait([primary, backup], timeout=remaining - delay,
+                                           return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            for future in pending:
+                future.cancel()
+            raise asyncio.TimeoutError()
+        winner = done.pop()
+        if winner.exception() is not None and pending:
+            # First finisher failed: wait for the other request instead
+            winner = pending.pop()
+            await asyncio.wait([winner], timeout=remaining - delay)
+            if not winner.done():
+                winner.cancel()
+                raise asyncio.TimeoutError()
+        for future in (primary, backup):
+            if future is not winner:
+                future.cancel()
+        if winner is backup:
+            _count("hedges_won")
+        return winner.result()
+
+
+def _abandon(*futures):
+    # A hedge's losing request: cancelled if it has not started yet, otherwise
+    # left to end on its own timeout with its result or error dropped
+    for future in futures:
+        if not future.cancel():
+            future.add_done_callback(_discard)
+
+
+def _discard(future):
+    if not future.cancelled():
+        future.exception()
+
+
+# Process-wide policy (settings from the environment)
+policy = ResiliencePolicy()
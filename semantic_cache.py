@@ -0,0 +1,451 @@
+"""
+AI NLP Toolkit - Semantic Cache
+===============================
+Description: Serves cached answers for near-duplicate inputs (same
+            complaint with different punctuation, the same headline from
+            another source) by comparing input embeddings.
+
+The exact-match response cache (cache.py) only helps when the normalized
+text is identical. In front of each Gemini call, the semantic cache
+embeds the input and looks for the most similar earlier input of the same
+task. If the cosine similarity is at least the task's threshold
+(`semantic` in tasks.py) the earlier answer is served; otherwise the
+fresh answer is added to the index once it arrives. Only coarse
+classifiers (sentiment, spam, intent, emotion, hate speech, language
+detection) have a threshold: two texts that embed alike usually share
+their label, but not their entities, keywords, summary or answer, so
+every other task is never served this way.
+
+Each task has its own index on disk: a float32 vector matrix and a
+matrix of response-cache keys, both memory-mapped, plus a small JSON
+header. Answers themselves stay in the response cache, so an index hit
+whose answer has since expired there counts as a miss. Processes sharing
+the index directory (CLI runs, API and UI replicas on one host) take an
+advisory file lock around every read and append; where fcntl is missing
+(Windows) give each process its own NLP_SEMANTIC_DIR.
+
+Embeddings come from Gemini (text-embedding-004, reduced to 256
+dimensions) or, for offline runs and tests, from a local hashing
+embedder (word and character 3-gram features). The local embedder is
+used automatically when a fake or cassette backend is plugged in.
+
+A sample of hits can be audited: Gemini is asked anyway and the two
+answers are compared, which measures the false-hit rate (answers that
+would have differed).
+
+Settings come from the environment:
+    NLP_SEMANTIC_CACHE       "1" enables the semantic cache (default off)
+    NLP_SEMANTIC_DIR         index directory (default .nlp_semantic)
+    NLP_SEMANTIC_EMBEDDER    "gemini", "local" or "auto" (default; local
+                             when a fake/cassette backend is in use)
+    NLP_SEMANTIC_MAX         max vectors per task; the oldest are
+                             overwritten after that (default 50000)
+    NLP_SEMANTIC_AUDIT       fraction of hits double-checked with Gemini
+                             (default 0)
+
+Usage:
+    NLP_SEMANTIC_CACHE=1 python app.py
+
+    from semantic_cache import get_semantic_cache
+
+    semantic = get_semantic_cache()
+    print(semantic.stats())
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no advisory locks, so an index directory is safe for one process only
+    fcntl = None
+
+from cache import get_cache, normalize_text
+from gemini_client import embed_content, pool
+
+DEFAULT_DIR = ".nlp_semantic"
+DEFAULT_DIMENSIONS = 256
+DEFAULT_MAX_ENTRIES = 50_000
+INITIAL_CAPACITY = 1024
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+# ============================
+# EMBEDDERS
+# ============================
+
+class HashingEmbedder:
+    """
+    Local, deterministic embedding stub: hashed word and character
+    3-gram counts, log-scaled and L2-normalized.
+
+    Texts that differ only in punctuation, case or spacing get the same
+    vector; a changed word moves it only a little. Good enough to test the
+    cache offline, not a substitute for a real embedding model.
+    """
+
+    name = "local-hash"
+
+    def __init__(self, dimensions=DEFAULT_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def embed(self, texts):
+        """
+        Returns:
+            numpy.ndarray: float32 matrix, one normalized row per text
+        """
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = []
+            for word in _WORD.findall(text.lower()):
+                features.append("w:" + word)
+                padded = f"<{word}>"
+                features += ["c:" + padded[i:i + 3] for i in range(len(padded) - 2)]
+            if not features:
+                continue
+            hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32,
+                                 count=len(features))
+            # Low bits pick the slot, one high bit the sign (keeps unrelated features from adding up)
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dimensions, signs)
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        return _normalize(matrix)
+
+
+class GeminiEmbedder:
+    """Gemini text embeddings (semantic_similarity task type)."""
+
+    name = "gemini"
+
+    def __init__(self, dimensions=DEFAULT_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def embed(self, texts):
+        vectors = embed_content(texts, dimensions=self.dimensions)
+        return _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1))
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def default_embedder():
+    """The embedder selected by NLP_SEMANTIC_EMBEDDER (see module docstring)."""
+    choice = os.getenv("NLP_SEMANTIC_EMBEDDER", "auto")
+    if choice == "local" or (choice == "auto" and pool.backend is not None):
+        return HashingEmbedder()
+    return GeminiEmbedder()
+
+
+# ============================
+# VECTOR INDEX CLASS
+# ============================
+
+class VectorIndex:
+    """
+    Memory-mapped vectors and response-cache keys for one task.
+
+    Files (in `directory`):
+        <name>.vec         float32 matrix, capacity x dimensions
+        <name>.keys        uint8 matrix, capacity x 32 (SHA-256 cache keys)
+        <name>.meta.json   {"embedder", "dimensions", "capacity", "added"}
+
+    Rows are appended until `max_entries`, then the oldest row is
+    overwritten. An index built with another embedder or vector size is
+    discarded.
+
+    A threading lock guards the index within a process, and an flock on
+    <name>.lock across processes: searches take it shared, appends
+    exclusive, and both first reload the header if another process has
+    changed it.
+    """
+
+    def __init__(self, directory, name, embedder_name, dimensions, max_entries=DEFAULT_MAX_ENTRIES):
+        self.name = name
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self.__prefix = os.path.join(directory, name)
+        self.__lock = threading.Lock()
+        self.__meta = {"embedder": embedder_name, "dimensions": dimensions, "capacity": 0, "added": 0}
+        self.__meta_version = None
+        self.__vectors = None
+        self.__keys = None
+        os.makedirs(directory, exist_ok=True)
+        self.__lock_file = open(self.__prefix + ".lock", "a")
+        with self.__lock, self.__locked(shared=True):
+            self.__load()
+
+    @contextmanager
+    def __locked(self, shared):
+        # Cross-process part of the lock; call with self.__lock held
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self.__lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.__lock_file, fcntl.LOCK_UN)
+
+    def __load(self, force=False):
+        # (Re)read the header if it changed since the last look, e.g. after another process appended
+        path = self.__prefix + ".meta.json"
+        try:
+            version = _file_version(path)
+            if version == self.__meta_version and not force:
+                return
+            with open(path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return
+        if meta.get("embedder") != self.__meta["embedder"] or meta.get("dimensions") != self.dimensions:
+            return
+        self.__meta_version = version
+        capacity = self.__meta["capacity"]
+        self.__meta = meta
+        if meta["capacity"] and (meta["capacity"] != capacity or self.__vectors is None):
+            self.__open(meta["capacity"])
+
+    def __open(self, capacity):
+        # (Re)map both files at `capacity` rows, growing them if needed
+        for suffix, width, dtype in ((".vec", self.dimensions, np.float32), (".keys", 32, np.uint8)):
+            path = self.__prefix + suffix
+            size = capacity * width * np.dtype(dtype).itemsize
+            with open(path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+        self.__vectors = np.memmap(self.__prefix + ".vec", dtype=np.float32, mode="r+",
+                                   shape=(capacity, self.dimensions))
+        self.__keys = np.memmap(self.__prefix + ".keys", dtype=np.uint8, mode="r+", shape=(capacity, 32))
+        self.__meta["capacity"] = capacity
+
+    def __len__(self):
+        return min(self.__meta["added"], self.__meta["capacity"])
+
+    def search(self, vector):
+        """
+        Find the most similar stored vector.
+
+        Args:
+            vector (numpy.ndarray): Normalized query vector
+
+        Returns:
+            tuple: (cache key hex, cosine similarity), or (None, 0.0) if empty
+        """
+        with self.__lock, self.__locked(shared=True):
+            self.__load()
+            count = len(self)
+            if not count:
+                return None, 0.0
+            similarities = self.__vectors[:count] @ vector
+            row = int(np.argmax(similarities))
+            return bytes(self.__keys[row]).hex(), float(similarities[row])
+
+    def add(self, vector, key):
+        """Store one vector with the response-cache key of its answer."""
+        with self.__lock, self.__locked(shared=False):
+            self.__load(force=True)
+            added = self.__meta["added"]
+            row = added % self.max_entries
+            if row >= self.__meta["capacity"]:
+                self.__open(min(self.max_entries, max(INITIAL_CAPACITY, self.__meta["capacity"] * 2)))
+            self.__vectors[row] = vector
+            self.__keys[row] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+            self.__meta["added"] = added + 1
+            self.__vectors.flush()
+            self.__keys.flush()
+            self.__save_meta()
+
+    def __save_meta(self):
+        # Written after the rows, so a crash never points past valid data
+        path = self.__prefix + ".meta.json"
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.__meta, f)
+        os.replace(path + ".tmp", path)
+        self.__meta_version = _file_version(path)
+
+
+def _file_version(path):
+    # os.replace() gives the header a new inode, so this changes on every save
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns
+
+
+# ============================
+# SEMANTIC CACHE CLASS
+# ============================
+
+class SemanticCache:
+    """
+    Per-task vector indexes in front of the response cache.
+
+    Attributes:
+        embedder: Object with `name`, `dimensions` and `embed(texts)`
+        audit_rate (float): Fraction of hits double-checked with Gemini
+    """
+
+    def __init__(self, directory=None, embedder=None, max_entries=None, audit_rate=None):
+        self.directory = directory or os.getenv("NLP_SEMANTIC_DIR", DEFAULT_DIR)
+        self.embedder = embedder or default_embedder()
+        self.max_entries = max_entries or int(os.getenv("NLP_SEMANTIC_MAX", DEFAULT_MAX_ENTRIES))
+        self.audit_rate = float(os.getenv("NLP_SEMANTIC_AUDIT", 0)) if audit_rate is None else audit_rate
+        self.__indexes = {}
+        self.__lock = threading.Lock()
+        self.__stats_lock = threading.Lock()
+        self.__stats = {"lookups": 0, "hits": 0, "misses": 0, "added": 0, "audited": 0, "false_hits": 0,
+                        "errors": 0, "embed_seconds": 0.0}
+        self.__hit_similarity = 0.0
+
+    def index(self, task_id):
+        """Return (opening it on first use) the vector index for a task."""
+        index = self.__indexes.get(task_id)
+        if index is None:
+            with self.__lock:
+                index = self.__indexes.get(task_id)
+                if index is None:
+                    index = VectorIndex(self.directory, task_id, self.embedder.name, self.embedder.dimensions,
+                                        self.max_entries)
+                    self.__indexes[task_id] = index
+        return index
+
+    def embed(self, text):
+        """Normalized embedding of one (normalized) input text."""
+        start = time.perf_counter()
+        vector = self.embedder.embed([normalize_text(text)])[0]
+        self.__count(embed_seconds=time.perf_counter() - start)
+        return vector
+
+    def lookup(self, task, text, verify=None):
+        """
+        Look for a cached answer to a near-duplicate input.
+
+        Args:
+            task (Task): Task with a `semantic` threshold
+            text (str): Input text
+            verify: Optional callable returning a fresh answer, used when
+                this hit is picked for auditing
+
+        Returns:
+            tuple: (answer or None, query vector for add()); the vector is
+                None if the embedding call failed
+        """
+        try:
+            vector = self.embed(text)
+        except Exception as e:
+            # The semantic cache is an optimization: never fail the task over it
+            print(f"Semantic cache lookup skipped: {e}")
+            self.__count(lookups=1, misses=1, errors=1)
+            return None, None
+        key, similarity = self.index(task.id).search(vector)
+        cache = get_cache()
+        answer = cache.get(key) if key is not None and similarity >= task.semantic and cache else None
+        if answer is None:
+            self.__count(lookups=1, misses=1)
+            return None, vector
+        self.__count(lookups=1, hits=1)
+        with self.__stats_lock:
+            self.__hit_similarity += similarity
+        if verify is not None and self.audit_rate and random.random() < self.audit_rate:
+            fresh = verify()
+            self.__count(audited=1, false_hits=not same_answer(answer, fresh))
+            return fresh, vector
+        return answer, vector
+
+    def add(self, task, vector, key):
+        """Index a freshly answered input under its response-cache key."""
+        if vector is None:
+            return
+        self.index(task.id).add(vector, key)
+        self.__count(added=1)
+
+    def answer(self, task, text, key, generate):
+        """
+        Serve a near-duplicate's answer, or call `generate()` and index the
+        input under `key`. Used as the compute function of the response
+        cache, so it only runs after an exact-match miss.
+
+        Args:
+            task (Task): Task with a `semantic` threshold
+            text (str): Input text
+            key (str): Response-cache key of this call
+            generate: Callable returning the Gemini answer
+
+        Returns:
+            str: Answer text
+        """
+        answer, vector = self.lookup(task, text, verify=generate)
+        if answer is not None:
+            return answer
+        answer = generate()
+        self.add(task, vector, key)
+        return answer
+
+    def __count(self, **amounts):
+        with self.__stats_lock:
+            for name, amount in amounts.items():
+                self.__stats[name] += amount
+
+    def stats(self):
+        """Hit rate, audited false-hit rate, embedding time and index sizes."""
+        with self.__stats_lock:
+            stats = dict(self.__stats)
+            hit_similarity = self.__hit_similarity
+        stats["embed_seconds"] = round(stats["embed_seconds"], 6)
+        stats["hit_rate"] = round(stats["hits"] / stats["lookups"], 4) if stats["lookups"] else 0.0
+        stats["false_hit_rate"] = round(stats["false_hits"] / stats["audited"], 4) if stats["audited"] else None
+        stats["avg_hit_similarity"] = round(hit_similarity / stats["hits"], 4) if stats["hits"] else None
+        stats["embedder"] = self.embedder.name
+        stats["indexed"] = {task_id: len(index) for task_id, index in self.__indexes.items()}
+        return stats
+
+
+def same_answer(a, b):
+    """
+    Rough check that two answers agree: same first line, ignoring case,
+    markdown and punctuation (e.g. "**Positive** (92%)" vs "Positive (88%)"
+    compares the words only).
+    """
+    def headline(text):
+        first = next((line for line in text.splitlines() if line.strip()), "")
+        return " ".join(word for word in _WORD.findall(first.lower()) if not word.isdigit())
+
+    return headline(a) == headline(b)
+
+
+# ============================
+# PROCESS-WIDE DEFAULT
+# ============================
+
+_semantic = None
+_semantic_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """
+    Return the process-wide semantic cache, or None when it is disabled
+    (NLP_SEMANTIC_CACHE is not "1", or the response cache is off).
+    """
+    global _semantic
+    if os.getenv("NLP_SEMANTIC_CACHE", "0") != "1" or get_cache() is None:
+        return None
+    if _semantic is None:
+        with _semantic_lock:
+            if _semantic is None:
+                _semantic = SemanticCache()
+    return _semantic
+
+
+def semantic_stats():
+    """Stats of the process-wide semantic cache ({} if it was never used)."""
+    return _semantic.stats() if _semantic is not None else {}
@@ -0,0 +1,458 @@
+"""
+AI NLP Toolkit - Structured Output
+==================================
+Description: Typed, compact results for tasks whose answer is really data
+            (a label and a score, a list of entities, a yes/no flag).
+
+In structured mode the task prompt is sent with Gemini's JSON mode and a
+response schema, so the model returns a few dozen tokens of JSON instead
+of a paragraph of markdown. The reply is parsed into a small `__slots__`
+result object; the human-readable text is rendered locally by
+`result.render()` in the CLI and the web UI, and `result.to_dict()` gives
+plain data for scripts (see `python app.py pipe --structured`).
+
+Entity spans for Named Entity Recognition are found locally in the input
+text rather than asked of the model, which keeps them exact. The model
+sees the cleaned input (preprocess.py), but spans always index the text
+the caller passed in.
+
+Usage:
+    from structured import run_structured, supports_structured
+
+    if supports_structured("sentiment"):
+        result = run_structured("sentiment", "This movie is amazing!")
+        print(result.label, result.score)   # Positive 0.95
+        print(result.render())              # **Positive** (confidence 95%)
+"""
+
+import json
+import re
+
+from cache import cache_key, get_cache
+from gemini_client import generate_content
+from metrics import metrics
+from microbatch import parse_json_reply
+from preprocess import prepare
+from tasks import get_task
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a structured reply does not match the task's schema."""
+
+
+# ============================
+# SCHEMA HELPERS
+# ============================
+# Gemini response schemas (OpenAPI subset, upper-case type names)
+
+def _string(enum=None):
+    return {"type": "STRING", "format": "enum", "enum": list(enum)} if enum else {"type": "STRING"}
+
+
+def _number():
+    return {"type": "NUMBER"}
+
+
+def _boolean():
+    return {"type": "BOOLEAN"}
+
+
+def _array(items):
+    return {"type": "ARRAY", "items": items}
+
+
+def _object(**properties):
+    return {"type": "OBJECT", "properties": properties, "required": list(properties)}
+
+
+def _score(value):
+    # Confidence as a 0-1 float; models sometimes answer in percent
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise StructuredOutputError(f"Expected a number, got {value!r}") from None
+    if value > 1:
+        value /= 100
+    return round(min(max(value, 0.0), 1.0), 4)
+
+
+def _flag(value):
+    # JSON booleans, tolerating "true"/"false" strings
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "yes")
+    return bool(value)
+
+
+def _field(data, name):
+    try:
+        return data[name]
+    except (KeyError, TypeError):
+        raise StructuredOutputError(f"Reply is missing '{name}'") from None
+
+
+# ============================
+# RESULT CLASSES
+# ============================
+
+class StructuredResult:
+    """
+    Base class for typed task results.
+
+    Subclasses list their fields in __slots__ and implement schema() (the
+    response schema sent to Gemini), from_data() and render().
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def schema(cls):
+        """Gemini response schema for this result (dict)."""
+        raise NotImplementedError
+
+    @classmethod
+    def from_data(cls, data, inputs):
+        """
+        Build a result from the parsed JSON reply.
+
+        Args:
+            data (dict): Parsed reply
+            inputs (tuple): The task's input texts (used for entity spans)
+
+        Raises:
+            StructuredOutputError: If a required field is missing or invalid
+        """
+        raise NotImplementedError
+
+    def to_dict(self):
+        """Plain dict of the result fields (JSON-serializable)."""
+        return {name: _plain(getattr(self, name)) for name in _fields(type(self))}
+
+    def render(self):
+        """Markdown text for display, built locally."""
+        raise NotImplementedError
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in _fields(type(self)))
+        return f"{type(self).__name__}({fields})"
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+
+def _fields(cls):
+    # Slots of the class and its bases (subclasses such as SentimentResult add none)
+    return tuple(name for klass in reversed(cls.__mro__) for name in getattr(klass, "__slots__", ()))
+
+
+def _plain(value):
+    if isinstance(value, StructuredResult):
+        return value.to_dict()
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+class LabelResult(StructuredResult):
+    """One label with a confidence score (sentiment, emotion, intent, ...)."""
+
+    __slots__ = ("label", "score")
+    LABELS = None
+
+    def __init__(self, label, score):
+        self.label = label
+        self.score = score
+
+    @classmethod
+    def schema(cls):
+        return _object(label=_string(cls.LABELS), score=_number())
+
+    @classmethod
+    def from_data(cls, data, inputs):
+        label = str(_field(data, "label")).strip()
+        if not label:
+            raise StructuredOutputError("Reply has an empty label")
+        return cls(label, _score(_field(data, "score")))
+
+    def render(self):
+        return f"**{self.label}** (confidence {self.score:.0%})"
+
+
+class SentimentResult(LabelResult):
+    __slots__ = ()
+    LABELS = ("Positive", "Negative", "Neutral")
+
+
+class EmotionResult(LabelResult):
+    __slots__ = ()
+    LABELS = ("Joy", "Sadness", "Anger", "Fear", "Surprise", "Disgust", "Neutral")
+
+
+class IntentResult(LabelResult):
+    __slots__ = ()
+
+
+class CategoryResult(LabelResult):
+    __slots__ = ()
+    LABELS = ("Technology", "Sports", "Politics", "Entertainment", "Business", "Health", "Science", "Other")
+
+
+class SpamResult(StructuredResult):
+    """Spam flag with a confidence score."""
+
+    __slots__ = ("is_spam", "confidence")
+
+    def __init__(self, is_spam, confidence):
+        self.is_spam = is_spam
+        self.confidence = confidence
+
+    @classmethod
+    def schema(cls):
+        return _object(is_spam=_boolean(), confidence=_number())
+
+    @classmethod
+    def from_data(cls, data, inputs):
+        return cls(_flag(_field(data, "is_spam")), _score(_field(data, "confidence")))
+
+    def render(self):
+        return f"**{'Spam' if self.is_spam else 'Not Spam'}** (confidence {self.confidence:.0%})"
+
+
+class SafetyResult(StructuredResult):
+    """Hate speech rating (Safe / Warning / Harmful) with a short reason."""
+
+    __slots__ = ("label", "reason")
+    LABELS = ("Safe", "Warning", "Harmful")
+
+    def __init__(self, label, reason):
+        self.label = label
+        self.reason = reason
+
+    @classmethod
+    def schema(cls):
+        return _object(label=_string(cls.LABELS), reason=_string())
+
+    @classmethod
+    def from_data(cls, data, inputs):
+        label = str(_field(data, "label")).strip().capitalize()
+        if label not in cls.LABELS:
+            raise StructuredOutputError(f"Unknown safety label {label!r}")
+        return cls(label, str(_field(data, "reason")).strip())
+
+    def render(self):
+        return f"**{self.label}**: {self.reason}" if self.reason else f"**{self.label}**"
+
+
+class ParaphraseResult(StructuredResult):
+    """Whether two sentences are paraphrases, with a one-line explanation."""
+
+    __slots__ = ("is_paraphrase", "explanation")
+
+    def __init__(self, is_paraphrase, explanation):
+        self.is_paraphrase = is_paraphrase
+        self.explanation = explanation
+
+    @classmethod
+    def schema(cls):
+        return _object(is_paraphrase=_boolean(), explanation=_string())
+
+    @classmethod
+    def from_data(cls, data, inputs):
+        return cls(_flag(_field(data, "is_paraphrase")), str(_field(data, "explanation")).strip())
+
+    def render(self):
+        return f"**{'Yes' if self.is_paraphrase else 'No'}**: {self.explanation}"
+
+
+class KeywordsResult(StructuredResult):
+    """Keywords and key phrases, most important first."""
+
+    __slots__ = ("keywords",)
+
+    def __init__(self, keywords):
+        self.keywords = keywords
+
+    @classmethod
+    def schema(cls):
+        return _object(keywords=_array(_string()))
+
+    @classmethod
+    def from_data(cls, data, inputs):
+        keywords = _field(data, "keywords")
+        if not isinstance(keywords, list):
+            raise StructuredOutputError("'keywords' is not a list")
+        return cls(tuple(dict.fromkeys(str(k).strip() for k in keywords if str(k).strip())))
+
+    def render(self):
+        return "\n".join(f"- {keyword}" for keyword in self.keywords) or "_No keywords found_"
+
+
+class Entity(StructuredResult):
+    """
+    One named entity.
+
+    Attributes:
+        text (str): Entity text as it appears in the input
+        type (str): Person, Organization, Location, Date, ...
+        start, end (int): Character span in the input, or None if the
+            model's text does not occur in it
+    """
+
+    __slots__ = ("text", "type", "start", "end")
+
+    def __init__(self, text, type, start=None, end=None):
+        self.text = text
+        self.type = type
+        self.start = start
+        self.end = end
+
+    def render(self):
+        span = f" [{self.start}:{self.end}]" if self.start is not None else ""
+        return f"- **{self.text}**: {self.type}{span}"
+
+
+class EntitiesResult(StructuredResult):
+    """Named entities with character spans located in the input text."""
+
+    __slots__ = ("entities",)
+    TYPES = ("Person", "Organization", "Location", "Date", "Time", "Money", "Event", "Product", "Other")
+
+    def __init__(self, entities):
+        self.entities = entities
+
+    @classmethod
+    def schema(cls):
+        return _object(entities=_array(_object(text=_string(), type=_string(cls.TYPES))))
+
+    @classmethod
+    def from_data(cls, data, inputs):
+        items = _field(data, "entities")
+        if not isinstance(items, list):
+            raise StructuredOutputError("'entities' is not a list")
+        text = inputs[0]
+        lowered = text.lower()
+        entities = []
+        position = 0
+        for item in items:
+            name = str(_field(item, "text")).strip()
+            if not name:
+                continue
+            # Entities usually come back in reading order: search forward first
+            start = lowered.find(name.lower(), position)
+            if start < 0:
+                start = lowered.find(name.lower())
+            end = start + len(name)
+            if start < 0:
+                # The model saw cleaned text: "John Smith" may be "John\n  Smith" here
+                match = _find_words(text, name, position) or _find_words(text, name, 0)
+                if match is None:
+                    entities.append(Entity(name, str(_field(item, "type"))))
+                    continue
+                start, end = match.span()
+            entities.append(Entity(text[start:end], str(_field(item, "type")), start, end))
+            position = end
+        return cls(tuple(entities))
+
+    def render(self):
+        return "\n".join(entity.render() for entity in self.entities) or "_No named entities found_"
+
+
+# Task id -> result class; every other task keeps free-form markdown
+RESULT_TYPES = {
+    "sentiment": SentimentResult,
+    "emotion": EmotionResult,
+    "intent": IntentResult,
+    "classification": CategoryResult,
+    "spam": SpamResult,
+    "hate_speech": SafetyResult,
+    "paraphrase_detection": ParaphraseResult,
+    "keywords": KeywordsResult,
+    "ner": EntitiesResult,
+}
+
+
+# ============================
+# STRUCTURED TASK RUNNER
+# ============================
+
+def supports_structured(task_id):
+    """Return True if the task has a structured result type."""
+    return task_id in RESULT_TYPES
+
+
+def generation_config(task):
+    """
+    The task's generation settings plus JSON mode and its response schema.
+
+    Returns:
+        dict: Generation config for structured calls
+    """
+    config = dict(task.generation_config or {})
+    config["response_mime_type"] = "application/json"
+    config["response_schema"] = RESULT_TYPES[task.id].schema()
+    return config
+
+
+def _find_words(text, name, position):
+    pattern = r"\s+".join(re.escape(word) for word in name.split())
+    return re.compile(pattern, re.I).search(text, position)
+
+
+def parse_result(task_id, reply, inputs):
+    """
+    Parse a JSON reply into the task's result class.
+
+    Raises:
+        StructuredOutputError: If the reply is not valid JSON for the schema
+    """
+    try:
+        data = parse_json_reply(reply)
+    except ValueError as e:
+        raise StructuredOutputError(f"Reply is not JSON: {e}") from None
+    if not isinstance(data, dict):
+        raise StructuredOutputError("Reply is not a JSON object")
+    return RESULT_TYPES[task_id].from_data(data, tuple(inputs))
+
+
+def run_structured(task_id, *inputs):
+    """
+    Run a task in structured mode.
+
+    The JSON reply is cached under the structured generation config, so
+    it never collides with the markdown answer of the same task.
+
+    Args:
+        task_id (str): Task id with a structured result type
+        *inputs (str): Input text(s) for the task
+
+    Returns:
+        StructuredResult: Typed result
+
+    Raises:
+        ValueError: If the task has no structured result type
+        StructuredOutputError: If the reply does not match the schema
+    """
+    task = get_task(task_id)
+    if not supports_structured(task.id):
+        raise ValueError(f"Task '{task.id}' has no structured output")
+    # The model gets the cleaned text; entity spans are looked up in the raw input
+    prepared = prepare(task, inputs)
+    prompt = task.render(*prepared)
+    config = generation_config(task)
+
+    with metrics.track_task(task.id):
+        cache = get_cache(config)
+        key = cache_key(task.model, config, task.id, prepared) if cache else None
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            return parse_result(task.id, cached, inputs)
+        reply = generate_content(prompt, task.model, config, task_id=task.id, profile=task.profile).text
+        result = parse_result(task.id, reply, inputs)
+        # Only replies that parse are kept
+        if cache:
+            cache.set(key, reply)
+        return result
+
+
+def to_json(result):
+    """Compact JSON for a structured result."""
+    return json.dumps(result.to_dict(), ensure_ascii=False, separators=(",", ":"))
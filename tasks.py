@@ -0,0 +1,609 @@
+"""
+AI NLP Toolkit - Task Registry
+==============================
+Description: Single declarative registry of the 21 NLP tasks, shared by
+            app.py (CLI) and UI_streamlit.py (web UI).
+
+Each task is described once (id, label, inputs, prompt template and
+generation settings). Prompt templates are compiled when this module is
+imported, and tasks are looked up through plain dicts so dispatch by id,
+menu number or label is O(1).
+
+Usage:
+    from tasks import get_task, run_task
+
+    task = get_task("sentiment")
+    prompt = task.render("This movie is amazing!")
+    result = run_task("sentiment", "This movie is amazing!")
+
+    # streaming: print chunks as they arrive
+    stream = stream_task("summarization", long_text)
+    for chunk in stream:
+        print(chunk, end="", flush=True)
+    print(stream.ttft)
+"""
+
+import importlib
+import os
+import threading
+import time
+import warnings
+from collections import deque
+from string import Formatter
+
+from cache import cache_key, get_cache
+from gemini_client import generate_content
+from longdoc import needs_chunking, run_long_task, stream_long_task
+from profiles import get_profile, route
+from metrics import metrics
+from preprocess import prepare
+
+
+# ============================
+# PROMPT TEMPLATE CLASS
+# ============================
+
+class PromptTemplate:
+    """
+    Prompt template compiled once into literal text and field slots.
+
+    Uses `str.format` syntax ("Summarize this text: {text}"). Parsing
+    happens in __init__, so rendering is a single join over the
+    pre-split parts.
+
+    Attributes:
+        source (str): Original template string
+        fields (tuple): Field names in order of first appearance
+    """
+
+    __slots__ = ("source", "fields", "_parts")
+
+    def __init__(self, source):
+        self.source = source
+        parts = []
+        fields = []
+        for literal, field, _spec, _conv in Formatter().parse(source):
+            if literal:
+                parts.append((True, literal))
+            if field is not None:
+                if not field:
+                    raise ValueError(f"Positional field in prompt template: {source!r}")
+                parts.append((False, field))
+                if field not in fields:
+                    fields.append(field)
+        self._parts = tuple(parts)
+        self.fields = tuple(fields)
+
+    def render(self, **values):
+        """
+        Fill the template with input values.
+
+        Raises:
+            KeyError: If a field has no value
+        """
+        return "".join(text if is_literal else str(values[text]) for is_literal, text in self._parts)
+
+
+# ============================
+# TASK CLASS
+# ============================
+
+class Task:
+    """
+    Declarative description of one NLP task.
+
+    Attributes:
+        id (str): Stable task id used by code and the command line
+        number (str): Menu number shown in the CLI ("1" ... "21")
+        icon (str): Emoji shown in both front ends
+        name (str): Human-readable task name
+        template (PromptTemplate): Compiled prompt template
+        cli_prompts (tuple): `input()` prompt per input field (CLI)
+        ui_labels (tuple): Text box label per input field (web UI)
+        heading (str): Optional heading printed above the CLI result
+        profile (str): Generation profile (see profiles.py): model tier,
+            output cap and temperature for short inputs; long inputs may
+            be routed to a stronger profile
+        model (str): Gemini model name (default: the profile's model)
+        generation_config (dict): Profile settings plus any task-specific
+            overrides given here
+        batchable (bool): Short classification task whose inputs can be
+            packed several to a request (see microbatch.py)
+        local (str): Optional "module:function" answering the task offline;
+            the function returns the answer text, or None to escalate
+            to Gemini
+        chunking (str): How long inputs are split and merged (see
+            longdoc.py): "summary", "concat" or "keywords"; None sends
+            every input in one request
+        semantic (float): Cosine similarity at which a near-duplicate
+            input's answer is reused (see semantic_cache.py); set only
+            for coarse classifiers with a handful of labels, None for
+            tasks whose answer quotes or depends on the exact content
+        max_input (int): Estimated tokens per input above which the input
+            is truncated (see preprocess.py); None for tasks that chunk,
+            rewrite or generate from the whole input
+    """
+
+    __slots__ = ("id", "number", "icon", "name", "template", "cli_prompts",
+                 "ui_labels", "heading", "profile", "model", "generation_config", "batchable",
+                 "local", "chunking", "semantic", "max_input", "_overrides", "_local_handler")
+
+    def __init__(self, id, number, icon, name, template, cli_prompts=None,
+                 ui_labels=None, heading=None, profile="standard", model=None, generation_config=None,
+                 batchable=False, local=None, chunking=None, semantic=None, max_input=None):
+        self.id = id
+        self.number = number
+        self.icon = icon
+        self.name = name
+        self.template = PromptTemplate(template)
+        self.cli_prompts = tuple(cli_prompts or ["Enter your text: "] * self.arity)
+        self.ui_labels = tuple(ui_labels or ["📄 Enter your text"] * self.arity)
+        self.heading = heading
+        self.profile = profile
+        self._overrides = dict(generation_config or {})
+        self.model = model or get_profile(profile).model
+        self.generation_config = self.settings(get_profile(profile)) or None
+        self.batchable = batchable
+        self.local = local
+        self.chunking = chunking
+        self.semantic = semantic
+        self.max_input = max_input
+        self._local_handler = None
+
+    @property
+    def arity(self):
+        """Number of text inputs the task needs (1 for most, 2 for paraphrase detection)."""
+        return len(self.template.fields)
+
+    @property
+    def instruction(self):
+        """
+        Prompt text without the input, e.g. "Detect the language of this text ...".
+
+        Used when several inputs are packed into one request.
+        """
+        return self.template.render(**{field: "" for field in self.template.fields}).rstrip(" :\n")
+
+    def settings(self, profile, input_tokens=0):
+        """
+        Generation config for this task under a profile (the profile's
+        settings with the task's own overrides on top).
+
+        Returns:
+            dict: Generation settings
+        """
+        return {**profile.generation_config(input_tokens), **self._overrides}
+
+    @property
+    def label(self):
+        """Label with emoji, e.g. "💭 Sentiment Analysis"."""
+        return f"{self.icon} {self.name}"
+
+    def render(self, *inputs):
+        """
+        Build the prompt for this task from its input texts.
+
+        Args:
+            *inputs (str): One text per input field, in order
+
+        Returns:
+            str: Prompt ready to send to Gemini
+
+        Raises:
+            ValueError: If the number of inputs does not match the task
+        """
+        if len(inputs) != self.arity:
+            raise ValueError(f"Task '{self.id}' expects {self.arity} input(s), got {len(inputs)}")
+        return self.template.render(**dict(zip(self.template.fields, inputs)))
+
+    def local_answer(self, *inputs):
+        """
+        Try to answer without calling Gemini.
+
+        The handler module is imported on first use, so its dependencies
+        (e.g. NumPy) are only loaded for tasks that need them. A handler
+        that cannot be imported is disabled and every call escalates.
+
+        Returns:
+            str: Local answer, or None if Gemini should be asked
+        """
+        if self.local is None:
+            return None
+        if self._local_handler is None:
+            module, _, function = self.local.partition(":")
+            try:
+                self._local_handler = getattr(importlib.import_module(module), function)
+            except ImportError as e:
+                warnings.warn(f"Local handler for '{self.id}' unavailable, using Gemini: {e}", RuntimeWarning)
+                self.local = None
+                return None
+        return self._local_handler(*inputs)
+
+    def __repr__(self):
+        return f"Task({self.id!r})"
+
+
+# ============================
+# TASK DEFINITIONS
+# ============================
+# Order matches the CLI menu numbers and the web UI dropdown
+
+TASKS = (
+    Task("sentiment", "1", "💭", "Sentiment Analysis",
+         "Analyze the sentiment of this text and classify it as Positive, Negative, or Neutral with confidence score: {text}",
+         profile="classify", batchable=True, semantic=0.92, max_input=2000),
+    Task("translation", "2", "🌐", "Language Translation (English → Bangla)",
+         "Translate this English text to Bangla (Bengali): {text}",
+         profile="rewrite", chunking="concat"),
+    Task("language_detection", "3", "🔍", "Language Detection",
+         "Detect the language of this text and provide the language name: {text}",
+         profile="classify", batchable=True,
+         local="language_id:local_answer", semantic=0.92, max_input=500),
+    Task("summarization", "4", "📝", "Text Summarization",
+         "Provide a concise summary of this text: {text}",
+         chunking="summary"),
+    Task("keywords", "5", "🔑", "Keyword Extraction",
+         "Extract the most important keywords and key phrases from this text: {text}",
+         profile="extract", chunking="keywords"),
+    Task("ner", "6", "👤", "Named Entity Recognition",
+         "Identify and categorize named entities (Person, Organization, Location, Date, etc.) in this text: {text}",
+         profile="extract", max_input=4000),
+    Task("pos", "7", "📚", "Part-of-Speech Tagging",
+         "Tag each word in this sentence with its part of speech (noun, verb, adjective, etc.): {text}",
+         profile="extract", max_input=1000),
+    Task("topic", "8", "🏷️", "Topic Modeling",
+         "Identify the main topic and sub-topics of this text: {text}",
+         profile="extract", max_input=4000),
+    Task("classification", "9", "📊", "Text Classification",
+         "Classify this text into appropriate categories (e.g., Technology, Sports, Politics, Entertainment, Business, Health, Science): {text}",
+         profile="extract", max_input=4000),
+    Task("qa", "10", "❓", "Question Answering",
+         "Provide a detailed and accurate answer to this question: {text}",
+         cli_prompts=["Enter your question: "], max_input=4000),
+    Task("generation", "11", "✍️", "Text Generation",
+         "Generate creative and engaging text based on this prompt: {text}",
+         cli_prompts=["Enter a prompt: "],
+         profile="creative"),
+    Task("emotion", "12", "😊", "Emotion Detection",
+         "Detect and identify the specific emotions (joy, sadness, anger, fear, surprise, disgust, etc.) expressed in this text: {text}",
+         profile="classify", batchable=True, semantic=0.92, max_input=2000),
+    Task("intent", "13", "🎯", "Intent Detection",
+         "Detect the user's intent in this text (e.g., question, request, complaint, feedback, greeting, booking): {text}",
+         profile="classify", batchable=True, semantic=0.92, max_input=1000),
+    Task("paraphrase_detection", "14", "🔄", "Paraphrase Detection",
+         "Analyze if these two sentences are paraphrases (convey the same meaning):\n1. {text1}\n2. {text2}\nProvide a Yes/No answer with explanation.",
+         cli_prompts=["Enter first sentence: ", "Enter second sentence: "],
+         ui_labels=["📄 First sentence", "📄 Second sentence"],
+         profile="classify", max_input=1000),
+    Task("paraphrasing", "15", "✏️", "Text Paraphrasing",
+         "Paraphrase this text while maintaining its original meaning: {text}",
+         cli_prompts=["Enter text to paraphrase (e.g., 'The weather is very hot today'): "],
+         heading="✅ Paraphrased Text:",
+         profile="rewrite"),
+    Task("grammar", "16", "✅", "Grammar Correction",
+         "Correct all grammar, spelling, and punctuation errors in this text and explain the corrections: {text}",
+         cli_prompts=["Enter text with grammar errors (e.g., 'She don't like going to school everyday'): "],
+         heading="✅ Corrected Text:",
+         profile="rewrite"),
+    Task("hate_speech", "17", "⚠️", "Hate Speech Detection",
+         "Analyze if this text contains hate speech, offensive language, or harmful content. Classify as: Safe, Warning, or Harmful: {text}",
+         cli_prompts=["Enter text to analyze (e.g., 'You should try harder next time'): "],
+         heading="⚠️ Analysis Result:",
+         profile="classify", batchable=True, semantic=0.92, max_input=2000),
+    Task("spam", "18", "🚫", "Spam Detection",
+         "Analyze if this text is spam/promotional content or legitimate. Classify as Spam or Not Spam with confidence score: {text}",
+         cli_prompts=["Enter text to check (e.g., 'Congratulations! You won $1000. Click here now!'): "],
+         heading="🚫 Analysis Result:",
+         profile="classify", batchable=True, semantic=0.92, max_input=2000),
+    Task("fake_news", "19", "📰", "Fake News Detection",
+         "Analyze this text for potential misinformation, fake news, or unreliable claims. Provide credibility assessment: {text}",
+         cli_prompts=["Enter news text to verify (e.g., 'Scientists discover cure for all diseases'): "],
+         heading="📰 Credibility Assessment:", max_input=6000),
+    Task("simplification", "20", "📖", "Text Simplification",
+         "Simplify this text to make it easier to understand for a general audience: {text}",
+         cli_prompts=["Enter complex text to simplify (e.g., 'The implementation of advanced algorithms...'): "],
+         heading="📖 Simplified Text:",
+         profile="rewrite"),
+    Task("opinion", "21", "💡", "Opinion Mining",
+         "Extract and analyze opinions, attitudes, and subjective information from this text: {text}",
+         cli_prompts=["Enter text for opinion analysis (e.g., 'I think this product is great but expensive'): "],
+         heading="💡 Opinion Analysis:", max_input=4000),
+)
+
+# Lookup tables for O(1) dispatch
+TASKS_BY_ID = {task.id: task for task in TASKS}
+TASKS_BY_NUMBER = {task.number: task for task in TASKS}
+TASKS_BY_LABEL = {task.label: task for task in TASKS}
+TASK_IDS = tuple(TASKS_BY_ID)
+
+
+def get_task(task_id):
+    """
+    Look up a task by id.
+
+    Raises:
+        KeyError: If no task has this id
+    """
+    try:
+        return TASKS_BY_ID[task_id]
+    except KeyError:
+        raise KeyError(f"Unknown task '{task_id}'. Available tasks: {', '.join(TASK_IDS)}") from None
+
+
+def run_task(task_id, *inputs):
+    """
+    Render the prompt for a task and send it to Gemini.
+
+    This is the single call path used by both front ends. Inputs are
+    cleaned and length-limited first (preprocess.py); responses are
+    served from the response cache (cache.py) when the same input was
+    seen before.
+
+    Args:
+        task_id (str): Task id (e.g. "sentiment")
+        *inputs (str): Input text(s) for the task
+
+    Returns:
+        str: Gemini response text
+    """
+    task = get_task(task_id)
+    with metrics.track_task(task.id):
+        return _run_task(task, prepare(task, inputs))
+
+
+def _run_task(task, inputs):
+    prompt = task.render(*inputs)
+
+    # Offline cascade: answer locally when the task has a confident handler
+    if task.local is not None:
+        start = time.perf_counter()
+        answer = task.local_answer(*inputs)
+        if answer is not None:
+            record_path(task.id, "local", time.perf_counter() - start)
+            return answer
+
+    # Long documents are split, processed in parallel and merged (longdoc.py)
+    if needs_chunking(task, inputs):
+        return run_long_task(task, inputs[0])
+
+    # Model tier and output cap for this input (profiles.py)
+    choice = route(task, inputs)
+
+    def generate():
+        return generate_content(prompt, choice.model, choice.generation_config, task_id=task.id,
+                                profile=choice.profile).text
+
+    start = time.perf_counter()
+    cache = get_cache(choice.generation_config)
+    if cache is None:
+        answer = generate()
+    else:
+        key = cache_key(choice.model, choice.generation_config, task.id, inputs)
+        # After an exact-match miss, try a near-duplicate's answer (semantic_cache.py)
+        semantic = semantic_cache_for(task, inputs)
+        compute = generate if semantic is None else lambda: semantic.answer(task, inputs[0], key, generate)
+        answer = cache.get_or_compute(key, compute)
+    if task.local is not None:
+        record_path(task.id, "escalated", time.perf_counter() - start)
+    return answer
+
+
+def semantic_cache_for(task, inputs):
+    """
+    Return the semantic cache for this call, or None when it is disabled
+    or the task opted out (single-input tasks with `semantic` set only).
+    """
+    if task.semantic is None or len(inputs) != 1 or os.getenv("NLP_SEMANTIC_CACHE", "0") != "1":
+        return None
+    # Imported on first use: it loads NumPy, which a plain CLI start never needs
+    from semantic_cache import get_semantic_cache
+
+    return get_semantic_cache()
+
+
+# ============================
+# LOCAL / GEMINI CASCADE STATS
+# ============================
+
+# Per task with a local handler: {"local": [count, seconds], "escalated": [count, seconds]}
+cascade_stats = {}
+_cascade_lock = threading.Lock()
+
+
+def record_path(task_id, path, seconds):
+    """
+    Count one call of a task with a local handler.
+
+    Args:
+        task_id (str): Task id
+        path (str): "local" (answered offline) or "escalated" (sent to Gemini)
+        seconds (float): Time the call took on that path
+    """
+    with _cascade_lock:
+        paths = cascade_stats.setdefault(task_id, {"local": [0, 0.0], "escalated": [0, 0.0]})
+        paths[path][0] += 1
+        paths[path][1] += seconds
+
+
+def cascade_summary():
+    """
+    Escalation rate and average latency per path for tasks with a local handler.
+
+    Returns:
+        dict: {task_id: {"local", "escalated", "escalation_rate",
+            "local_avg_ms", "escalated_avg_ms"}}
+    """
+    summary = {}
+    with _cascade_lock:
+        for task_id, paths in cascade_stats.items():
+            (local, local_s), (escalated, escalated_s) = paths["local"], paths["escalated"]
+            total = local + escalated
+            summary[task_id] = {
+                "local": local,
+                "escalated": escalated,
+                "escalation_rate": round(escalated / total, 4) if total else 0.0,
+                "local_avg_ms": round(local_s / local * 1000, 3) if local else 0.0,
+                "escalated_avg_ms": round(escalated_s / escalated * 1000, 3) if escalated else 0.0,
+            }
+    return summary
+
+
+# ============================
+# STREAMING
+# ============================
+
+# Recent time-to-first-token samples (seconds) per task id
+ttft_samples = {task.id: deque(maxlen=1000) for task in TASKS}
+_ttft_lock = threading.Lock()
+
+
+class TaskStream:
+    """
+    Iterable of response text chunks for one task call.
+
+    Iterating sends the request with `stream=True` and yields each chunk as
+    it arrives. A cached response is yielded as a single chunk. Once
+    iteration finishes, the full text is stored in the response cache.
+
+    Attributes:
+        task (Task): Task being run
+        ttft (float): Seconds from request to first chunk (None until then)
+        text (str): Full response text (complete after iteration)
+        cached (bool): True if the answer came from the cache
+    """
+
+    def __init__(self, task, inputs):
+        self.task = task
+        self.inputs = inputs
+        self.ttft = None
+        self.text = ""
+        self.cached = False
+
+    def __iter__(self):
+        metrics.adjust_in_flight("task", 1)
+        start = time.perf_counter()
+        try:
+            yield from self.__chunks()
+        except Exception as e:
+            metrics.count_error(self.task.id, e)
+            raise
+        finally:
+            metrics.adjust_in_flight("task", -1)
+            metrics.observe_task(self.task.id, time.perf_counter() - start)
+
+    def __chunks(self):
+        task = self.task
+        prompt = task.render(*self.inputs)
+
+        start = time.perf_counter()
+        if task.local is not None:
+            answer = task.local_answer(*self.inputs)
+            if answer is not None:
+                record_path(task.id, "local", time.perf_counter() - start)
+                self.__first_chunk(start)
+                self.text = answer
+                yield answer
+                return
+
+        choice = route(task, self.inputs)
+        cache = get_cache(choice.generation_config)
+        key = cache_key(choice.model, choice.generation_config, task.id, self.inputs) if cache else None
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            self.cached = True
+            self.__first_chunk(start)
+            self.text = cached
+            if task.local is not None:
+                record_path(task.id, "escalated", time.perf_counter() - start)
+            yield cached
+            return
+
+        if needs_chunking(task, self.inputs):
+            # Each part is cached by longdoc; the merged text is not cached as a whole
+            parts = []
+            for text in stream_long_task(task, self.inputs[0]):
+                if self.ttft is None:
+                    self.__first_chunk(start)
+                parts.append(text)
+                yield text
+            self.text = "".join(parts)
+            return
+
+        # Near-duplicate of an earlier input (semantic_cache.py)
+        semantic = semantic_cache_for(task, self.inputs) if cache else None
+        vector = None
+        if semantic is not None:
+            similar, vector = semantic.lookup(task, self.inputs[0])
+            if similar is not None:
+                self.cached = True
+                self.__first_chunk(start)
+                self.text = similar
+                cache.set(key, similar)
+                yield similar
+                return
+
+        parts = []
+        usage = None
+        for chunk in generate_content(prompt, choice.model, choice.generation_config, stream=True, task_id=task.id,
+                                      profile=choice.profile):
+            # Token counts arrive with the chunks; the last one has the totals
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. the final finish-reason chunk)
+                continue
+            if not text:
+                continue
+            if self.ttft is None:
+                self.__first_chunk(start)
+            parts.append(text)
+            yield text
+
+        self.text = "".join(parts)
+        metrics.observe_gemini(task.id, choice.model, time.perf_counter() - start, usage, choice.profile)
+        if task.local is not None:
+            record_path(task.id, "escalated", time.perf_counter() - start)
+        if cache and self.text:
+            cache.set(key, self.text)
+            if semantic is not None:
+                semantic.add(task, vector, key)
+
+    def __first_chunk(self, start):
+        self.ttft = time.perf_counter() - start
+        with _ttft_lock:
+            ttft_samples[self.task.id].append(self.ttft)
+
+
+def stream_task(task_id, *inputs):
+    """
+    Streaming counterpart of run_task().
+
+    Returns:
+        TaskStream: Iterate it to receive text chunks as they arrive
+    """
+    task = get_task(task_id)
+    task.render(*inputs)  # validate the input count before anything is sent
+    return TaskStream(task, prepare(task, inputs))
+
+
+def ttft_summary():
+    """
+    Summarize recorded time-to-first-token per task.
+
+    Returns:
+        dict: {task_id: {"count", "avg", "p50", "p95"}} in seconds, for
+            tasks with at least one sample
+    """
+    summary = {}
+    with _ttft_lock:
+        snapshot = {task_id: sorted(samples) for task_id, samples in ttft_samples.items() if samples}
+    for task_id, samples in snapshot.items():
+        n = len(samples)
+        summary[task_id] = {
+            "count": n,
+            "avg": round(sum(samples) / n, 4),
+            "p50": round(samples[n // 2], 4),
+            "p95": round(samples[min(n - 1, int(n * 0.95))], 4),
+        }
+    return summary
@@ -0,0 +1,187 @@
+"""
+AI NLP Toolkit - Streamlit Rerun Benchmark
+==========================================
+Description: Measures how long UI_streamlit.py takes per rerun with many
+            sessions open at once, using Streamlit's headless AppTest
+            runner and the offline fake Gemini backend.
+
+AppTest keeps one mock runtime per process, so each session runs in its
+own worker process; the sessions compete for CPU the way concurrent
+users of one server do.
+
+Each simulated session registers, logs in and then repeats three kinds
+of interaction, timing every rerun:
+    select    switch the task selectbox
+    type      edit the input text
+    analyze   click "Run Analysis" (half of the texts repeat, so cached
+              results are exercised too)
+
+AppTest always reruns the whole script, even for widgets inside an
+st.fragment. The "script" section of the report therefore also lists
+the time the app itself measured (metrics stages "ui_rerun" for a full
+script run and "ui_fragment" for the task form alone). Under a real
+server, task-form interactions only cost the fragment time.
+
+Results (p50/p95/p99 per kind) are saved as JSON tagged with the git
+commit; run it on two commits and use --compare to see the difference.
+
+Usage:
+    python ui_benchmark.py --sessions 20 --rounds 10
+    python ui_benchmark.py --compare ui-benchmark-1a2b3c4.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from benchmark import git_commit, percentile
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "UI_streamlit.py")
+KINDS = ("select", "type", "analyze")
+TASK_CYCLE = ("sentiment", "spam", "emotion", "summarization")
+
+
+def run_session(number, rounds, latency):
+    """
+    Drive one AppTest session in a worker process.
+
+    Returns:
+        tuple: (list of (kind, seconds) rerun timings, list of error
+            strings, in-app stage metrics)
+    """
+    timings, errors = [], []
+    try:
+        _drive(number, rounds, latency, timings, errors)
+    except Exception as e:
+        errors.append(f"session {number}: {type(e).__name__}: {e}")
+    from metrics import metrics
+    return timings, errors, metrics.snapshot().get("stages", {})
+
+
+def _drive(number, rounds, latency, timings, errors):
+    os.environ.setdefault("NLP_CACHE", "0")
+    from streamlit.testing.v1 import AppTest
+
+    # AppTest runs outside a Streamlit server; silence its missing-context warning
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+
+    from fake_backend import FakeBackend
+    from gemini_client import use_backend
+
+    use_backend(FakeBackend(latency=latency))
+
+    def timed(kind, element):
+        start = time.perf_counter()
+        element.run()
+        timings.append((kind, time.perf_counter() - start))
+
+    at = AppTest.from_file(APP_FILE, default_timeout=60)
+    at.run()
+    email = f"user{number}@example.com"
+    at.radio[0].set_value("Register").run()
+    at.text_input[0].input(f"User {number}")
+    at.text_input[1].input(email)
+    at.text_input[2].input("secret")
+    at.button[0].click().run()
+    at.radio[0].set_value("Login").run()
+    at.text_input[0].input(email)
+    at.text_input[1].input("secret")
+    at.button[0].click().run()
+    if at.exception or not at.session_state["logged_in"]:
+        errors.append(f"session {number}: login failed {list(at.exception)}")
+        return
+
+    for i in range(rounds):
+        timed("select", at.selectbox[0].set_value(TASK_CYCLE[i % len(TASK_CYCLE)]))
+        # Half of the texts repeat across rounds and sessions
+        text = f"Sample text {i % 3}" if i % 2 else f"Session {number} text {i}"
+        timed("type", at.text_area[0].input(text))
+        timed("analyze", at.button[0].click())
+        if at.exception:
+            errors.append(f"session {number}: {at.exception[0].message}")
+            return
+
+
+def summarize(timings):
+    result = {}
+    for kind in KINDS:
+        values = [seconds for k, seconds in timings if k == kind]
+        result[kind] = {
+            "reruns": len(values),
+            "p50_ms": _ms(percentile(values, 50)),
+            "p95_ms": _ms(percentile(values, 95)),
+            "p99_ms": _ms(percentile(values, 99)),
+        }
+    return result
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time UI_streamlit.py reruns with many concurrent sessions.")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent sessions")
+    parser.add_argument("--rounds", type=int, default=8, help="Interaction rounds per session")
+    parser.add_argument("--latency", default="fixed:0.05", help="Fake Gemini latency spec (see fake_backend.py)")
+    parser.add_argument("--out", help="Result JSON path (default: ui-benchmark-<commit>.json)")
+    parser.add_argument("--compare", metavar="JSON", help="Earlier result file to compare against")
+    args = parser.parse_args(argv)
+
+    timings, errors, stages = [], [], {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.sessions) as workers:
+        futures = [workers.submit(run_session, n, args.rounds, args.latency) for n in range(args.sessions)]
+        for future in futures:
+            session_timings, session_errors, session_stages = future.result()
+            timings += session_timings
+            errors += session_errors
+            for stage, hist in session_stages.items():
+                total = stages.setdefault(stage, {"count": 0, "sum": 0.0})
+                total["count"] += hist["count"]
+                total["sum"] += hist["sum"]
+    elapsed = time.perf_counter() - start
+
+    commit = git_commit()
+    report = {
+        "meta": {"commit": commit, "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                 "sessions": args.sessions, "rounds": args.rounds, "latency": args.latency,
+                 "seconds": round(elapsed, 2), "errors": errors},
+        "reruns": summarize(timings),
+        "script": {stage: {"count": total["count"], "avg_ms": _ms(total["sum"] / total["count"])}
+                   for stage, total in stages.items() if total["count"]},
+    }
+    print(f"UI benchmark @ {commit}: {args.sessions} sessions x {args.rounds} rounds in {elapsed:.1f}s")
+    for kind, numbers in report["reruns"].items():
+        print(f"  {kind:<8} {numbers['reruns']:>5} reruns  p50 {numbers['p50_ms']} ms  "
+              f"p95 {numbers['p95_ms']} ms  p99 {numbers['p99_ms']} ms")
+    for stage, numbers in report["script"].items():
+        print(f"  {stage:<12} {numbers['count']:>5} runs  avg {numbers['avg_ms']} ms (measured in the app)")
+    for error in errors:
+        print(f"  ! {error}", file=sys.stderr)
+
+    out = args.out or f"ui-benchmark-{commit}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old = json.load(f)
+        print(f"\nComparison: {old['meta']['commit']} -> {commit}")
+        for kind, numbers in report["reruns"].items():
+            before = old["reruns"].get(kind, {})
+            for key in ("p50_ms", "p95_ms"):
+                a, b = before.get(key), numbers.get(key)
+                if a and b is not None:
+                    print(f"  {kind:<8} {key:<7} {a:>9} -> {b:<9} ({(b - a) / a * 100:+.1f}%)")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())